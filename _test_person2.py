@@ -37,6 +37,7 @@ try:
         email="This is a test email.",
         drive_link=link
     )
+    db.flush() # Rows are written in batches, so push this one out now
     print("✅ log_lead test passed.")
 
     # 5. Test Reading (This tests get_existing_urls)
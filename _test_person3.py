@@ -79,8 +79,29 @@ def test_email_gen(my_services, client_info):
     print(email)
     print("--------------------")
 
+def test_signature_detection():
+    """Tests where a streamed email is cut off (no Ollama needed)."""
+    print("--- 0. Testing email signature detection ---")
+    intro = "Subject: Quick question\n\nHi team,\n\nI'm Eshan Jameel, Co-founder of CyForge, and I noticed"
+    # The sender introducing themselves is not the end of the email
+    assert not generation_engine._email_complete(intro, 1), "Stopped at the introduction!"
+    email = intro + " your SOC 2 push.\n\nAre you free for a call?\n\nBest regards,\nEshan Jameel\nCo-founder, CyForge\n\nP.S. Ignore"
+    assert generation_engine._email_complete(email, 1), "Didn't stop after the signature!"
+    cut = generation_engine._cut_after_signature(email)
+    assert cut.endswith("Best regards,\nEshan Jameel\nCo-founder, CyForge"), f"Wrong cut: {cut!r}"
+    assert "SOC 2 push" in cut, "The body was cut off!"
+    # A signature block after a blank line, without a sign-off
+    assert generation_engine._email_complete("Hi,\n\nThanks.\n\nEshan Jameel, Co-founder, CyForge\n", 1)
+    assert not generation_engine._email_complete("Hi,\n\nEshan Jameel here, co-founder of CyForge.\n", 1)
+    print("✅ Success. Emails are only cut after the signature.\n")
+
 # --- RUN THE TESTS ---
 if __name__ == "__main__":
+    try:
+        test_signature_detection()
+    except AssertionError as e:
+        print(f"\n❌ TEST FAILED: {e}")
+        sys.exit(1)
     if check_ollama():
         try:
             services = test_analysis()
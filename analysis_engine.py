@@ -1,41 +1,102 @@
 import requests
-from bs4 import BeautifulSoup
-import ollama
+import inference  # Scheduled, cached Ollama calls
+import compaction  # Token-budgeted prompt text
+import scrape_cache  # Cached page text + ETag/Last-Modified
+import html_extract  # Streaming, byte-capped extraction
+import rate_limiter  # Per-domain token buckets + circuit breakers
 import json  # <-- This is the new, critical import
 
+# Set a user-agent to look like a real browser, not a script
+HEADERS = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.36'}
+
+# "fast" = stream the page through html_extract (byte cap, lxml, stops early)
+# "full" = download everything and parse it with BeautifulSoup
+EXTRACT_MODE = "fast"
+
+# One shared Session so repeated requests reuse pooled TCP/TLS connections
+_session = requests.Session()
+_session.headers.update(HEADERS)
+# Big enough for the pipeline's scrape workers to share without blocking
+_session.mount("https://", requests.adapters.HTTPAdapter(pool_connections=64, pool_maxsize=32))
+_session.mount("http://", requests.adapters.HTTPAdapter(pool_connections=64, pool_maxsize=32))
+
+
+def cache_variant() -> str:
+    """The extraction settings scraped text depends on; part of its scrape_cache key."""
+    return f"{EXTRACT_MODE}:{html_extract.MAX_CHARS}"
+
+
+def _extract_visible_text(html: str) -> str:
+    """Parses an HTML document and returns all visible, stripped text."""
+    from bs4 import BeautifulSoup  # Only needed in "full" extract mode
+
+    soup = BeautifulSoup(html, "html.parser")
+    
+    # Kill all script and style elements
+    for script_or_style in soup(["script", "style"]):
+        script_or_style.decompose()
+    
+    # Get all text, strip whitespace from each piece, one piece per line
+    return "\n".join(t.strip() for t in soup.stripped_strings)
+
+
 def _get_text_from_url(url: str) -> str | None:
     """
     Fetches a URL and returns all visible, stripped text.
     Returns None if the request fails.
     """
+    # Recently scraped? Use the cached text without touching the network.
+    variant = cache_variant()
+    cached = scrape_cache.lookup(url, variant)
+    if cached and cached["fresh"]:
+        return cached["text"]
+
     try:
-        # Set a user-agent to look like a real browser, not a script
-        headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.36'}
-        response = requests.get(url, headers=headers, timeout=10)
-        
-        # This will raise an error for 4xx or 5xx responses
-        response.raise_for_status() 
+        # Ask the server "has this changed?" if we have an older copy
+        fast = EXTRACT_MODE == "fast"
+        # Per-domain rate limit; fails fast if this site keeps erroring or timing out
+        with rate_limiter.for_domain(url).slot():
+            response = _session.get(url, headers=scrape_cache.conditional_headers(cached), timeout=10, stream=fast)
+            if response.status_code == 429 or response.status_code >= 500:
+                response.close()
+                response.raise_for_status()  # Reported to the limiter as throttled / failed
         
-        soup = BeautifulSoup(response.text, "html.parser")
+        with response:
+            if response.status_code == 304 and cached:
+                return scrape_cache.revalidated(url, variant, cached, response.headers)
+            
+            # This will raise an error for 4xx or 5xx responses
+            response.raise_for_status() 
+            
+            if fast:
+                # Only reads as much of the body as the prompt needs
+                text = html_extract.extract_from_chunks(
+                    response.iter_content(html_extract.CHUNK_SIZE),
+                    encoding=html_extract.encoding_from_content_type(response.headers.get("Content-Type"))
+                )
+            else:
+                text = _extract_visible_text(response.text)
         
-        # Kill all script and style elements
-        for script_or_style in soup(["script", "style"]):
-            script_or_style.decompose()
-        
-        # Get all text, strip whitespace from each piece, and join with a space
-        text = " ".join(t.strip() for t in soup.stripped_strings)
+        scrape_cache.store(url, variant, text, response.headers)
         return text
 
     except requests.exceptions.RequestException as e:
         print(f"Error (Person 3): Failed to scrape {url}. Error: {e}")
         return None
+    except rate_limiter.CircuitOpenError as e:
+        print(f"Error (Person 3): Skipping {url}. {e}")
+        return None
 
-def analyze_my_business(url: str, description: str) -> str:
+def analyze_my_business(url: str, description: str, text: str | None = None) -> str:
     """
     Analyzes the user's own site to extract key B2B services.
+
+    text: Already-scraped website text (e.g. from async_fetcher). If given,
+          the URL is not fetched again.
     """
     print(f"Analyzing our business at {url}...")
-    text = _get_text_from_url(url)
+    if text is None:
+        text = _get_text_from_url(url)
     
     if not text:
         print("Warning (Person 3): Scraping our URL failed. Falling back to user description.")
@@ -43,8 +104,8 @@ def analyze_my_business(url: str, description: str) -> str:
         return description 
     
     # Combine scraped text with the user's description for more context
-    # Limit text to avoid exceeding model context
-    full_context = f"User Description: {description}\n\nWebsite Text: {text[:4000]}"
+    # Keep the most relevant sentences that fit the prompt's token budget
+    full_context = f"User Description: {description}\n\nWebsite Text: {compaction.compact(text, query=description)}"
     
     prompt = f"""
     Given the following context about a B2B company, identify and list 
@@ -56,9 +117,9 @@ def analyze_my_business(url: str, description: str) -> str:
     """
     
     try:
-        response = ollama.chat(
-            model='llama3:8b', 
-            messages=[{'role': 'user', 'content': prompt}]
+        response = inference.chat(
+            messages=[{'role': 'user', 'content': prompt}],
+            priority=inference.PRIORITY_SELF  # Everything else waits for our services list
         )
         return response['message']['content']
     except Exception as e:
@@ -66,13 +127,17 @@ def analyze_my_business(url: str, description: str) -> str:
         # If AI fails, just return the basic description
         return description
 
-def analyze_client(url: str) -> dict | None:
+def analyze_client(url: str, text: str | None = None) -> dict | None:
     """
     Analyzes a potential client's website.
     Returns a dictionary with their summary and industry, or None.
+
+    text: Already-scraped website text. If given, the URL is not fetched again
+          (used by the concurrent pipeline, which scrapes in its own stage).
     """
     print(f"Analyzing client: {url}...")
-    text = _get_text_from_url(url)
+    if text is None:
+        text = _get_text_from_url(url)
     if not text:
         return None # If scraping fails, we can't analyze.
     
@@ -89,17 +154,17 @@ def analyze_client(url: str) -> dict | None:
     {{"summary": "...", "industry": "..."}}
 
     Website Text:
-    {text[:4000]}
+    {compaction.compact(text)}
     """
     
     try:
-        response = ollama.chat(
-            model='llama3:8b', 
+        response = inference.chat(
             messages=[
                 {'role': 'system', 'content': system_prompt},
                 {'role': 'user', 'content': user_prompt}
             ],
-            format='json' # This tells Ollama to *force* JSON output
+            format='json', # This tells Ollama to *force* JSON output
+            priority=inference.PRIORITY_LEAD
         )
         
         # --- THIS IS THE FIX ---
@@ -0,0 +1,125 @@
+# analytics.py
+# The reports behind 'analyze', over the local lead store.
+#
+# lead_store.LeadStore keeps the SQLite mirror of the sheet (synced
+# incrementally, with the company domain, email word count and upload status
+# computed once per row while syncing). Every report here is an aggregate
+# query that SQLite answers from one narrow index on the columns it needs (see
+# LeadStore.__init__), and only a few dozen rows come back to Python. No
+# pandas: importing it alone takes longer than the whole report over 100k+ leads.
+import math
+
+
+# --- CONFIGURATION ---
+EMAIL_WORD_BINS = [0, 50, 100, 150, 200, 300]  # Histogram edges; the last bin is open-ended
+EMAIL_PERCENTILES = [0.5, 0.9, 0.99]
+# --- END CONFIGURATION ---
+
+# SQL expression for the period a lead was logged in (logged_at is "YYYY-MM-DDTHH:MM:SSZ")
+_PERIODS = {
+    "D": "substr(logged_at, 1, 10)",
+    "W": "date(substr(logged_at, 1, 10), 'weekday 0', '-6 days')",  # The Monday starting the week
+    "M": "substr(logged_at, 1, 7)",
+}
+_LEADS = "FROM leads WHERE url != ''"
+
+
+def industry_counts(store) -> list[tuple[str, int]]:
+    """(industry, leads), most common first."""
+    return store.industry_counts()
+
+
+def industry_over_time(store, period: str = "M") -> tuple[list[str], list[str], dict]:
+    """
+    Leads logged per period ("D", "W" or "M") and industry. Undated rows are left out.
+    Returns (periods, industries by total, {(period, industry): leads}).
+    """
+    rows = store.query(
+        f"SELECT {_PERIODS[period]} AS period, industry, COUNT(*) {_LEADS} "
+        "AND logged_at >= '0' AND logged_at GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]*' "  # (>= picks the index)
+        "GROUP BY period, industry"
+    )
+    counts, totals = {}, {}
+    for when, industry, n in rows:
+        counts[(when, industry)] = n
+        totals[industry] = totals.get(industry, 0) + n
+    periods = sorted({when for when, _, _ in rows})
+    industries = sorted(totals, key=lambda industry: (-totals[industry], industry))
+    return periods, industries, counts
+
+
+def duplicate_domains(store, top: int = 10) -> tuple[float, list[tuple[str, int]]]:
+    """
+    (share of leads whose company domain was already logged, the most repeated domains).
+    Uses the same registrable-domain rule as the dedup step in 'run'.
+    """
+    # (Counting the groups uses the domain index; COUNT(DISTINCT) would sort every row again)
+    distinct, total = store.query(f"SELECT COUNT(*), SUM(n) FROM (SELECT COUNT(*) AS n {_LEADS} GROUP BY domain)")[0]
+    if not total:
+        return 0.0, []
+    repeated = store.query(
+        f"SELECT domain, COUNT(*) AS n {_LEADS} GROUP BY domain HAVING n > 1 ORDER BY n DESC, domain LIMIT ?",
+        (top,)
+    )
+    return (total - distinct) / total, repeated
+
+
+def upload_failures(store) -> list[tuple[str, int, int, float]]:
+    """(industry, leads, failed Drive uploads, failure rate), worst first."""
+    rows = store.query(f"SELECT industry, COUNT(*), SUM(upload_failed) {_LEADS} GROUP BY industry")
+    table = [(industry, leads, failed, failed / leads) for industry, leads, failed in rows]
+    return sorted(table, key=lambda row: (-row[3], -row[1], row[0]))
+
+
+def email_lengths(store) -> tuple[dict, list[tuple[str, int]]]:
+    """
+    (summary statistics of email word counts, histogram over EMAIL_WORD_BINS).
+    Statistics: count, mean, min, max and the EMAIL_PERCENTILES (keyed "50%", ...),
+    interpolated linearly like numpy/pandas.
+    """
+    # Emails have a few hundred distinct lengths at most: fetch (length, leads) and work from that
+    distribution = store.query(f"SELECT email_words, COUNT(*) {_LEADS} GROUP BY email_words ORDER BY email_words")
+    count = sum(n for _, n in distribution)
+    labels = [f"{low}-{high - 1}" for low, high in zip(EMAIL_WORD_BINS, EMAIL_WORD_BINS[1:])]
+    labels.append(f"{EMAIL_WORD_BINS[-1]}+")
+    histogram = dict.fromkeys(labels, 0)
+    if not count:
+        return {"count": 0}, list(histogram.items())
+
+    stats = {
+        "count": count,
+        "mean": sum(words * n for words, n in distribution) / count,
+        "min": distribution[0][0],
+        "max": distribution[-1][0],
+    }
+    for p in EMAIL_PERCENTILES:
+        position = p * (count - 1)
+        low, high = _nth(distribution, math.floor(position)), _nth(distribution, math.ceil(position))
+        stats[f"{p:.0%}"] = low + (high - low) * (position - math.floor(position))
+
+    for words, n in distribution:
+        for label, low in zip(reversed(labels), reversed(EMAIL_WORD_BINS)):
+            if words >= low:
+                histogram[label] += n
+                break
+    return stats, list(histogram.items())
+
+
+def _nth(distribution: list[tuple[int, int]], index: int) -> int:
+    """The index-th smallest value of a sorted (value, count) distribution."""
+    for value, n in distribution:
+        if index < n:
+            return value
+        index -= n
+    return distribution[-1][0]
+
+
+def format_table(headers: list[str], rows: list[tuple]) -> str:
+    """Plain-text table: the first column left-aligned, the others right-aligned."""
+    cells = [[str(h) for h in headers]] + [[str(value) for value in row] for row in rows]
+    widths = [max(len(row[i]) for row in cells) for i in range(len(headers))]
+    lines = []
+    for row in cells:
+        first = row[0].ljust(widths[0])
+        lines.append("  ".join([first] + [value.rjust(width) for value, width in zip(row[1:], widths[1:])]))
+    return "\n".join(lines)
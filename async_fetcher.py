@@ -0,0 +1,222 @@
+# async_fetcher.py
+# asyncio-native scraping path that sits beside analysis_engine._get_text_from_url.
+#
+# All fetches share ONE aiohttp session, so connections (and TLS handshakes)
+# are pooled and reused per host. These limits keep us polite:
+#   - max_concurrency:     total requests in flight at once
+#   - per_domain_limit:    requests in flight to the same domain at once
+#   - per_domain_delay:    minimum seconds between two requests to the same domain
+#
+# Pages go through scrape_cache, exactly like the sync path. Its SQLite calls
+# block, so they run in the default executor instead of on the event loop.
+#
+# Usage (from sync code, e.g. the pipeline's scrape workers):
+#   with async_fetcher.BackgroundFetcher() as fetcher:
+#       text = fetcher.fetch_text(url)  # Safe to call from many threads at once
+import asyncio
+import threading
+import time
+from urllib.parse import urlsplit
+
+try:
+    import aiohttp
+except ModuleNotFoundError:  # Optional: the sync requests path still works without it
+    aiohttp = None
+
+import analysis_engine
+import html_extract
+import rate_limiter
+import scrape_cache
+
+
+# --- CONFIGURATION ---
+MAX_CONCURRENCY = 64
+PER_DOMAIN_LIMIT = 2
+PER_DOMAIN_DELAY = 0.0
+TIMEOUT_SECONDS = 10
+# --- END CONFIGURATION ---
+
+
+def is_available() -> bool:
+    """True if aiohttp is installed and the async path can be used."""
+    return aiohttp is not None
+
+
+class AsyncFetcher:
+    """
+    Fetches many URLs concurrently over a pooled aiohttp session.
+
+    Use it as an async context manager:
+        async with AsyncFetcher() as fetcher:
+            texts = await asyncio.gather(*(fetcher.fetch_text(url) for url in urls))
+    """
+
+    def __init__(self, max_concurrency: int = MAX_CONCURRENCY,
+                 per_domain_limit: int = PER_DOMAIN_LIMIT,
+                 per_domain_delay: float = PER_DOMAIN_DELAY,
+                 timeout: float = TIMEOUT_SECONDS):
+        if aiohttp is None:
+            raise RuntimeError("aiohttp is not installed. Run 'pip install aiohttp' to use the async scraper.")
+        self.max_concurrency = max_concurrency
+        self.per_domain_limit = per_domain_limit
+        self.per_domain_delay = per_domain_delay
+        self.timeout = timeout
+
+        self._session = None
+        self._global_limit = None
+        self._domain_limits = {}   # domain -> asyncio.Semaphore
+        self._domain_last = {}     # domain -> time of the last request start
+        self._domain_locks = {}    # domain -> asyncio.Lock (guards _domain_last)
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def open(self):
+        connector = aiohttp.TCPConnector(
+            limit=self.max_concurrency,
+            limit_per_host=self.per_domain_limit,
+            ttl_dns_cache=300
+        )
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            headers=analysis_engine.HEADERS,
+            timeout=aiohttp.ClientTimeout(total=self.timeout)
+        )
+        self._global_limit = asyncio.Semaphore(self.max_concurrency)
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    # --- Politeness ---
+
+    def _domain(self, url: str) -> str:
+        return urlsplit(url).hostname or ""
+
+    async def _wait_for_domain_turn(self, domain: str):
+        if self.per_domain_delay <= 0:
+            return
+        lock = self._domain_locks.setdefault(domain, asyncio.Lock())
+        async with lock:
+            wait = self._domain_last.get(domain, 0) + self.per_domain_delay - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._domain_last[domain] = time.monotonic()
+
+    # --- Fetching ---
+
+    async def fetch_text(self, url: str) -> str | None:
+        """
+        Downloads one URL and returns its visible text, or None on failure.
+        Uses the scrape cache: fresh pages skip the request, and a
+        304 Not Modified reply skips the download and the parse.
+        """
+        loop = asyncio.get_running_loop()
+        variant = analysis_engine.cache_variant()
+        cached = await loop.run_in_executor(None, scrape_cache.lookup, url, variant)
+        if cached and cached["fresh"]:
+            return cached["text"]
+
+        domain = self._domain(url)
+        limiter = rate_limiter.for_domain(url)
+        try:
+            delay = limiter.admit()  # Shared with the sync path: token bucket + circuit breaker
+        except rate_limiter.CircuitOpenError as e:
+            print(f"Error (Async Fetcher): Skipping {url}. {e}")
+            return None
+        # From here on exactly one outcome must be recorded, even if this task is
+        # cancelled or something below raises: a half-open breaker waits for it
+        outcome, latency = rate_limiter.FAILED, 0.0
+        try:
+            domain_limit = self._domain_limits.setdefault(domain, asyncio.Semaphore(self.per_domain_limit))
+            async with self._global_limit, domain_limit:
+                if delay:
+                    await asyncio.sleep(delay)
+                await self._wait_for_domain_turn(domain)
+                started = time.perf_counter()
+                try:
+                    async with self._session.get(url, headers=scrape_cache.conditional_headers(cached)) as response:
+                        if response.status == 429:
+                            outcome = rate_limiter.THROTTLED
+                        elif response.status < 500:
+                            outcome, latency = rate_limiter.OK, time.perf_counter() - started
+                        if response.status == 304 and cached:
+                            return await loop.run_in_executor(
+                                None, scrape_cache.revalidated, url, variant, cached, response.headers
+                            )
+                        response.raise_for_status()
+                        response_headers = response.headers
+                        if analysis_engine.EXTRACT_MODE == "fast":
+                            # lxml is fast enough to feed chunk by chunk right here,
+                            # and we stop reading the body as soon as we have enough text
+                            extractor = html_extract.StreamingExtractor(
+                                encoding=html_extract.encoding_from_content_type(response.headers.get("Content-Type"))
+                            )
+                            async for chunk in response.content.iter_chunked(html_extract.CHUNK_SIZE):
+                                if extractor.feed(chunk):
+                                    break
+                            text = extractor.text()
+                            html = None
+                        else:
+                            html = await response.text(errors="replace")
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    if not isinstance(e, aiohttp.ClientResponseError):  # Connection errors, body timeouts
+                        outcome = rate_limiter.FAILED
+                    print(f"Error (Async Fetcher): Failed to scrape {url}. Error: {e}")
+                    return None
+        finally:
+            limiter.record(outcome, latency)
+
+        if html is not None:
+            # A full BeautifulSoup parse is CPU work, so keep it off the event loop
+            text = await loop.run_in_executor(None, analysis_engine._extract_visible_text, html)
+        await loop.run_in_executor(None, scrape_cache.store, url, variant, text, response_headers)
+        return text
+
+
+class BackgroundFetcher:
+    """
+    Runs an AsyncFetcher on its own event-loop thread so that ordinary threads
+    (like the pipeline's scrape workers) can share its connection pool.
+    """
+
+    def __init__(self, **fetcher_options):
+        self._options = fetcher_options
+        self._loop = None
+        self._thread = None
+        self._fetcher = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def start(self):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="cyforge-fetcher", daemon=True)
+        self._thread.start()
+        self._fetcher = AsyncFetcher(**self._options)
+        self._call(self._fetcher.open())
+
+    def stop(self):
+        if self._loop is None:
+            return
+        self._call(self._fetcher.close())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._loop = None
+
+    def _call(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def fetch_text(self, url: str) -> str | None:
+        """Blocking fetch of one URL (safe to call from any thread)."""
+        return self._call(self._fetcher.fetch_text(url))
@@ -0,0 +1,284 @@
+# benchmarks/bench_pipeline.py
+# Offline, end-to-end throughput benchmark for 'main.py run'.
+#
+# The real command runs against the local fakes in benchmarks/fakes.py (company
+# websites, Ollama, SerpAPI, Google Sheets and Drive), so it needs no network
+# and no API keys. For every lead count it reports leads per minute, p50/p95
+# latency of each pipeline step (from LeadResult.timings) and peak memory.
+#
+# Usage (from the project root):
+#   python benchmarks/bench_pipeline.py                          # 10, 100 and 1000 leads
+#   python benchmarks/bench_pipeline.py --leads 10 --leads 100 --llm-latency 0.5
+#   python benchmarks/bench_pipeline.py --save results.json
+#   python benchmarks/bench_pipeline.py --baseline results.json  # Exit code 1 on a throughput regression
+#
+# Each lead count runs in its own Python process with an empty cache directory,
+# so caches start cold and peak memory is measured per run.
+import json
+import math
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import redirect_stderr, redirect_stdout
+from functools import partial
+
+import typer
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+
+# The same services the fake Ollama server "finds" on our own site
+SERVICES_PER_RUN = 3
+
+app = typer.Typer(add_completion=False, help="Offline throughput benchmark for the CyForge pipeline.")
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """Nearest-rank percentile (pct in 0-100)."""
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def _max_rss_mb(who: int) -> float:
+    rss = resource.getrusage(who).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+# --- One benchmark run (child process) ---
+
+def run_once(lead_count: int, options: dict) -> dict:
+    """Runs 'main.py run' once against fresh fakes and returns the measurements."""
+    cache_dir = tempfile.mkdtemp(prefix="cyforge-bench-")
+    # Must be set before the CyForge modules are imported (they read it at import time)
+    os.environ["CYFORGE_CACHE_DIR"] = cache_dir
+    os.environ["SERPAPI_KEY"] = "benchmark"
+    os.environ["NO_PROXY"] = os.environ["no_proxy"] = "127.0.0.1,localhost"
+
+    sys.path.insert(0, REPO_ROOT)
+    import fakes
+
+    sites = fakes.FakeSiteServer(latency=options["site_latency"]).start()
+    ollama_server = fakes.FakeOllamaServer(
+        latency=options["llm_latency"],
+        tokens_per_second=options["tokens_per_second"],
+        parallel=options["ollama_parallel"],
+    ).start()
+    os.environ["OLLAMA_HOST"] = ollama_server.base_url
+
+    import async_fetcher
+    import database_manager
+    import discovery_engine
+    import main
+    import pipeline
+    import rate_limiter
+
+    google = fakes.FakeGoogle(latency=options["google_latency"])
+    google.install(database_manager)
+
+    serpapi = fakes.CannedSerpApi(sites, lead_count, latency=options["serp_latency"])
+    discovery_engine._search_live = serpapi
+    discovery_engine.SERPAPI_API_KEY = "benchmark"
+
+    # Every fake site lives on 127.0.0.1, so the per-domain politeness limit
+    # would turn the whole scrape stage into 2 connections. Lift it.
+    async_fetcher_class = async_fetcher.BackgroundFetcher
+    pipeline.async_fetcher.BackgroundFetcher = partial(async_fetcher_class, per_domain_limit=options["scrape_workers"])
+    rate_limiter.SITE_LIMITS["rate"] = None
+
+    pipelines = []
+
+    class RecordingPipeline(pipeline.LeadPipeline):
+        def process(self, *args, **kwargs):
+            pipelines.append(self)
+            return super().process(*args, **kwargs)
+
+    pipeline.LeadPipeline = RecordingPipeline
+
+    query_count = SERVICES_PER_RUN * len(discovery_engine.QUERY_TEMPLATES)
+    pages_needed = math.ceil(lead_count / discovery_engine.RESULTS_PER_PAGE)
+    args = [
+        "run", f"{sites.base_url}/",
+        "--desc", "We sell AI-powered cybersecurity audits for SaaS and FinTech companies.",
+        "--dedup-by", "url",  # Every fake company shares the 127.0.0.1 "domain"
+        "--serp-pages", str(math.ceil(pages_needed / query_count) + 1),
+        "--serp-credits", str(pages_needed + query_count),
+        "--scrape-workers", str(options["scrape_workers"]),
+        "--llm-workers", str(options["llm_workers"]),
+        "--ollama-parallel", str(options["ollama_parallel"]),
+        "--pdf-workers", str(options["pdf_workers"]),
+        "--io-workers", str(options["io_workers"]),
+        *options["run_args"],
+    ]
+
+    log_path = os.path.join(cache_dir, "run.log")
+    started = time.perf_counter()
+    with open(log_path, "w", encoding="utf-8") as log, redirect_stdout(log), redirect_stderr(log):
+        try:
+            exit_code = main.app(args, standalone_mode=False) or 0
+        except SystemExit as e:
+            exit_code = e.code or 0
+        except Exception as e:
+            print(f"Benchmark run crashed: {e!r}")
+            exit_code = 1
+    elapsed = time.perf_counter() - started
+
+    ollama_server.stop()
+    sites.stop()
+
+    results = [result for p in pipelines for result in p.results]
+    statuses = {}
+    step_timings = {}
+    for result in results:
+        statuses[result.status] = statuses.get(result.status, 0) + 1
+        for step, seconds in result.timings.items():
+            step_timings.setdefault(step, []).append(seconds)
+
+    processed = statuses.get("processed", 0)
+    return {
+        "leads": lead_count,
+        "exit_code": exit_code,
+        "statuses": statuses,
+        "seconds": elapsed,
+        "leads_per_minute": processed / elapsed * 60 if elapsed else 0.0,
+        "steps": {
+            step: {"p50": percentile(values, 50), "p95": percentile(values, 95), "count": len(values)}
+            for step, values in step_timings.items()
+        },
+        "peak_rss_mb": _max_rss_mb(resource.RUSAGE_SELF),
+        "peak_worker_rss_mb": _max_rss_mb(resource.RUSAGE_CHILDREN),  # Largest PDF worker process
+        "ollama_requests": ollama_server.requests,
+        "serpapi_calls": serpapi.calls,
+        "sheet_rows": max(0, len(google.sheet.rows) - 1),
+        "sheets_calls": google.sheet.calls + google.open_calls,
+        "drive_files": len(google.drive_files),
+        "log": log_path,
+    }
+
+
+# --- Reporting ---
+
+def print_report(run: dict):
+    statuses = ", ".join(f"{count} {status}" for status, count in sorted(run["statuses"].items())) or "no leads"
+    typer.secho(f"\n=== {run['leads']} leads ===", fg=typer.colors.CYAN, bold=True)
+    typer.echo(f"Leads:       {statuses} (exit code {run['exit_code']})")
+    typer.echo(f"Wall time:   {run['seconds']:.1f}s  ->  {run['leads_per_minute']:.1f} leads/min")
+    typer.echo(f"Peak memory: {run['peak_rss_mb']:.0f} MB (main process), {run['peak_worker_rss_mb']:.0f} MB (largest worker)")
+    typer.echo(
+        f"Traffic:     {run['ollama_requests']} Ollama requests, {run['serpapi_calls']} SerpAPI calls, "
+        f"{run['sheet_rows']} sheet rows ({run.get('sheets_calls', '?')} Sheets API calls), {run['drive_files']} Drive files"
+    )
+    typer.echo(f"{'step':<20}{'p50 ms':>10}{'p95 ms':>10}{'n':>8}")
+    for step, stats in run["steps"].items():
+        typer.echo(f"{step:<20}{stats['p50'] * 1000:>10.1f}{stats['p95'] * 1000:>10.1f}{stats['count']:>8}")
+    typer.echo(f"Log:         {run['log']}")
+
+
+def compare_to_baseline(runs: list[dict], baseline_path: str, tolerance: float) -> bool:
+    """True if no lead count got more than `tolerance` slower (in leads/min) than the baseline."""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {run["leads"]: run for run in json.load(f)}
+
+    ok = True
+    typer.secho("\n=== Compared to baseline ===", fg=typer.colors.CYAN, bold=True)
+    for run in runs:
+        before = baseline.get(run["leads"])
+        if not before or not before["leads_per_minute"]:
+            typer.echo(f"{run['leads']:>6} leads: no baseline")
+            continue
+        change = run["leads_per_minute"] / before["leads_per_minute"] - 1
+        regressed = change < -tolerance
+        ok = ok and not regressed
+        typer.secho(
+            f"{run['leads']:>6} leads: {before['leads_per_minute']:.1f} -> {run['leads_per_minute']:.1f} leads/min ({change:+.0%})",
+            fg=typer.colors.RED if regressed else typer.colors.GREEN
+        )
+    return ok
+
+
+# --- CLI ---
+
+def _without_option(argv: list[str], name: str) -> list[str]:
+    """argv minus every '--name value' / '--name=value' pair."""
+    kept = []
+    skip_value = False
+    for arg in argv:
+        if skip_value:
+            skip_value = False
+        elif arg == name:
+            skip_value = True
+        elif not arg.startswith(name + "="):
+            kept.append(arg)
+    return kept
+
+
+@app.command()
+def bench(
+    leads: list[int] = typer.Option([10, 100, 1000], "--leads", help="Lead counts to benchmark (repeat the option)"),
+    llm_latency: float = typer.Option(0.2, "--llm-latency", help="Fake Ollama: seconds per request before the first token"),
+    tokens_per_second: float = typer.Option(400.0, "--tokens-per-second", help="Fake Ollama: output tokens per second"),
+    ollama_parallel: int = typer.Option(1, "--ollama-parallel", help="Fake Ollama: requests served at once (OLLAMA_NUM_PARALLEL)"),
+    site_latency: float = typer.Option(0.05, "--site-latency", help="Fake websites: seconds per page"),
+    serp_latency: float = typer.Option(0.3, "--serp-latency", help="Fake SerpAPI: seconds per search"),
+    google_latency: float = typer.Option(0.1, "--google-latency", help="Fake Sheets/Drive: seconds per API call"),
+    scrape_workers: int = typer.Option(8, "--scrape-workers"),
+    llm_workers: int = typer.Option(2, "--llm-workers"),
+    pdf_workers: int = typer.Option(2, "--pdf-workers"),
+    io_workers: int = typer.Option(4, "--io-workers"),
+    run_args: list[str] = typer.Option([], "--run-arg", help="Extra flag passed to 'main.py run' (e.g. --run-arg=--fused)"),
+    save: str = typer.Option(None, "--save", help="Write the results to this JSON file"),
+    baseline: str = typer.Option(None, "--baseline", help="Compare leads/min against a JSON file from --save"),
+    tolerance: float = typer.Option(0.15, "--tolerance", help="Allowed leads/min drop vs. the baseline (0.15 = 15%)"),
+    child_result: str = typer.Option(None, "--child-result", hidden=True),
+):
+    """
+    Runs the full pipeline against local fakes and reports throughput, latency and memory.
+    """
+    options = {
+        "llm_latency": llm_latency, "tokens_per_second": tokens_per_second, "ollama_parallel": ollama_parallel,
+        "site_latency": site_latency, "serp_latency": serp_latency, "google_latency": google_latency,
+        "scrape_workers": scrape_workers, "llm_workers": llm_workers, "pdf_workers": pdf_workers,
+        "io_workers": io_workers, "run_args": list(run_args),
+    }
+
+    if child_result:
+        with open(child_result, "w", encoding="utf-8") as f:
+            json.dump(run_once(leads[0], options), f)
+        return
+
+    runs = []
+    for lead_count in leads:
+        typer.echo(f"Benchmarking {lead_count} leads...")
+        with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+            result_path = f.name
+        # Re-run this script for one lead count, with all the other options unchanged
+        completed = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), *_without_option(sys.argv[1:], "--leads"),
+             "--leads", str(lead_count), "--child-result", result_path]
+        )
+        if completed.returncode != 0:
+            typer.secho(f"Benchmark for {lead_count} leads crashed (exit code {completed.returncode}).", fg=typer.colors.RED)
+            continue
+        with open(result_path, encoding="utf-8") as f:
+            run = json.load(f)
+        os.remove(result_path)
+        runs.append(run)
+        print_report(run)
+
+    if save:
+        with open(save, "w", encoding="utf-8") as f:
+            json.dump(runs, f, indent=2)
+        typer.echo(f"\nSaved results to {save}")
+
+    if baseline and not compare_to_baseline(runs, baseline, tolerance):
+        raise typer.Exit(code=1)
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,466 @@
+# benchmarks/fakes.py
+# Local stand-ins for everything 'main.py run' talks to over the network:
+#
+#   FakeSiteServer   - HTTP server with one synthetic company website per lead
+#   FakeOllamaServer - /api/chat and /api/tags with configurable latency and tokens/sec
+#   CannedSerpApi    - replaces discovery_engine._search_live with canned organic results
+#   FakeGoogle       - in-memory Sheet + Drive, patched in at the gspread/googleapiclient boundary
+#
+# Nothing here opens a connection outside 127.0.0.1.
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+INDUSTRIES = ["FinTech", "SaaS", "Healthcare", "E-commerce", "Manufacturing", "Logistics", "Gaming"]
+
+# Synthetic page text is drawn from this vocabulary. Every site gets its own
+# random word order, so pages are NOT near-duplicates of each other.
+VOCABULARY = (
+    "secure cloud platform payments compliance audit data analytics customer "
+    "engineering team scale growth infrastructure automation pipeline mobile "
+    "retail warehouse shipping logistics patient clinic insurance lending "
+    "banking ledger fraud detection identity access monitoring incident response "
+    "developer api integration dashboard reporting forecast inventory supply "
+    "chain partner enterprise startup market global regional service quality"
+).split()
+
+
+class _QuietHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, like a real web server
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body: bytes, content_type: str, headers: dict | None = None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        if body and self.command != "HEAD":
+            self.wfile.write(body)
+
+
+class _BackgroundServer:
+    """Runs a ThreadingHTTPServer on a free 127.0.0.1 port in a daemon thread."""
+
+    handler_class = _QuietHandler
+
+    def __init__(self):
+        self._server = None
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        handler = type(f"{type(self).__name__}Handler", (self.handler_class,), {"owner": self})
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name=type(self).__name__, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+# --- Company websites ---
+
+def company_page(index: int, words: int = 600) -> bytes:
+    """A deterministic, unique HTML page for company #index (index 0 is our own site)."""
+    rng = random.Random(index)
+    industry = INDUSTRIES[index % len(INDUSTRIES)]
+    name = f"Company {index}" if index else "CyForge"
+    body = " ".join(rng.choice(VOCABULARY) for _ in range(words))
+    paragraphs = "".join(f"<p>{body[i:i + 400]}</p>" for i in range(0, len(body), 400))
+    return f"""<!DOCTYPE html>
+<html><head><title>{name} - {industry} solutions</title>
+<meta name="description" content="{name} builds {industry} software.">
+<style>body {{ font-family: sans-serif; }}</style>
+<script>var analytics = "{'x' * 2000}";</script>
+</head><body>
+<nav><a href="/">Home</a> <a href="/about">About</a> <a href="/contact">Contact</a></nav>
+<main><h1>{name}</h1><h2>Leading {industry} company</h2>{paragraphs}</main>
+<footer>Copyright {name}. All rights reserved.</footer>
+</body></html>""".encode("utf-8")
+
+
+class _SiteHandler(_QuietHandler):
+
+    def do_GET(self):
+        match = re.fullmatch(r"/(?:company-(\d+))?/?", self.path.split("?")[0])
+        if not match:
+            self._send(404, b"Not found", "text/plain")
+            return
+        index = int(match.group(1) or 0)
+        body = company_page(index, self.owner.words_per_page)
+        etag = '"' + hashlib.md5(body).hexdigest() + '"'
+        if self.headers.get("If-None-Match") == etag:
+            self._send(304, b"", "text/html; charset=utf-8", {"ETag": etag})
+            return
+        if self.owner.latency:
+            time.sleep(self.owner.latency)
+        self._send(200, body, "text/html; charset=utf-8", {"ETag": etag})
+
+    do_HEAD = do_GET
+
+
+class FakeSiteServer(_BackgroundServer):
+    """Serves our own site at / and company #i at /company-i."""
+
+    handler_class = _SiteHandler
+
+    def __init__(self, latency: float = 0.0, words_per_page: int = 600):
+        super().__init__()
+        self.latency = latency
+        self.words_per_page = words_per_page
+
+    def company_url(self, index: int) -> str:
+        return f"{self.base_url}/company-{index}"
+
+
+# --- Ollama ---
+
+def _fake_reply(request: dict) -> str:
+    """Picks a plausible answer for whichever CyForge prompt this is."""
+    prompt = request["messages"][-1]["content"]
+    digest = int(hashlib.md5(prompt.encode("utf-8")).hexdigest(), 16)
+    industry = INDUSTRIES[digest % len(INDUSTRIES)]
+    email = (
+        f"As a leader in the {industry} space, you move fast.\n\n"
+        "Fast-moving teams often ship code before it has been reviewed for security issues. "
+        "Our AI Code Vulnerability Audits find those problems before attackers do.\n\n"
+        "Are you free for a 15-minute call next week?\n\n"
+        "Best regards,\nEshan Jameel\nCo-founder, CyForge\n\n"
+        "P.S. We also run free security workshops for engineering teams every quarter."
+    )
+    if request.get("format") == "json":
+        return json.dumps({
+            # Unique per page, so every email prompt is different (no LLM cache hits)
+            "summary": f"A {industry} company (#{digest % 100000}) that builds software for its customers.",
+            "industry": industry,
+            "email": email,
+        })
+    if "comma-separated list" in prompt:
+        return "AI Code Vulnerability Audits, Automated DevSecOps Integration, Compliance-as-a-Service"
+    return email
+
+
+class _OllamaHandler(_QuietHandler):
+
+    def do_GET(self):
+        if self.path.startswith("/api/tags"):
+            self._send(200, json.dumps({"models": [{"name": "llama3:8b", "model": "llama3:8b"}]}).encode(), "application/json")
+        elif self.path.startswith("/api/version"):
+            self._send(200, b'{"version": "0.0.0-fake"}', "application/json")
+        else:
+            self._send(404, b"{}", "application/json")
+
+    def do_POST(self):
+        if not self.path.startswith("/api/chat"):
+            self._send(404, b"{}", "application/json")
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        owner = self.owner
+        if not request.get("messages"):
+            # An empty chat just loads the model (inference.warm_up)
+            body = {"model": request.get("model"), "message": {"role": "assistant", "content": ""},
+                    "done": True, "done_reason": "load"}
+            self._send(200, json.dumps(body).encode("utf-8"), "application/json")
+            return
+        with owner.slots:  # Like OLLAMA_NUM_PARALLEL: extra requests queue up
+            reply = _fake_reply(request)
+            tokens = reply.split(" ")
+            num_predict = (request.get("options") or {}).get("num_predict")
+            if num_predict and num_predict > 0:
+                tokens = tokens[:num_predict]
+            prompt_tokens = sum(len(m.get("content", "").split()) for m in request["messages"])
+            started = time.perf_counter()
+            time.sleep(owner.latency)
+            if request.get("stream", True):
+                self._stream(request, tokens, prompt_tokens, started)
+            else:
+                time.sleep(len(tokens) / owner.tokens_per_second)
+                body = self._final_chunk(request, reply, len(tokens), prompt_tokens, started)
+                self._send(200, json.dumps(body).encode("utf-8"), "application/json")
+        with owner.lock:
+            owner.requests += 1
+
+    def _final_chunk(self, request, content, eval_count, prompt_tokens, started):
+        elapsed_ns = int((time.perf_counter() - started) * 1e9)
+        return {
+            "model": request.get("model", "llama3:8b"),
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "message": {"role": "assistant", "content": content},
+            "done": True,
+            "done_reason": "stop",
+            "total_duration": elapsed_ns,
+            "load_duration": 0,
+            "prompt_eval_count": prompt_tokens,
+            "prompt_eval_duration": int(self.owner.latency * 1e9),
+            "eval_count": eval_count,
+            "eval_duration": max(0, elapsed_ns - int(self.owner.latency * 1e9)),
+        }
+
+    def _stream(self, request, tokens, prompt_tokens, started):
+        # NDJSON, one chunk per token, sent with chunked transfer encoding
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def write_chunk(data: dict):
+            line = (json.dumps(data) + "\n").encode("utf-8")
+            self.wfile.write(f"{len(line):x}\r\n".encode() + line + b"\r\n")
+            self.wfile.flush()
+
+        try:
+            for i, token in enumerate(tokens):
+                time.sleep(1 / self.owner.tokens_per_second)
+                piece = token if i == 0 else " " + token
+                write_chunk({
+                    "model": request.get("model", "llama3:8b"),
+                    "created_at": datetime.now(timezone.utc).isoformat(),
+                    "message": {"role": "assistant", "content": piece},
+                    "done": False,
+                })
+            write_chunk(self._final_chunk(request, "", len(tokens), prompt_tokens, started))
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # The client stopped reading early (e.g. a generation limit)
+
+
+class FakeOllamaServer(_BackgroundServer):
+    """
+    A stand-in Ollama server. Each chat request costs `latency` seconds
+    (model load + prompt evaluation) plus one output token per 1/tokens_per_second.
+    """
+
+    handler_class = _OllamaHandler
+
+    def __init__(self, latency: float = 0.2, tokens_per_second: float = 400.0, parallel: int = 1):
+        super().__init__()
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.slots = threading.BoundedSemaphore(max(1, parallel))
+        self.lock = threading.Lock()
+        self.requests = 0
+
+
+# --- SerpAPI ---
+
+class CannedSerpApi:
+    """
+    Replacement for discovery_engine._search_live. Hands out the next page of
+    synthetic companies on every call until `lead_count` leads have been returned.
+    """
+
+    def __init__(self, sites: FakeSiteServer, lead_count: int, results_per_page: int = 10, latency: float = 0.0):
+        self.sites = sites
+        self.lead_count = lead_count
+        self.results_per_page = results_per_page
+        self.latency = latency
+        self.calls = 0
+        self._next = 1
+        self._lock = threading.Lock()
+
+    def __call__(self, params: dict) -> dict:
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.calls += 1
+            first = self._next
+            last = min(self.lead_count, first + self.results_per_page - 1)
+            self._next = last + 1
+        if first > last:
+            return {"error": "Google hasn't returned any results for this query."}
+        return {
+            "search_parameters": {key: value for key, value in params.items() if key != "api_key"},
+            "organic_results": [
+                {"position": i, "title": f"Company {i}", "link": self.sites.company_url(i)}
+                for i in range(first, last + 1)
+            ],
+        }
+
+
+# --- Google Sheets / Drive ---
+
+class _Cell:
+    def __init__(self, value):
+        self.value = value
+
+
+class FakeWorksheet:
+    """The parts of gspread.Worksheet that database_manager and lead_store use."""
+
+    def __init__(self, latency: float = 0.0):
+        self.id = 0
+        self.title = "Sheet1"
+        self.index = 0
+        self.spreadsheet = type("FakeSpreadsheet", (), {"id": "benchmark-spreadsheet"})()
+        self.rows = []
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _call(self):
+        with self._lock:
+            self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def acell(self, label: str):
+        self._call()
+        row, col = _cell_index(label)
+        with self._lock:
+            values = self.rows[row - 1] if row <= len(self.rows) else []
+        return _Cell(values[col - 1] if col <= len(values) else None)
+
+    def update_acell(self, label: str, value):
+        self._call()
+        row, col = _cell_index(label)
+        with self._lock:
+            while len(self.rows) < row:
+                self.rows.append([])
+            cells = self.rows[row - 1]
+            cells.extend([""] * (col - len(cells)))
+            cells[col - 1] = value
+
+    def append_row(self, values, value_input_option="RAW"):
+        self.append_rows([values], value_input_option)
+
+    def append_rows(self, values, value_input_option="RAW"):
+        self._call()
+        with self._lock:
+            self.rows.extend(list(row) for row in values)
+
+    def get(self, range_name: str):
+        self._call()
+        start, end = range_name.split(":")
+        first, _ = _cell_index(start)
+        last, _ = _cell_index(end)
+        with self._lock:
+            return [list(row) for row in self.rows[first - 1:last]]
+
+    def get_all_records(self):
+        self._call()
+        with self._lock:
+            headers, *rows = self.rows or [[]]
+            return [dict(zip(headers, row)) for row in rows]
+
+
+def _cell_index(label: str) -> tuple[int, int]:
+    """'B12' -> (12, 2)."""
+    letters, digits = re.fullmatch(r"([A-Z]+)(\d+)", label).groups()
+    column = 0
+    for letter in letters:
+        column = column * 26 + ord(letter) - ord("A") + 1
+    return int(digits), column
+
+
+class _Request:
+    def __init__(self, result, latency: float):
+        self._result = result
+        self._latency = latency
+
+    def execute(self):
+        if self._latency:
+            time.sleep(self._latency)
+        return self._result
+
+
+class _Batch:
+    def __init__(self, callback, latency: float):
+        self._callback = callback
+        self._latency = latency
+        self._requests = []
+
+    def add(self, request, request_id=None):
+        self._requests.append((request, request_id))
+
+    def execute(self):
+        if self._latency:
+            time.sleep(self._latency)  # One round-trip for the whole batch
+        for request, request_id in self._requests:
+            self._callback(request_id, request._result, None)
+
+
+class FakeDrive:
+    """The parts of the Drive v3 client that database_manager uses. Files are kept in `store`."""
+
+    def __init__(self, store: dict, latency: float = 0.0):
+        self.store = store
+        self.latency = latency
+        self._lock = threading.Lock()
+
+    def files(self):
+        return self
+
+    def permissions(self):
+        return self
+
+    def create(self, body=None, media_body=None, fields=None, fileId=None):
+        if fileId is not None:  # permissions().create(...)
+            return _Request({"id": "permission", "fileId": fileId}, self.latency)
+        data = media_body.getbytes(0, media_body.size()) if media_body is not None else b""
+        with self._lock:
+            file_id = f"file-{len(self.store) + 1}"
+            self.store[file_id] = {"name": body.get("name"), "size": len(data)}
+        return _Request({"id": file_id, "webViewLink": f"https://drive.example/{file_id}"}, self.latency)
+
+    def new_batch_http_request(self, callback=None):
+        return _Batch(callback, self.latency)
+
+
+class FakeGoogle:
+    """
+    One in-memory spreadsheet and Drive folder, installed into database_manager
+    by replacing gspread.authorize and googleapiclient's build().
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.sheet = FakeWorksheet(latency)
+        self.drive_files = {}
+        self.latency = latency
+        self.open_calls = 0  # Round trips spent finding the spreadsheet (search + metadata reads)
+
+    def _open(self, round_trips: int):
+        self.open_calls += round_trips
+        if self.latency:
+            time.sleep(round_trips * self.latency)
+        return type("FakeSpreadsheet", (), {"sheet1": self.sheet, "id": self.sheet.spreadsheet.id})()
+
+    def install(self, database_manager):
+        google = self
+
+        class _Client:
+            def open(self, title):
+                return google._open(3)  # Drive search by title, then two metadata reads
+
+            def open_by_key(self, key):
+                return google._open(2)
+
+        database_manager.Database._get_credentials = lambda self: None
+        database_manager.gspread.authorize = lambda creds, **kwargs: _Client()
+        database_manager._cached_worksheet = lambda client, key, properties: google.sheet
+        database_manager.build = lambda *args, **kwargs: FakeDrive(google.drive_files, google.latency)
@@ -0,0 +1,222 @@
+# checkpoint.py
+# Write-ahead journal for 'run', so an interrupted batch can be resumed.
+#
+# Every time a lead finishes a stage, one JSON line is appended (and fsync'ed)
+# to .cache/checkpoints/run-<timestamp>.jsonl together with that stage's output:
+#
+#   discovered -> scraped (text) -> analyzed (client_info) -> emailed (email)
+#   -> rendered (PDF saved next to the journal) -> uploaded (drive_link) -> logged
+#
+# Uploaded files get a separate "shared" record once their sharing permission
+# has been applied (they are shared in batches). Files uploaded but never
+# shared are shared again by the next --resume, even for finished leads.
+#
+# In --dev mode nothing is uploaded or logged; such leads end at "dry_run".
+#
+# 'run --resume' replays the newest journal: finished leads are skipped, and
+# every other lead restarts at its first unfinished stage with the earlier
+# outputs restored, so no scraping or LLM work is done twice.
+#
+# Once every lead in a journal is final, its outputs are no longer needed:
+# compact() rewrites it down to one small record per lead (and deletes its saved
+# PDFs), and prune() keeps only the newest KEEP_JOURNALS journals.
+import glob
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+
+from disk_cache import CACHE_DIR
+
+
+# --- CONFIGURATION ---
+CHECKPOINT_DIR = os.path.join(CACHE_DIR, "checkpoints")
+FSYNC = True  # Flush every record to disk (survives a power cut / preempted VM)
+KEEP_JOURNALS = 10  # Older journals (and their saved PDFs) are deleted by prune()
+# --- END CONFIGURATION ---
+
+# A lead in one of these states is never processed again
+FINAL_STAGES = {"logged", "skipped", "dry_run"}
+
+
+class LeadState:
+    """Everything the journal knows about one lead."""
+
+    def __init__(self, url: str, name: str):
+        self.url = url
+        self.name = name
+        self.stages = set()
+        self.data = {}  # text, client_info, email, pdf_path, drive_link, reason
+
+    @property
+    def finished(self) -> bool:
+        return bool(self.stages & FINAL_STAGES)
+
+
+class Journal:
+    """Append-only checkpoint journal for one run (and the runs that resume it)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.leads = {}  # url -> LeadState, in discovery order
+        self.run_info = {}
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        if os.path.exists(path):
+            self._replay()
+        self._file = open(path, "a", encoding="utf-8")
+
+    # --- Opening ---
+
+    @classmethod
+    def create(cls, directory: str = CHECKPOINT_DIR) -> "Journal":
+        """Starts a new journal file for this run."""
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        path = os.path.join(directory, f"run-{stamp}.jsonl")
+        suffix = 1
+        while os.path.exists(path):
+            suffix += 1
+            path = os.path.join(directory, f"run-{stamp}-{suffix}.jsonl")
+        return cls(path)
+
+    @classmethod
+    def latest(cls, directory: str = CHECKPOINT_DIR) -> "Journal | None":
+        """Reopens the newest journal (for --resume), or None if there is none."""
+        paths = glob.glob(os.path.join(directory, "run-*.jsonl"))
+        if not paths:
+            return None
+        return cls(max(paths, key=os.path.getmtime))
+
+    def _replay(self):
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # A line torn by a crash mid-write
+                if record.get("type") == "run":
+                    self.run_info.update(record.get("data", {}))
+                elif record.get("type") == "lead":
+                    self._apply(record)
+
+    def _apply(self, record: dict) -> LeadState:
+        state = self.leads.get(record["url"])
+        if state is None:
+            state = self.leads[record["url"]] = LeadState(record["url"], record.get("name", record["url"]))
+        if record["stage"] != "failed":  # Failed leads are simply retried
+            state.stages.add(record["stage"])
+        state.data.update(record.get("data", {}))
+        return state
+
+    # --- Writing ---
+
+    def _append(self, record: dict):
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+            if FSYNC:
+                os.fsync(self._file.fileno())
+
+    def record_run(self, **data):
+        """Saves run-level results (e.g. the services found in Phase 1)."""
+        self.run_info.update(data)
+        self._append({"type": "run", "ts": time.time(), "data": data})
+
+    def record(self, url: str, name: str, stage: str, **data):
+        """Marks a lead as having finished `stage`, with that stage's output."""
+        record = {"type": "lead", "ts": time.time(), "url": url, "name": name, "stage": stage, "data": data}
+        with self._lock:
+            self._apply(record)
+        self._append(record)
+
+    def save_pdf(self, url: str, pdf: bytes) -> str:
+        """Keeps a rendered PDF next to the journal so a resumed run can upload it."""
+        pdf_dir = _pdf_dir(self.path)
+        os.makedirs(pdf_dir, exist_ok=True)
+        path = os.path.join(pdf_dir, hashlib.sha1(url.encode("utf-8")).hexdigest() + ".pdf")
+        with open(path, "wb") as f:
+            f.write(pdf)
+        return path
+
+    def discard_pdf(self, url: str):
+        """Deletes the saved PDF once it is safely on Google Drive."""
+        state = self.state_for(url)
+        path = state.data.get("pdf_path") if state else None
+        if path and os.path.exists(path):
+            os.remove(path)
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+    def compact(self) -> bool:
+        """
+        After close(): if every lead is final and every upload is shared, rewrites
+        the journal without the stage outputs (scraped text, analysis, email) and
+        deletes its saved PDFs. A --resume of it still skips every lead.
+        Returns True if the journal was compacted.
+        """
+        with self._lock:
+            if not self._file.closed or not all(s.finished for s in self.leads.values()):
+                return False
+            if any("uploaded" in s.stages and "shared" not in s.stages for s in self.leads.values()):
+                return False
+            records = [{"type": "run", "ts": time.time(), "data": self.run_info}] if self.run_info else []
+            for s in self.leads.values():
+                data = {"reason": s.data.get("reason", "")} if "skipped" in s.stages else {}
+                for stage in sorted(s.stages & FINAL_STAGES):
+                    records.append({"type": "lead", "ts": time.time(), "url": s.url, "name": s.name,
+                                    "stage": stage, "data": data})
+            temp_path = self.path + ".tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                for record in records:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.path)
+            for s in self.leads.values():
+                s.data = {"reason": s.data.get("reason", "")} if "skipped" in s.stages else {}
+        shutil.rmtree(_pdf_dir(self.path), ignore_errors=True)
+        return True
+
+    # --- Reading ---
+
+    def state_for(self, url: str) -> LeadState | None:
+        with self._lock:
+            return self.leads.get(url)
+
+    def unshared_files(self) -> list[tuple[str, str, str]]:
+        """(url, name, Drive file ID) of uploads whose sharing permission was never applied."""
+        with self._lock:
+            return [
+                (s.url, s.name, s.data["file_id"]) for s in self.leads.values()
+                if "uploaded" in s.stages and "shared" not in s.stages and s.data.get("file_id")
+            ]
+
+    def unfinished_leads(self) -> list[dict]:
+        """Leads from earlier runs that still have work left, as {"name", "url"} dicts."""
+        with self._lock:
+            return [{"name": s.name, "url": s.url} for s in self.leads.values() if not s.finished]
+
+    def counts(self) -> tuple[int, int]:
+        """(finished leads, unfinished leads)."""
+        with self._lock:
+            finished = sum(1 for s in self.leads.values() if s.finished)
+            return finished, len(self.leads) - finished
+
+
+def _pdf_dir(journal_path: str) -> str:
+    return os.path.splitext(journal_path)[0] + "-pdfs"
+
+
+def prune(directory: str = CHECKPOINT_DIR, keep: int = KEEP_JOURNALS) -> int:
+    """Deletes all but the newest `keep` journals, with their saved PDFs. Returns how many were deleted."""
+    paths = sorted(glob.glob(os.path.join(directory, "run-*.jsonl")), key=os.path.getmtime, reverse=True)
+    for path in paths[keep:]:
+        os.remove(path)
+        shutil.rmtree(_pdf_dir(path), ignore_errors=True)
+    return len(paths[keep:])
@@ -0,0 +1,171 @@
+# compaction.py
+# Token-budgeted compaction of scraped page text before it goes into a prompt.
+#
+# The prompts used to keep text[:4000]: whatever came first, cookie banners and
+# menu items included, measured in characters rather than the tokens the model
+# actually pays for. compact() instead:
+#   - splits the page into blocks (one per extracted text node) and sentences,
+#   - drops sentences repeated on the page (menus, footers, repeated CTAs),
+#   - scores the rest for relevance (position, business vocabulary, overlap
+#     with an optional query, minus boilerplate and fragments),
+#   - keeps the best ones until TOKEN_BUDGET is filled, in their original order.
+#
+# Tokens are counted with tiktoken's cl100k_base (llama3 uses a tiktoken BPE
+# with a larger vocabulary, so counts are close). When tiktoken is not installed
+# or its vocabulary cannot be downloaded, a word/punctuation estimate is used.
+# The output only depends on the input text, so prompts stay cacheable.
+# Words are matched as Unicode; when nothing on a page scores well enough
+# (e.g. a language the vocabulary below doesn't cover), the start of the page
+# is kept instead, cut to the budget.
+import os
+import re
+import threading
+
+import tracing
+
+
+# --- CONFIGURATION ---
+TOKEN_BUDGET = int(os.getenv("CYFORGE_PROMPT_TOKENS", "700"))  # Website text per prompt
+ENCODING = "cl100k_base"
+MIN_SCORE = 0.25  # Sentences scoring below this are dropped even if the budget has room
+CHARS_PER_TOKEN = 4  # Rough size of a token, for the compaction.input_tokens counter only
+# --- END CONFIGURATION ---
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9\"'(\u0391-\u03a9\u0410-\u042f])|(?<=[\u3002\uff01\uff1f])")
+_WORD_RE = re.compile(r"[^\W\d_][\w'&-]*")
+_CJK_RE = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af]")  # Written without spaces
+_TOKEN_ESTIMATE_RE = re.compile(r"\w{1,4}|[^\w\s]")
+
+BOILERPLATE_RE = re.compile(
+    r"©|\b(cookies?|privacy (policy|notice)|terms (of|and) (use|service|conditions)|all rights reserved|"
+    r"copyright|sign (in|up)|log ?in|subscribe|newsletter|skip to (main )?content|toggle navigation|"
+    r"javascript|your browser|add to cart|back to top|follow us)\b",
+    re.IGNORECASE
+)
+SIGNAL_RE = re.compile(
+    r"\b(we|our|help|helps|provide|provides|offer|offers|deliver|delivers|platform|solutions?|services?|"
+    r"products?|customers?|clients?|compan(y|ies)|industry|industries|teams?|businesses|enterprises?|"
+    r"software|speciali[sz]e|mission|founded|trusted|leading)\b",
+    re.IGNORECASE
+)
+
+_encoder = None
+_encoder_loaded = False
+_encoder_lock = threading.Lock()
+
+
+def _get_encoder():
+    """The tiktoken encoder, loaded once. None if it is unavailable (offline, not installed)."""
+    global _encoder, _encoder_loaded
+    if _encoder_loaded:
+        return _encoder
+    with _encoder_lock:
+        if not _encoder_loaded:
+            try:
+                import tiktoken  # Optional
+                _encoder = tiktoken.get_encoding(ENCODING)
+            except Exception:
+                _encoder = None  # Fall back to the estimate for the rest of the run
+            _encoder_loaded = True
+    return _encoder
+
+
+def count_tokens(text: str) -> int:
+    """Number of prompt tokens `text` costs (estimated if tiktoken is unavailable)."""
+    encoder = _get_encoder()
+    if encoder is not None:
+        return len(encoder.encode(text, disallowed_special=()))
+    # Roughly one token per short word or word piece, and one per punctuation mark
+    return len(_TOKEN_ESTIMATE_RE.findall(text))
+
+
+def _truncate(text: str, budget: int) -> str:
+    """The first `budget` tokens of `text`."""
+    encoder = _get_encoder()
+    if encoder is not None:
+        return encoder.decode(encoder.encode(text, disallowed_special=())[:budget])
+    tokens = list(_TOKEN_ESTIMATE_RE.finditer(text))
+    return text if len(tokens) <= budget else text[:tokens[budget].start()].rstrip()
+
+
+def _split(text: str) -> list[str]:
+    """Blocks (lines) split further into sentences, whitespace-normalized."""
+    sentences = []
+    for block in text.splitlines():
+        block = " ".join(block.split())
+        if block:
+            sentences.extend(s for s in _SENTENCE_RE.split(block) if s)
+    return sentences
+
+
+def _normalize(sentence: str) -> str:
+    return " ".join(w.lower() for w in _WORD_RE.findall(sentence))
+
+
+def _score(sentence: str, position: float, query_words: set) -> float:
+    words = _WORD_RE.findall(sentence)
+    if not words:
+        return float("-inf")
+    word_count = len(words) + len(_CJK_RE.findall(sentence)) // 2  # ~2 characters per CJK word
+    score = 1.0 - 0.5 * position  # The extractor puts title, meta description and headings first
+    score += 0.3 * min(len(SIGNAL_RE.findall(sentence)), 3)
+    if query_words:
+        score += 0.2 * min(len(query_words.intersection(w.lower() for w in words)), 5)
+    if word_count < 4:
+        score -= 0.6  # Menu items, button labels
+    elif word_count > 60:
+        score -= 0.3  # Run-on lists and text dumps
+    if sum(c.isalpha() or c.isspace() for c in sentence) < 0.75 * len(sentence):
+        score -= 0.5  # Prices, dates, phone numbers, symbols
+    if BOILERPLATE_RE.search(sentence):
+        score -= 1.5
+    return score
+
+
+def compact(text: str, budget: int | None = None, query: str | None = None) -> str:
+    """
+    Returns the most relevant sentences of `text` that fit in `budget` tokens
+    (TOKEN_BUDGET by default), in page order, one sentence per line.
+
+    query: Optional text (e.g. the user's description of their business);
+           sentences sharing words with it rank higher.
+    """
+    budget = TOKEN_BUDGET if budget is None else budget
+    sentences = _split(text or "")
+    if not sentences:
+        return ""
+    query_words = {w.lower() for w in _WORD_RE.findall(query or "") if len(w) > 3}
+
+    candidates = []  # (score, index, sentence, tokens)
+    seen = set()
+    for index, sentence in enumerate(sentences):
+        key = _normalize(sentence)
+        if not key or key in seen:
+            continue  # Repeated navigation, footer and call-to-action text
+        seen.add(key)
+        score = _score(sentence, index / len(sentences), query_words)
+        if score >= MIN_SCORE:
+            candidates.append((score, index, sentence, count_tokens(sentence)))
+
+    kept = []
+    used = 0
+    for score, index, sentence, tokens in sorted(candidates, key=lambda c: (-c[0], c[1])):
+        if used + tokens <= budget:
+            kept.append((index, sentence))
+            used += tokens
+
+    if not kept:
+        # Nothing scored well enough: keep the start of the page, like text[:N] used to
+        for index, sentence in enumerate(sentences):
+            tokens = count_tokens(sentence)
+            if used + tokens > budget:
+                if not kept:
+                    kept.append((index, _truncate(sentence, budget)))
+                    used = budget
+                break
+            kept.append((index, sentence))
+            used += tokens
+
+    tracing.count("compaction.input_tokens", len(text) // CHARS_PER_TOKEN)
+    tracing.count("compaction.output_tokens", used)
+    return "\n".join(sentence for _, sentence in sorted(kept))
@@ -3,10 +3,22 @@ import gspread
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
-from google.auth.transport.requests import Request # Needed for token refresh
+from googleapiclient.http import MediaIoBaseUpload
+from google.auth.transport.requests import Request, AuthorizedSession # Token refresh + pooled session
+import requests
+import json
 import os
 import os.path
+import threading
+import time
+import atexit
+import io
+import queue
+
+from lead_store import LeadStore, LOGGED_AT_FORMAT
+from disk_cache import CACHE_DIR
+import rate_limiter
+import tracing
 
 # --- THIS IS THE "CONTRACT" ---
 # 1. Sheet Name (Tell your team)
@@ -26,20 +38,257 @@ SCOPES = [
     'https://www.googleapis.com/auth/spreadsheets',
     'https://www.googleapis.com/auth/drive'
 ]
+# 6. Sheet columns, A to G
+SHEET_HEADERS = ["Client Name", "URL", "Summary", "Industry", "Email Draft", "Drive Link", "Logged At"]
 # --- END OF CONTRACT ---
 
+# --- Drive uploads ---
+DRIVE_POOL_SIZE = 4                   # Authorized Drive clients shared by upload threads
+RESUMABLE_THRESHOLD = 5 * 1024 * 1024  # Files smaller than this use one multipart request
+PERMISSION_BATCH_SIZE = 50            # Sharing permissions applied per batch request
+
+# --- Connection setup ---
+# Remembers the spreadsheet key, worksheet and header state between runs, so
+# opening the sheet costs no API calls (instead of a Drive search by title,
+# two metadata reads and a header check).
+BOOTSTRAP_FILE = os.path.join(CACHE_DIR, "google_bootstrap.json")
+HTTP_POOL_SIZE = 16  # Pooled connections in the shared Sheets session
+
+# --- Sheet write batching ---
+LOG_BATCH_SIZE = 25         # Flush after this many rows...
+LOG_FLUSH_INTERVAL = 10.0   # ...or after this many seconds, whichever comes first
+LOG_MAX_RETRIES = 6         # Retries (with exponential backoff + jitter, see rate_limiter) on 429 / quota errors
+
+
+def _build_drive(creds):
+    """A Drive client from the discovery document bundled with googleapiclient (no download)."""
+    with tracing.span("drive.build_client"):
+        return build('drive', 'v3', credentials=creds, static_discovery=True, cache_discovery=False)
+
+
+def _load_bootstrap() -> dict:
+    try:
+        with open(BOOTSTRAP_FILE, encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+    # Only valid for the sheet name it was saved for
+    return state if state.get("sheet_name") == SHEET_NAME else {}
+
+
+def _save_bootstrap(state: dict):
+    os.makedirs(os.path.dirname(BOOTSTRAP_FILE) or ".", exist_ok=True)
+    tmp = BOOTSTRAP_FILE + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(dict(state, sheet_name=SHEET_NAME), f)
+    os.replace(tmp, BOOTSTRAP_FILE)
+
+
+def _cached_worksheet(client, key: str, properties: dict):
+    """
+    The worksheet rebuilt from cached properties, without an API call.
+    (gspread's open_by_key(key).sheet1 reads the spreadsheet metadata twice.)
+    This relies on gspread 6 internals (pinned in requirements.txt); on any other
+    layout it raises AttributeError/KeyError/TypeError and the sheet is opened normally.
+    """
+    spreadsheet = gspread.Spreadsheet.__new__(gspread.Spreadsheet)  # Skips the metadata fetch in __init__
+    spreadsheet.client = client.http_client
+    spreadsheet._properties = {"id": key, "title": SHEET_NAME}
+    return gspread.Worksheet(spreadsheet, dict(properties), key, client.http_client)
+
+
+class DriveClientPool:
+    """
+    A small pool of Drive API clients.
+    Each client uses its own httplib2 connection, which is not thread-safe,
+    so a thread borrows a client for the duration of one call.
+    """
+
+    def __init__(self, creds, size: int = DRIVE_POOL_SIZE):
+        self._creds = creds
+        self._size = size
+        self._idle = queue.Queue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self._size:
+                self._created += 1
+                return _build_drive(self._creds)
+        return self._idle.get()  # All clients busy: wait for one
+
+    def release(self, client):
+        self._idle.put(client)
+
+
+class PermissionBatcher:
+    """
+    Collects "anyone with the link can view" permissions for uploaded files and
+    applies them with batch requests instead of one blocking call per file.
+    """
+
+    def __init__(self, drive_pool: DriveClientPool, batch_size: int = PERMISSION_BATCH_SIZE):
+        self.drive_pool = drive_pool
+        self.batch_size = batch_size
+        self._pending = []  # (file_id, on_shared callback or None)
+        self._lock = threading.Lock()
+
+    def add(self, file_id: str, on_shared=None):
+        """Queues a file. on_shared() is called once its permission has really been applied."""
+        with self._lock:
+            self._pending.append((file_id, on_shared))
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return
+        file_ids = [file_id for file_id, _ in pending]
+
+        failed = []
+
+        def _callback(request_id, response, exception):
+            if exception is not None:
+                failed.append((request_id, exception))
+
+        drive = self.drive_pool.acquire()
+        try:
+            with rate_limiter.get("drive").slot(), tracing.span("drive.share_batch", files=len(file_ids)):
+                batch = drive.new_batch_http_request(callback=_callback)
+                for file_id in file_ids:
+                    batch.add(
+                        drive.permissions().create(fileId=file_id, body={'type': 'anyone', 'role': 'reader'}),
+                        request_id=file_id
+                    )
+                batch.execute()
+        except Exception as e:
+            tracing.count("drive.share_failures", len(file_ids))
+            print(f"CRITICAL ERROR (Person 2): Could not share {len(file_ids)} uploaded PDF(s). {e}")
+            return
+        finally:
+            self.drive_pool.release(drive)
+
+        if failed:
+            tracing.count("drive.share_failures", len(failed))
+        for file_id, exception in failed:
+            print(f"Warning (Person 2): Could not share Drive file {file_id}. {exception}")
+        print(f"Database Manager: Shared {len(file_ids) - len(failed)} PDF(s) on Google Drive.")
+        failed_ids = {file_id for file_id, _ in failed}
+        for file_id, on_shared in pending:
+            if on_shared is not None and file_id not in failed_ids:
+                on_shared()
+
+
+class SheetWriter:
+    """
+    Write-behind buffer for the lead sheet.
+
+    Rows are collected in memory and written with ONE append_rows call when
+    the batch is full or the flush interval has passed. Remaining rows are
+    flushed on close(), which also runs at interpreter exit (including after Ctrl-C).
+    """
+
+    def __init__(self, sheet, batch_size: int = LOG_BATCH_SIZE,
+                 flush_interval: float = LOG_FLUSH_INTERVAL, max_retries: int = LOG_MAX_RETRIES):
+        self.sheet = sheet
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+
+        self._rows = []                      # (row, on_written callback or None)
+        self._lock = threading.Lock()        # Guards self._rows
+        self._write_lock = threading.Lock()  # Keeps batches in order
+        self._closed = threading.Event()
+        self._timer = threading.Thread(target=self._flush_periodically, name="cyforge-sheet-writer", daemon=True)
+        self._timer.start()
+        atexit.register(self.close)
+
+    def append(self, row: list, on_written=None):
+        """Buffers a row. on_written() is called once the row is actually in the sheet."""
+        with self._lock:
+            self._rows.append((row, on_written))
+            full = len(self._rows) >= self.batch_size
+        if full:
+            self.flush()
+
+    def flush(self) -> bool:
+        """Writes all buffered rows now. Returns False if they could not be written (they stay buffered)."""
+        with self._write_lock:
+            with self._lock:
+                rows, self._rows = self._rows, []
+            if not rows:
+                return True
+            try:
+                self._append_with_retry([row for row, _ in rows])
+            except Exception as e:
+                tracing.count("sheets.write_failures")
+                print(f"CRITICAL ERROR (Person 2): Failed to write {len(rows)} row(s) to sheet. {e}")
+                if "RESOURCE_EXHAUSTED" in str(e):
+                    print("Hint: You might be hitting Google Sheets API rate limits.")
+                with self._lock:
+                    self._rows = rows + self._rows  # Keep them for the next flush
+                return False
+            print(f"Database Manager: Logged {len(rows)} row(s) to Google Sheet.")
+            for _, on_written in rows:
+                if on_written is not None:
+                    on_written()
+            return True
+
+    def close(self):
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        if not self.flush():
+            with self._lock:
+                lost = len(self._rows)
+            print(f"CRITICAL ERROR (Person 2): {lost} lead(s) could not be logged to the sheet.")
+
+    def _flush_periodically(self):
+        while not self._closed.wait(self.flush_interval):
+            self.flush()
+
+    def _append_with_retry(self, rows: list):
+        # The shared "sheets" limiter paces writes, backs off on 429 / quota errors and
+        # stops hammering the API (CircuitOpenError) if it keeps failing
+        rate_limiter.get("sheets").call(self._append, rows, retries=self.max_retries)
+
+    def _append(self, rows: list):
+        with tracing.span("sheets.append_rows", rows=len(rows)):
+            self.sheet.append_rows(rows, value_input_option="RAW")
+
 
 class Database:
-    def __init__(self):
-        """Initializes the connection to both Sheets and Drive using OAuth."""
-        creds = self._get_credentials()
-        
+    def __init__(self, read_only: bool = False):
+        """
+        Initializes the connection to both Sheets and Drive using OAuth.
+
+        read_only: For reports (e.g. 'analyze'): no header check, no row writer,
+                   and log_lead()/upload_pdf() are not available.
+        """
+        self.read_only = read_only
+        self._creds = self._get_credentials()
+        # One authorized, pooled HTTP session for every Sheets call (and one token refresh)
+        self.session = AuthorizedSession(self._creds)
+        adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_SIZE)
+        self.session.mount("https://", adapter)
+        self._bootstrap = _load_bootstrap()
+
         try:
-            # Authorize gspread (Sheets)
-            self.sheet = gspread.authorize(creds).open(SHEET_NAME).sheet1
-            
-            # Authorize Google Drive API
-            self.drive_service = build('drive', 'v3', credentials=creds)
+            # Authorize gspread (Sheets) on the shared session
+            self.client = gspread.authorize(None, session=self.session)
+            self._open_sheet()
+
+            # Drive clients are only built when the first PDF is uploaded
+            self.drive_pool = DriveClientPool(self._creds)
+            self.permissions = PermissionBatcher(self.drive_pool)
             
         except gspread.exceptions.SpreadsheetNotFound:
             print(f"FATAL ERROR (Person 2): Spreadsheet '{SHEET_NAME}' not found.")
@@ -50,7 +299,67 @@ class Database:
             print("Check your internet connection and ensure the Google Cloud setup was correct.")
             raise
             
-        self._setup_headers()
+        self.writer = None
+        if not read_only:
+            self._setup_headers()
+            self.writer = SheetWriter(self.sheet)
+        # Local SQLite mirror of the sheet (dedup + 'analyze' without re-downloading it)
+        self.lead_store = LeadStore()
+        self._synced = False
+
+    def _open_sheet(self, use_cache: bool = True):
+        """
+        Opens the first worksheet, from the cached key when there is one.
+        use_cache=False skips rebuilding it from the cached properties.
+        """
+        key = self._bootstrap.get("spreadsheet_key")
+        properties = self._bootstrap.get("worksheet") if use_cache else None
+        self._sheet_from_cache = False
+        if key and properties:
+            try:
+                self.sheet = _cached_worksheet(self.client, key, properties)
+                self._sheet_from_cache = True
+                return
+            except (AttributeError, KeyError, TypeError):
+                pass  # Unexpected gspread internals: open it the normal way
+        with tracing.span("sheets.open", by_key=bool(key)):
+            spreadsheet = self.client.open_by_key(key) if key else self.client.open(SHEET_NAME)
+            self.sheet = spreadsheet.sheet1
+        self._bootstrap = {
+            "spreadsheet_key": self.sheet.spreadsheet.id,
+            "worksheet": {"sheetId": self.sheet.id, "title": self.sheet.title, "index": self.sheet.index},
+        }
+        _save_bootstrap(self._bootstrap)
+
+    def with_sheet(self, fn):
+        """
+        Runs fn(self.sheet). If the sheet was opened from the cached key and that
+        key is stale (the spreadsheet was deleted or replaced), the sheet is looked
+        up by name again and fn is retried once.
+        """
+        try:
+            return fn(self.sheet)
+        except gspread.exceptions.APIError as e:
+            status = getattr(getattr(e, "response", None), "status_code", None)
+            if not self._sheet_from_cache or status not in (403, 404):
+                raise
+            print("Database Manager: Cached spreadsheet key is out of date. Looking the sheet up by name...")
+            self._bootstrap = {}
+        except (AttributeError, KeyError) as e:
+            if not self._sheet_from_cache:
+                raise
+            # The worksheet rebuilt by _cached_worksheet doesn't fit this gspread version
+            print(f"Database Manager: Reopening the sheet normally ({e!r}).")
+            self._bootstrap = {"spreadsheet_key": self._bootstrap.get("spreadsheet_key")}
+        self._open_sheet(use_cache=False)
+        if self.writer is not None:
+            self._setup_headers()
+            self.writer.sheet = self.sheet
+        return fn(self.sheet)
+
+    def _require_writable(self):
+        if self.read_only:
+            raise RuntimeError("This Database was opened read-only.")
 
     def _get_credentials(self):
         """
@@ -93,78 +402,116 @@ class Database:
         return creds
 
     def _setup_headers(self):
-        """Checks if the sheet is empty and adds headers if it is."""
+        """Checks if the sheet is empty and adds headers if it is (skipped once they are known to be there)."""
+        if self._bootstrap.get("headers") == SHEET_HEADERS:
+            return
         try:
-            # Check if A1 is empty, safer than get_all_values() for large sheets
-            if not self.sheet.acell('A1').value: 
-                headers = ["Client Name", "URL", "Summary", "Industry", "Email Draft", "Drive Link"]
-                self.sheet.append_row(headers)
+            # Read only the header row, safer than get_all_values() for large sheets
+            header_row = self.sheet.get('A1:G1')
+            if not header_row or not header_row[0] or not header_row[0][0]:
+                self.sheet.append_row(SHEET_HEADERS)
                 print("Database Manager: Added headers to empty sheet.")
+            elif len(header_row[0]) < len(SHEET_HEADERS):
+                # Sheets created before the "Logged At" column was added
+                self.sheet.update_acell('G1', SHEET_HEADERS[-1])
         except Exception as e:
             print(f"Warning (Person 2): Could not check/add headers. {e}")
+            return
+        self._bootstrap["headers"] = SHEET_HEADERS
+        _save_bootstrap(self._bootstrap)
+
+
+    def sync(self, full: bool = False) -> int:
+        """Pulls new sheet rows into the local mirror. Returns how many were added."""
+        added = self.with_sheet(lambda sheet: self.lead_store.sync(sheet, full=full))
+        self._synced = True
+        if added:
+            print(f"Database Manager: Synced {added} new row(s) into the local lead store.")
+        return added
 
+    def _ensure_synced(self):
+        if not self._synced:
+            self.sync()
 
     def get_existing_urls(self) -> set:
-        """Gets all URLs from column 2 for de-duplication."""
-        print("Database Manager: Fetching existing URLs from Sheet...")
+        """Gets all logged URLs for de-duplication (from the local mirror, after an incremental sync)."""
+        print("Database Manager: Fetching existing URLs...")
         try:
-            # Column 2 = URL column
-            urls = self.sheet.col_values(2)[1:] # Skip header row
-            return set(filter(None, urls)) # Filter out empty strings
+            self._ensure_synced()
         except Exception as e:
-            print(f"Warning (Person 2): Could not get URLs. Maybe sheet is empty? {e}")
-            return set()
+            print(f"Warning (Person 2): Could not sync new rows from the Sheet. Using local copy. {e}")
+        return self.lead_store.existing_urls()
 
-    def get_all_records(self) -> list:
-        """Gets all data as a list of dictionaries for the 'analyze' command."""
-        print("Database Manager: Fetching all records for analysis...")
-        try:
-            # get_all_records is convenient for pandas
-            return self.sheet.get_all_records() 
-        except Exception as e:
-            print(f"Warning (Person 2): Could not fetch all records. {e}")
-            return []
+    def upload_pdf(self, pdf: str | bytes, lead_name: str, on_uploaded=None, on_shared=None) -> str:
+        """
+        Uploads a PDF to the specified Google Drive folder.
 
-    def upload_pdf(self, file_path: str, lead_name: str) -> str:
-        """Uploads a local file to the specified Google Drive folder."""
-        print(f"Database Manager: Uploading '{file_path}' to Google Drive...")
-        
-        if not os.path.exists(file_path):
-             print(f"CRITICAL ERROR (Person 2): File not found for upload: {file_path}")
-             return "UPLOAD_FAILED_FILE_MISSING"
+        pdf: Either the PDF bytes (uploaded straight from memory) or a local
+             file path (the file is deleted after a successful upload).
+        on_uploaded: Called with the new file's ID as soon as it exists on Drive.
+        on_shared: Called once the file is readable by anyone with the link.
+
+        The "anyone with the link" permission is queued and applied in a batch
+        (see PermissionBatcher); call flush() or close() to apply it right away.
+        """
+        self._require_writable()
+        from_file = isinstance(pdf, str)
+        if from_file:
+            file_path = pdf
+            print(f"Database Manager: Uploading '{file_path}' to Google Drive...")
+            if not os.path.exists(file_path):
+                 print(f"CRITICAL ERROR (Person 2): File not found for upload: {file_path}")
+                 return "UPLOAD_FAILED_FILE_MISSING"
+            with open(file_path, 'rb') as f:
+                data = f.read()
+        else:
+            data = pdf
+            print(f"Database Manager: Uploading PDF for '{lead_name}' to Google Drive...")
              
+        drive = self.drive_pool.acquire()
         try:
             file_metadata = {
                 'name': f"{lead_name}_Portfolio.pdf",
                 'parents': [DRIVE_FOLDER_ID] 
             }
-            media = MediaFileUpload(file_path, mimetype='application/pdf', resumable=True)
-            
-            file = self.drive_service.files().create(
-                body=file_metadata,
-                media_body=media,
-                fields='id, webViewLink' 
-            ).execute()
-            
-            file_id = file.get('id')
-            
-            # Make the file readable by anyone with the link
-            self.drive_service.permissions().create(
-                fileId=file_id,
-                body={'type': 'anyone', 'role': 'reader'}
-            ).execute()
+            def _upload():
+                # Small files (portfolios are ~20KB) go up in ONE multipart request;
+                # the resumable protocol costs an extra round-trip and is only worth it for big files.
+                # (A fresh stream per attempt, so a retry uploads the whole file again.)
+                media = MediaIoBaseUpload(
+                    io.BytesIO(data),
+                    mimetype='application/pdf',
+                    resumable=len(data) > RESUMABLE_THRESHOLD
+                )
+                with tracing.span("drive.upload", lead=lead_name, bytes=len(data)):
+                    return drive.files().create(
+                        body=file_metadata,
+                        media_body=media,
+                        fields='id, webViewLink' 
+                    ).execute()
+
+            # Paced by the shared "drive" limiter. Only 429s are retried: after a timeout
+            # or 5xx the file may have been created anyway, and a retry would duplicate it.
+            file = rate_limiter.get("drive").call(_upload, retries=3, retry_on=(rate_limiter.THROTTLED,))
+            if on_uploaded is not None:
+                on_uploaded(file.get('id'))
+
+            # Make the file readable by anyone with the link (applied in batches)
+            self.permissions.add(file.get('id'), on_shared=on_shared)
             
             print("Database Manager: Upload successful.")
             
             # Clean up the local file after successful upload
-            try:
-                os.remove(file_path)
-            except OSError as e:
-                print(f"Warning (Person 2): Could not delete local file {file_path}. {e}")
+            if from_file:
+                try:
+                    os.remove(file_path)
+                except OSError as e:
+                    print(f"Warning (Person 2): Could not delete local file {file_path}. {e}")
                 
             return file.get('webViewLink') # The direct link to view in browser
 
         except Exception as e:
+            tracing.count("drive.upload_failures")
             print(f"CRITICAL ERROR (Person 2): Failed to upload PDF. {e}")
             # Try to provide more helpful feedback for common issues
             if "invalid_grant" in str(e):
@@ -172,19 +519,34 @@ class Database:
             elif "notFound" in str(e):
                  print(f"Hint: Check if DRIVE_FOLDER_ID '{DRIVE_FOLDER_ID}' is correct and exists.")
             return "UPLOAD_FAILED"
+        finally:
+            self.drive_pool.release(drive)
 
-    def log_lead(self, name: str, url: str, summary: str, industry: str, email: str, drive_link: str):
-        """Appends a single, complete row to the Google Sheet."""
-        print(f"Database Manager: Logging '{name}' to Google Sheet...")
-        try:
-            # Ensure all values are strings to prevent Gspread errors
-            row = [
-                str(name), str(url), str(summary), str(industry), 
-                str(email), str(drive_link)
-            ]
-            self.sheet.append_row(row)
-            print("Database Manager: Log successful.")
-        except Exception as e:
-            print(f"CRITICAL ERROR (Person 2): Failed to write to sheet. {e}")
-            if "RESOURCE_EXHAUSTED" in str(e):
-                print("Hint: You might be hitting Google Sheets API rate limits.")
\ No newline at end of file
+    def log_lead(self, name: str, url: str, summary: str, industry: str, email: str, drive_link: str,
+                 on_logged=None):
+        """
+        Queues a single, complete row for the Google Sheet.
+        Rows are written in batches by self.writer; call flush()/close() to force it.
+        on_logged: Called once the row has really been written (e.g. to checkpoint the lead).
+        """
+        self._require_writable()
+        print(f"Database Manager: Queued '{name}' for Google Sheet.")
+        # Ensure all values are strings to prevent Gspread errors
+        row = [
+            str(name), str(url), str(summary), str(industry), 
+            str(email), str(drive_link),
+            time.strftime(LOGGED_AT_FORMAT, time.gmtime())  # Logged At (UTC), for 'analyze'
+        ]
+        self.writer.append(row, on_written=on_logged)
+
+    def flush(self):
+        """Writes any queued rows to the sheet and applies queued Drive permissions right now."""
+        self.permissions.flush()
+        if self.writer is not None:
+            self.writer.flush()
+
+    def close(self):
+        """Flushes everything queued and stops the background writer."""
+        self.permissions.flush()
+        if self.writer is not None:
+            self.writer.close()
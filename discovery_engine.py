@@ -3,6 +3,11 @@
 import os
 from serpapi import SerpApiClient
 import traceback
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+import serp_cache
+import tracing
+import rate_limiter
 from dotenv import load_dotenv # <-- ADD THIS IMPORT
 
 # --- Load environment variables from .env file ---
@@ -11,9 +16,93 @@ load_dotenv() # <-- ADD THIS LINE AT THE TOP (after imports)
 # --- CONFIGURATION ---
 # Now, os.getenv will automatically find the key loaded from .env
 SERPAPI_API_KEY = os.getenv("SERPAPI_KEY")
+
+# Used by LeadDiscovery to build several queries per service
+QUERY_TEMPLATES = [
+    "companies needing {service}",
+    "{service} for businesses",
+    "companies looking for {service} provider",
+]
+RESULTS_PER_PAGE = 10
 # --- END CONFIGURATION ---
 
 
+def _build_params(query: str, location: str, start: int = 0) -> dict:
+    """The SerpAPI request for one page of one query."""
+    params = {
+        "engine": "google",
+        "q": query,
+        "location": location,
+        "google_domain": "google.com",
+        "gl": "us",
+        "hl": "en",
+        "num": RESULTS_PER_PAGE,
+        "api_key": SERPAPI_API_KEY
+    }
+    if start:
+        params["start"] = start
+    return params
+
+
+def _serpapi_request(params: dict) -> dict:
+    with tracing.span("2.serpapi.search", q=params.get("q"), start=params.get("start", 0)):
+        client = SerpApiClient(params_dict=params)
+        results = client.get_dict()
+        if "error" in results:
+            tracing.count("serpapi.errors")
+            if any(marker in results["error"].lower() for marker in ("rate limit", "too many requests")):
+                raise rate_limiter.Throttled(results["error"])  # Retried by the limiter
+    return results
+
+
+def _search_live(params: dict) -> dict:
+    """
+    Runs one real SerpAPI search (1 credit), caches it, and returns the raw response dict.
+    Goes through the shared "serpapi" limiter: rate-limited answers are retried with
+    backoff, and rate_limiter.CircuitOpenError is raised while SerpAPI keeps failing.
+    """
+    results = rate_limiter.get("serpapi").call(_serpapi_request, params, retries=3)
+    serp_cache.put(params, results)
+    return results
+
+
+def _search(params: dict) -> dict:
+    """
+    Returns the raw SerpAPI response dict for these parameters.
+    Answers from serp_cache when it can (no credit spent).
+    """
+    cached = serp_cache.get(params)
+    if cached is not None:
+        return cached
+    if serp_cache.OFFLINE:
+        return serp_cache.offline_miss(params)
+    return _search_live(params)
+
+
+def _report_serpapi_error(error: str):
+    print(f"❌ SerpAPI returned an error: {error}")
+    # Provide specific feedback for common API key issues
+    if "invalid API key" in error.lower():
+         print("   Hint: Double-check the SERPAPI_KEY value in your .env file.")
+    elif "exceeded your credits" in error.lower():
+         print("   Hint: You may have used up your free SerpAPI credits for the month.")
+
+
+def _parse_leads(results: dict) -> list[dict]:
+    """Turns the organic results of a SerpAPI response into [{'name': ..., 'url': ...}]."""
+    leads = []
+    for result in results.get("organic_results", []):
+        link = result.get("link")
+        title = result.get("title")
+
+        if link and title and link.startswith('http'):
+             leads.append({
+                "name": title,
+                "url": link
+             })
+    return leads
+
+
 def find_leads(services_str: str, location: str = "United States") -> list[dict]:
     """
     Finds potential B2B client leads for given services using SerpAPI Google Search.
@@ -27,8 +116,8 @@ def find_leads(services_str: str, location: str = "United States") -> list[dict]
         and 'url' of a potential lead, or an empty list if an error occurs or no leads found.
     """
 
-    # Check if the API key was loaded successfully
-    if not SERPAPI_API_KEY: # Check if it's None or empty
+    # Check if the API key was loaded successfully (offline replay never calls SerpAPI)
+    if not SERPAPI_API_KEY and not serp_cache.OFFLINE: # Check if it's None or empty
         print("❌ FATAL ERROR (Person 4): SERPAPI_API_KEY is not set.")
         print("   Ensure you have a .env file in the project root with SERPAPI_KEY=YOUR_KEY")
         return []
@@ -48,44 +137,15 @@ def find_leads(services_str: str, location: str = "United States") -> list[dict]
 
     print(f"🔎 Searching SerpAPI for: '{query}' in '{location}'...")
 
-    # --- Prepare API Parameters ---
-    params = {
-        "engine": "google",
-        "q": query,
-        "location": location,
-        "google_domain": "google.com",
-        "gl": "us",
-        "hl": "en",
-        "num": 10,
-        "api_key": SERPAPI_API_KEY
-    }
-
     # --- Call SerpAPI ---
     try:
-        client = SerpApiClient(params_dict=params)
-        results = client.get_dict()
+        results = _search(_build_params(query, location))
 
         if "error" in results:
-            print(f"❌ SerpAPI returned an error: {results['error']}")
-            # Provide specific feedback for common API key issues
-            if "invalid API key" in results['error'].lower():
-                 print("   Hint: Double-check the SERPAPI_KEY value in your .env file.")
-            elif "exceeded your credits" in results['error'].lower():
-                 print("   Hint: You may have used up your free SerpAPI credits for the month.")
+            _report_serpapi_error(results['error'])
             return []
 
-        organic_results = results.get("organic_results", [])
-
-        leads = []
-        for result in organic_results:
-            link = result.get("link")
-            title = result.get("title")
-
-            if link and title and link.startswith('http'):
-                 leads.append({
-                    "name": title,
-                    "url": link
-                 })
+        leads = _parse_leads(results)
 
         if leads:
             print(f"✅ Found {len(leads)} potential leads via SerpAPI.")
@@ -99,6 +159,135 @@ def find_leads(services_str: str, location: str = "United States") -> list[dict]
         traceback.print_exc()
         return []
 
+
+def build_queries(services_str: str, locations: list[str], templates: list[str] | None = None) -> list[tuple[str, str]]:
+    """
+    Every (query, location) pair: each service x each template x each location.
+
+    Round-robin, services first: every service gets its first query before any
+    service gets a second, so a small --serp-credits budget still covers all of them.
+    """
+    services = [s.strip() for s in services_str.split(',') if s.strip()]
+    templates = templates or QUERY_TEMPLATES
+    return [
+        (template.format(service=service), location)
+        for template in templates
+        for location in locations
+        for service in services
+    ]
+
+
+class LeadDiscovery:
+    """
+    Fan-out discovery scheduler.
+
+    Runs every (template x location x service) query concurrently, pages through
+    the results, and never spends more than max_credits SerpAPI searches.
+    Breadth first: page 1 of every query is fetched before any page 2, and the
+    next page of a query is only requested if the previous page was full.
+
+    Searching starts as soon as the object is created, and iterating over it
+    yields leads (deduplicated by URL) as each search returns, so Phase 4 can
+    start on the first leads while later queries are still running.
+    """
+
+    def __init__(self, services_str: str, locations: list[str] | None = None,
+                 templates: list[str] | None = None, max_pages: int = 1,
+                 max_credits: int = 10, max_workers: int = 4):
+        self.max_pages = max(1, max_pages)
+        self.max_credits = max_credits
+        self.credits_used = 0
+        self.leads_found = 0
+        self.queries = build_queries(services_str, locations or ["United States"], templates)
+
+        self._seen_urls = set()
+        self._stopped = False
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="cyforge-serpapi")
+        self._pending = set()
+        self._requests = {}  # future -> (query, location, page)
+
+        if not SERPAPI_API_KEY and not serp_cache.OFFLINE:  # Offline replay never calls SerpAPI
+            print("❌ FATAL ERROR (Person 4): SERPAPI_API_KEY is not set.")
+            print("   Ensure you have a .env file in the project root with SERPAPI_KEY=YOUR_KEY")
+            self._stopped = True
+            return
+
+        print(f"🔎 Searching SerpAPI with {len(self.queries)} queries (budget: {max_credits} credits)...")
+        # Page 1 of every query first, as far as the budget allows
+        for query, location in self.queries:
+            self._submit(query, location, page=0)
+
+    def _submit(self, query: str, location: str, page: int):
+        params = _build_params(query, location, start=page * RESULTS_PER_PAGE)
+        if self._stopped:
+            return
+
+        # Cached (or offline) answers are free, so they don't count against the budget
+        cached = serp_cache.get(params)
+        if cached is not None or serp_cache.OFFLINE:
+            future = Future()
+            future.set_result(cached if cached is not None else serp_cache.offline_miss(params))
+        else:
+            with self._lock:
+                if self.credits_used >= self.max_credits:
+                    return
+                self.credits_used += 1
+            future = self._executor.submit(_search_live, params)
+        self._requests[future] = (query, location, page)
+        self._pending.add(future)
+
+    def _handle(self, future) -> list[dict]:
+        query, location, page = self._requests.pop(future)
+        try:
+            results = future.result()
+        except rate_limiter.CircuitOpenError as e:
+            print(f"⚠️ Skipping SerpAPI query '{query}': {e}")
+            return []
+        except Exception as e:
+            print(f"❌ CRITICAL ERROR (Person 4) during SerpAPI call for '{query}': {e}")
+            return []
+
+        if "error" in results:
+            if serp_cache.OFFLINE:
+                return []  # Expected for queries that were never cached
+            if not serp_cache.is_empty_result(results):
+                _report_serpapi_error(results['error'])
+            if "exceeded your credits" in results['error'].lower() or "invalid api key" in results['error'].lower():
+                self._stopped = True  # Every other call would fail the same way
+            return []
+
+        page_leads = _parse_leads(results)
+        # A full page probably means there is another one
+        if len(page_leads) >= RESULTS_PER_PAGE and page + 1 < self.max_pages:
+            self._submit(query, location, page + 1)
+
+        new_leads = []
+        for lead in page_leads:
+            if lead["url"] not in self._seen_urls:
+                self._seen_urls.add(lead["url"])
+                new_leads.append(lead)
+        return new_leads
+
+    def __iter__(self):
+        try:
+            while self._pending:
+                done, self._pending = wait(self._pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    for lead in self._handle(future):
+                        self.leads_found += 1
+                        yield lead
+        finally:
+            self.close()
+
+    def close(self):
+        """Stops scheduling new searches (already-running ones finish in the background)."""
+        self._stopped = True
+        for future in self._pending:
+            future.cancel()
+        self._executor.shutdown(wait=False)
+
+
 # --- Example Usage Block (for testing this file directly) ---
 if __name__ == '__main__':
     print("--- Testing discovery_engine.py (using .env) ---")
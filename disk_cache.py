@@ -0,0 +1,144 @@
+# disk_cache.py
+# A small persistent key -> bytes cache on top of SQLite (standard library only).
+#
+# - Entries expire after a TTL (checked when they are read).
+# - The whole cache is kept under a size limit by evicting the
+#   Least-Recently-Used entries first. The total size and entry count live in
+#   a meta table that triggers keep up to date, so no write has to add up the
+#   whole table, and eviction trims down to EVICT_TO in a few batched DELETEs.
+# - Safe to use from several threads; survives crashes and restarts.
+import math
+import os
+import sqlite3
+import threading
+import time
+
+
+# --- CONFIGURATION ---
+# All of CyForge's local caches live here (override with CYFORGE_CACHE_DIR)
+CACHE_DIR = os.getenv("CYFORGE_CACHE_DIR", ".cache")
+EVICT_TO = 0.9  # Once over max_bytes, evict down to this fraction of it
+# --- END CONFIGURATION ---
+
+
+class DiskCache:
+    """A size-bounded, LRU-evicting, TTL-aware cache stored in one SQLite file."""
+
+    def __init__(self, name: str, max_bytes: int, ttl_seconds: float | None = None):
+        """
+        name: File name inside CACHE_DIR (e.g. "llm" -> .cache/llm.sqlite3).
+        max_bytes: Total size of all stored values before LRU eviction kicks in.
+        ttl_seconds: Default time-to-live for entries (None = never expire).
+        """
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        self.path = os.path.join(CACHE_DIR, f"{name}.sqlite3")
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS entries (
+                   key      TEXT PRIMARY KEY,
+                   value    BLOB NOT NULL,
+                   size     INTEGER NOT NULL,
+                   created  REAL NOT NULL,
+                   accessed REAL NOT NULL
+               )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS meta (
+                key   TEXT PRIMARY KEY,  -- 'bytes' or 'entries'
+                value INTEGER NOT NULL
+            );
+            CREATE TRIGGER IF NOT EXISTS entries_added AFTER INSERT ON entries BEGIN
+                UPDATE meta SET value = value + NEW.size WHERE key = 'bytes';
+                UPDATE meta SET value = value + 1 WHERE key = 'entries';
+            END;
+            CREATE TRIGGER IF NOT EXISTS entries_removed AFTER DELETE ON entries BEGIN
+                UPDATE meta SET value = value - OLD.size WHERE key = 'bytes';
+                UPDATE meta SET value = value - 1 WHERE key = 'entries';
+            END;
+            CREATE TRIGGER IF NOT EXISTS entries_resized AFTER UPDATE OF size ON entries BEGIN
+                UPDATE meta SET value = value + NEW.size - OLD.size WHERE key = 'bytes';
+            END;
+            """
+        )
+        if self._conn.execute("SELECT COUNT(*) FROM meta").fetchone()[0] < 2:
+            # New file, or a cache created before the meta table: count it once
+            count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", [("bytes", total), ("entries", count)]
+            )
+        self._conn.commit()
+
+    def get(self, key: str, ttl_seconds: float | None = None) -> bytes | None:
+        """Returns the stored value, or None if it is missing or older than the TTL."""
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, created = row
+            if ttl is not None and now - created > ttl:
+                self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            return value
+
+    def set(self, key: str, value: bytes):
+        """Stores a value, then evicts old entries if the cache is over its size limit."""
+        now = time.time()
+        with self._lock:
+            # An upsert rather than INSERT OR REPLACE: REPLACE deletes the old row without firing triggers
+            self._conn.execute(
+                "INSERT INTO entries (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET value = excluded.value, size = excluded.size, "
+                "created = excluded.created, accessed = excluded.accessed",
+                (key, value, len(value), now, now)
+            )
+            self._evict()
+            self._conn.commit()
+
+    def delete(self, key: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        """Returns the number of entries and their total size in bytes."""
+        with self._lock:
+            total, count = self._totals()
+        return {"entries": count, "bytes": total, "max_bytes": self.max_bytes, "path": self.path}
+
+    def _totals(self) -> tuple[int, int]:
+        # Caller holds self._lock. (bytes, entries), kept up to date by the triggers
+        values = dict(self._conn.execute("SELECT key, value FROM meta").fetchall())
+        return values.get("bytes", 0), values.get("entries", 0)
+
+    def _evict(self):
+        # Caller holds self._lock
+        total, count = self._totals()
+        if total <= self.max_bytes:
+            return
+        target = self.max_bytes * EVICT_TO
+        while total > target and count:
+            # Least recently used first, as many as the excess needs at the average entry size
+            batch = max(1, math.ceil((total - target) / (total / count)))
+            self._conn.execute(
+                "DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY accessed LIMIT ?)", (batch,)
+            )
+            total, count = self._totals()
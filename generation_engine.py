@@ -1,4 +1,50 @@
-import ollama
+import inference  # Scheduled, cached Ollama calls
+import compaction  # Token-budgeted prompt text
+import portfolio_renderer  # WeasyPrint rendering on a process pool
+import tracing
+import json
+import re
+
+# --- CONFIGURATION ---
+STREAM_EMAILS = True      # Stream generate_email() and stop as soon as the email is signed
+EMAIL_MAX_TOKENS = 400    # 3-4 short paragraphs are ~150-250 tokens; the model is cut off here
+EMAIL_MAX_PARAGRAPHS = 8  # Subject, greeting, 4 body paragraphs, sign-off, signature
+EMAIL_RETRIES = 1         # Runaway emails are aborted and generated again this many times
+# --- END CONFIGURATION ---
+
+SIGNATURE_NAME = "Eshan Jameel"
+SIGNATURE = "Eshan Jameel, Co-founder, CyForge"
+_PARAGRAPH_BREAK_RE = re.compile(r"\n\s*\n")
+_SIGN_OFF = (
+    r"(?:best(?: regards| wishes)?|kind regards|warm(?:est)? regards|regards|sincerely(?: yours)?|"
+    r"thanks(?: again)?|thank you|cheers|all the best|yours(?: truly)?|respectfully)"
+)
+# The name right after a sign-off line, or at the start of a paragraph
+_SIGNATURE_RE = re.compile(
+    rf"(?:(?P<sign_off>^[ \t]*{_SIGN_OFF}[ \t]*[,.!]?[ \t]*\n?[ \t]*)|\n[ \t]*\n[ \t]*)[*_-]*"
+    rf"(?P<name>{re.escape(SIGNATURE_NAME)})(?P<rest>[^\n]*)(?P<eol>\n?)",
+    re.IGNORECASE | re.MULTILINE
+)
+# What may follow the name on a signature line: nothing, or a short title/company
+_SIGNATURE_LINE_RE = re.compile(r"[*_]*\s*(?:[,|\u2013\u2014-][^\n.!?]{0,60})?[.\s]*$")
+
+# Shared by generate_email() and the fused analyze_and_draft()
+EMAIL_SYSTEM_PROMPT = """
+    You are "CyForge", a senior B2B cybersecurity expert. 
+    You are writing a *short*, concise, and professional cold outreach email.
+    Your tone is confident, expert, and helpful, not "salesy".
+    DO NOT use buzzwords like "revolutionize" or "unlock".
+    Your goal is to get a reply.
+    """
+
+EMAIL_INSTRUCTIONS = """    1.  Start with a *brief* observation about their company/industry (e.g., "As a leader in the FinTech space...").
+    2.  Identify a *specific, implied pain point* for their industry (e.g., FinTech needs compliance; SaaS needs speed).
+    3.  Connect ONE of my services directly to that *exact* pain point.
+    4.  Keep the email to 3-4 short paragraphs.
+    5.  End with a single, clear call to action (e.g., "Are you free for a 15-minute call next week?").
+    6.  Sign off as "Eshan Jameel, Co-founder, CyForge"."""
+
+
 def generate_email(my_services: str, client_info: dict) -> str:
     """
     Generates a personalized B2B outreach email.
@@ -8,13 +54,7 @@ def generate_email(my_services: str, client_info: dict) -> str:
     """
     print(f"Drafting email for industry: {client_info.get('industry')}...")
 
-    system_prompt = """
-    You are "CyForge", a senior B2B cybersecurity expert. 
-    You are writing a *short*, concise, and professional cold outreach email.
-    Your tone is confident, expert, and helpful, not "salesy".
-    DO NOT use buzzwords like "revolutionize" or "unlock".
-    Your goal is to get a reply.
-    """
+    system_prompt = EMAIL_SYSTEM_PROMPT
 
     user_prompt = f"""
     I need to write a cold email to a potential client.
@@ -27,21 +67,165 @@ def generate_email(my_services: str, client_info: dict) -> str:
     - **Industry:** {client_info.get('industry')}
 
     **Instructions:**
-    1.  Start with a *brief* observation about their company/industry (e.g., "As a leader in the FinTech space...").
-    2.  Identify a *specific, implied pain point* for their industry (e.g., FinTech needs compliance; SaaS needs speed).
-    3.  Connect ONE of my services directly to that *exact* pain point.
-    4.  Keep the email to 3-4 short paragraphs.
-    5.  End with a single, clear call to action (e.g., "Are you free for a 15-minute call next week?").
-    6.  Sign off as "Eshan Jameel, Co-founder, CyForge".
+{EMAIL_INSTRUCTIONS}
 
     Draft the email.
     """
 
-    response = ollama.chat(
-        model='llama3:8b',
-        messages=[
-            {'role': 'system', 'content': system_prompt},
-            {'role': 'user', 'content': user_prompt}
-        ]
-    )
-    return response['message']['content']
\ No newline at end of file
+    messages = [
+        {'role': 'system', 'content': system_prompt},
+        {'role': 'user', 'content': user_prompt}
+    ]
+    email = ""
+    for attempt in range(EMAIL_RETRIES + 1):
+        options = {"num_predict": EMAIL_MAX_TOKENS}
+        if attempt:
+            options["seed"] = attempt  # A different sample (and cache key) than the runaway one
+        try:
+            response = inference.chat(
+                messages=messages,
+                options=options,
+                priority=inference.PRIORITY_FINISH,  # This lead is already analyzed; finish it first
+                stop_when=_email_complete if STREAM_EMAILS else None
+            )
+            email = response['message']['content']
+            if _signature_end(email) != -1:
+                return _cut_after_signature(email)
+            reason = "not signed"
+        except inference.GenerationAborted as e:
+            email, reason = e.text, str(e)
+        retrying = attempt < EMAIL_RETRIES
+        print(f"Warning (Person 3): Runaway email ({reason}){', retrying' if retrying else ''}.")
+        tracing.count("emails.runaway")
+
+    # Still no usable email: keep the first paragraphs and sign it ourselves
+    paragraphs = [p for p in _PARAGRAPH_BREAK_RE.split(email.strip()) if p.strip()]
+    if not paragraphs:
+        raise inference.GenerationAborted(reason)
+    return "\n\n".join(paragraphs[:EMAIL_MAX_PARAGRAPHS - 2] + [f"Best regards,\n{SIGNATURE}"])
+
+
+def _signature_end(text: str, finished: bool = True) -> int:
+    """
+    Index just past the signature ("Eshan Jameel, Co-founder, CyForge" on one line or several), or -1.
+
+    The name only counts as the signature after a sign-off line ("Best regards,")
+    or as a short line of its own after a blank line, not where the sender
+    introduces themselves ("I'm Eshan Jameel, Co-founder of CyForge, ...").
+    finished: False while the text is still streaming in (an unfinished last
+              line can't be judged yet).
+    """
+    for match in _SIGNATURE_RE.finditer(text):
+        if not match.group("sign_off"):
+            if not match.group("eol") and not finished:
+                return -1  # Wait for the rest of the line
+            if not _SIGNATURE_LINE_RE.match(match.group("rest")):
+                continue  # A paragraph that starts with the name, not a signature
+        signed_at = match.start("name")
+        lines = text[signed_at:].split("\n")
+        company_at = text.find("CyForge", signed_at, signed_at + len("\n".join(lines[:3])))
+        if company_at != -1:
+            return company_at + len("CyForge")
+        if len(lines) >= 3:  # Name and title on their own lines, then something else
+            return signed_at + len("\n".join(lines[:2]))
+        return len(text) if finished else -1
+    return -1
+
+
+def _cut_after_signature(email: str) -> str:
+    """Drops anything the model wrote after signing (P.S. lines, notes about the email)."""
+    end = _signature_end(email)
+    return (email[:end] if end != -1 else email).strip()
+
+
+def _email_complete(text: str, chunks: int) -> bool:
+    """
+    stop_when check for a streamed email: True once the signature has been written,
+    GenerationAborted if the email grows past EMAIL_MAX_PARAGRAPHS unsigned.
+    """
+    if _signature_end(text, finished=False) != -1:
+        return True
+    paragraphs = sum(1 for p in _PARAGRAPH_BREAK_RE.split(text) if p.strip())
+    if paragraphs > EMAIL_MAX_PARAGRAPHS:
+        raise inference.GenerationAborted(f"{paragraphs} paragraphs and no signature", text)
+    return False
+
+
+def analyze_and_draft(my_services: str, url: str, text: str) -> dict | None:
+    """
+    Fused mode: analyzes the client's website AND drafts the email in ONE model call.
+    Returns {"summary": ..., "industry": ..., "email": ...}, or None if the model's
+    output is malformed (callers then fall back to analyze_client + generate_email).
+    """
+    print(f"Analyzing client and drafting email (fused): {url}...")
+
+    system_prompt = EMAIL_SYSTEM_PROMPT + "You must only output a valid JSON object.\n"
+
+    user_prompt = f"""
+    I need to understand a potential client and write them a cold email.
+
+    **Step 1 - Analyze the website text below:**
+    -   **summary**: A one-sentence summary of what this company does.
+    -   **industry**: The company's primary industry (e.g., "FinTech", "SaaS", "Healthcare", "E-commerce", "Manufacturing").
+
+    **Step 2 - Write the email** using that analysis.
+
+    **My Company's Services:**
+    {my_services}
+
+    **Email Instructions:**
+{EMAIL_INSTRUCTIONS}
+
+    Return your answer *only* as a single, valid JSON object, like this:
+    {{"summary": "...", "industry": "...", "email": "..."}}
+
+    Website Text:
+    {compaction.compact(text)}
+    """
+
+    try:
+        response = inference.chat(
+            messages=[
+                {'role': 'system', 'content': system_prompt},
+                {'role': 'user', 'content': user_prompt}
+            ],
+            format='json',
+            priority=inference.PRIORITY_LEAD
+        )
+        result = json.loads(response['message']['content'])
+    except json.JSONDecodeError:
+        print(f"Warning (Person 3): Fused call did not return valid JSON for {url}.")
+        return None
+    except Exception as e:
+        print(f"Error (Person 3): Ollama call failed in analyze_and_draft. {e}")
+        return None
+
+    # All three fields must be present, non-empty strings
+    if not isinstance(result, dict) or not all(
+        isinstance(result.get(key), str) and result[key].strip() for key in ("summary", "industry", "email")
+    ):
+        print(f"Warning (Person 3): Fused call returned incomplete fields for {url}.")
+        return None
+    return result
+
+
+def create_portfolio_pdf(my_services: str, client_info: dict, lead_name: str,
+                         output_path: str | None = None, renderer=None) -> bytes | str:
+    """
+    Creates the custom PDF portfolio for one lead.
+
+    my_services: A comma-separated string of our services (from analyze_my_business).
+    client_info: The dict from analyze_client ({"summary": "...", "industry": "..."}).
+    output_path: If given, the PDF is written there and the path is returned.
+                 Otherwise the PDF bytes are returned (no temp file needed).
+    renderer: A portfolio_renderer.PortfolioRenderer (defaults to a shared one using all cores).
+    """
+    print(f"Rendering PDF portfolio for: {lead_name}...")
+    renderer = renderer or portfolio_renderer.get_default_renderer()
+    pdf_bytes = renderer.render(my_services, client_info, lead_name)
+
+    if output_path is None:
+        return pdf_bytes
+    with open(output_path, "wb") as f:
+        f.write(pdf_bytes)
+    return output_path
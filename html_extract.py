@@ -0,0 +1,212 @@
+# html_extract.py
+# Fast, bounded-memory HTML -> text extraction for the scrapers.
+#
+# The "full" path in analysis_engine loads the whole page, builds a pure-Python
+# BeautifulSoup tree and joins every string, most of which the prompt never
+# uses. This module instead:
+#   - feeds the response body to a C-backed parser (lxml) chunk by chunk,
+#   - never reads more than MAX_BYTES of a page,
+#   - stops as soon as it has enough visible text for the prompt,
+#   - puts high-signal regions first (title, meta description, headings,
+#     main/article) and skips navigation/footer boilerplate,
+#   - keeps one text node per line, so compaction.py can tell blocks apart.
+import codecs
+from html.parser import HTMLParser
+
+try:
+    from lxml import etree
+except ModuleNotFoundError:  # Optional: falls back to the (slower) standard library parser
+    etree = None
+
+
+# --- CONFIGURATION ---
+MAX_BYTES = 2 * 1024 * 1024  # Never read more than 2 MB of a page
+MAX_CHARS = 12000            # Raw material for compaction.compact() to pick the prompt text from
+CHUNK_SIZE = 64 * 1024
+# --- END CONFIGURATION ---
+
+# Never visible
+SKIP_TAGS = {"script", "style", "noscript", "template", "svg", "canvas", "iframe"}
+# Boilerplate that is dropped when prefer_high_signal is on
+BOILERPLATE_TAGS = {"nav", "footer", "header", "aside", "form", "button", "select"}
+HEADING_TAGS = {"h1", "h2", "h3"}
+MAIN_TAGS = {"main", "article"}
+
+
+def encoding_from_content_type(content_type: str | None) -> str | None:
+    """Returns the charset from a Content-Type header, or None if it has none."""
+    for part in (content_type or "").split(";")[1:]:
+        key, _, value = part.strip().partition("=")
+        if key.lower() == "charset" and value:
+            charset = value.strip('"\' ')
+            try:
+                codecs.lookup(charset)
+                return charset
+            except LookupError:
+                return None
+    return None
+
+
+class _TextCollector:
+    """
+    Parser target that sorts visible text into buckets as the page streams in.
+    Works as an lxml parser target and behind the standard library fallback.
+    """
+
+    def __init__(self, max_chars: int, prefer_high_signal: bool):
+        self.max_chars = max_chars
+        self.prefer_high_signal = prefer_high_signal
+        self.buckets = {"title": [], "meta": [], "headings": [], "main": [], "body": []}
+        self.sizes = dict.fromkeys(self.buckets, 0)
+        self._skip_depth = 0
+        self._stack = []
+        self._pending = []  # Text pieces since the last tag (a chunk boundary can split a word)
+        self.done = False
+
+    # --- Parser target interface ---
+
+    def start(self, tag, attrib):
+        self._flush()
+        tag = tag.lower() if isinstance(tag, str) else ""
+        if tag == "meta":
+            name = (attrib.get("name") or attrib.get("property") or "").lower()
+            if name in ("description", "og:description") and attrib.get("content"):
+                self._add("meta", attrib["content"])
+            return
+        if tag in ("br", "img", "input", "hr", "link"):
+            return  # Void elements have no text (and parsers disagree on sending end() for them)
+        self._stack.append(tag)
+        if tag in SKIP_TAGS or (self.prefer_high_signal and tag in BOILERPLATE_TAGS):
+            self._skip_depth += 1
+
+    def end(self, tag):
+        self._flush()
+        tag = tag.lower() if isinstance(tag, str) else ""
+        if tag not in self._stack:
+            return  # Broken HTML: an end tag we never opened
+        while self._stack:
+            open_tag = self._stack.pop()
+            if open_tag in SKIP_TAGS or (self.prefer_high_signal and open_tag in BOILERPLATE_TAGS):
+                self._skip_depth -= 1
+            if open_tag == tag:
+                break
+
+    def data(self, text):
+        if not self._skip_depth:
+            self._pending.append(text)
+
+    def comment(self, text):
+        pass
+
+    def close(self):
+        self._flush()
+        return self.text()
+
+    # --- Helpers ---
+
+    def _flush(self):
+        if not self._pending:
+            return
+        text = " ".join("".join(self._pending).split())
+        self._pending = []
+        if text:
+            self._add(self._bucket_for_current(), text)
+
+    def _bucket_for_current(self) -> str:
+        if not self.prefer_high_signal:
+            return "body"
+        if "title" in self._stack:
+            return "title"
+        if HEADING_TAGS.intersection(self._stack):
+            return "headings"
+        if MAIN_TAGS.intersection(self._stack):
+            return "main"
+        return "body"
+
+    def _add(self, bucket: str, text: str):
+        self.buckets[bucket].append(text)
+        self.sizes[bucket] += len(text) + 1
+        high_signal = self.sizes["title"] + self.sizes["meta"] + self.sizes["headings"] + self.sizes["main"]
+        # Stop once the high-signal text alone fills the budget, or once there is
+        # comfortably more text than the prompt will ever use.
+        if high_signal >= self.max_chars or sum(self.sizes.values()) >= 2 * self.max_chars:
+            self.done = True
+
+    def text(self) -> str:
+        order = ("title", "meta", "headings", "main", "body")
+        text = "\n".join("\n".join(self.buckets[name]) for name in order if self.buckets[name])
+        return text[:self.max_chars]
+
+
+class _StdlibParser(HTMLParser):
+    """Fallback when lxml is not installed: drives the same collector."""
+
+    def __init__(self, target: _TextCollector):
+        super().__init__(convert_charrefs=True)
+        self.target = target
+
+    def handle_starttag(self, tag, attrs):
+        self.target.start(tag, {k: v or "" for k, v in attrs})
+
+    def handle_startendtag(self, tag, attrs):
+        self.target.start(tag, {k: v or "" for k, v in attrs})
+        self.target.end(tag)
+
+    def handle_endtag(self, tag):
+        self.target.end(tag)
+
+    def handle_data(self, data):
+        self.target.data(data)
+
+
+class StreamingExtractor:
+    """
+    Incremental extractor: feed() it chunks of the response body until it
+    reports it is done (or the body ends), then call text().
+    """
+
+    def __init__(self, encoding: str | None = None, max_bytes: int = MAX_BYTES,
+                 max_chars: int = MAX_CHARS, prefer_high_signal: bool = True):
+        self.max_bytes = max_bytes
+        self.bytes_read = 0
+        self._collector = _TextCollector(max_chars, prefer_high_signal)
+        self._decoder = codecs.getincrementaldecoder(encoding or "utf-8")(errors="replace")
+        if etree is not None:
+            self._parser = etree.HTMLParser(target=self._collector, recover=True, no_network=True)
+        else:
+            self._parser = _StdlibParser(self._collector)
+        self._closed = False
+
+    @property
+    def done(self) -> bool:
+        return self._collector.done or self.bytes_read >= self.max_bytes
+
+    def feed(self, chunk: bytes) -> bool:
+        """Feeds one chunk. Returns True when no more input is needed."""
+        if self.done:
+            return True
+        chunk = chunk[:self.max_bytes - self.bytes_read]
+        self.bytes_read += len(chunk)
+        decoded = self._decoder.decode(chunk)
+        if decoded:
+            self._parser.feed(decoded)
+        return self.done
+
+    def text(self) -> str:
+        if not self._closed:
+            self._closed = True
+            try:
+                self._parser.close()
+            except Exception:
+                pass  # lxml complains about truncated documents; the text so far is what we want
+        return self._collector.text()
+
+
+def extract_from_chunks(chunks, encoding: str | None = None, max_bytes: int = MAX_BYTES,
+                        max_chars: int = MAX_CHARS, prefer_high_signal: bool = True) -> str:
+    """Runs a StreamingExtractor over an iterable of byte chunks and stops early when it can."""
+    extractor = StreamingExtractor(encoding, max_bytes, max_chars, prefer_high_signal)
+    for chunk in chunks:
+        if extractor.feed(chunk):
+            break
+    return extractor.text()
@@ -0,0 +1,95 @@
+# import_profiler.py
+# A `python -X importtime`-style breakdown for 'python main.py --import-time ...'.
+#
+# install() puts a finder at the front of sys.meta_path that wraps every
+# module's loader and times its exec_module(). Like -X importtime, it reports
+# "self" time (the module's own code) and "cumulative" time (including the
+# modules it imported), so it is easy to see which dependency makes startup slow.
+import sys
+import threading
+import time
+from importlib.abc import MetaPathFinder
+
+
+class _TimingLoader:
+    """Wraps a real loader; everything except exec_module is passed through."""
+
+    def __init__(self, loader, profiler, name):
+        self._loader = loader
+        self._profiler = profiler
+        self._name = name
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        self._profiler._enter(self._name)
+        try:
+            self._loader.exec_module(module)
+        finally:
+            self._profiler._exit(self._name)
+
+    def __getattr__(self, attr):
+        return getattr(self._loader, attr)
+
+
+class ImportProfiler(MetaPathFinder):
+
+    def __init__(self):
+        self.records = []  # (name, depth, self seconds, cumulative seconds), in completion order
+        self._stack = []   # [name, start, seconds spent in child imports]
+        self._local = threading.local()
+        self._thread_id = threading.get_ident()
+
+    def find_spec(self, fullname, path, target=None):
+        # Only time imports made by the main thread; worker threads would mix up the nesting
+        if threading.get_ident() != self._thread_id or getattr(self._local, "busy", False):
+            return None
+        self._local.busy = True
+        try:
+            for finder in sys.meta_path:
+                if finder is self or not hasattr(finder, "find_spec"):
+                    continue
+                spec = finder.find_spec(fullname, path, target)
+                if spec is not None:
+                    if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+                        spec.loader = _TimingLoader(spec.loader, self, fullname)
+                    return spec
+            return None
+        finally:
+            self._local.busy = False
+
+    def _enter(self, name):
+        self._stack.append([name, time.perf_counter(), 0.0])
+
+    def _exit(self, name):
+        name, start, children = self._stack.pop()
+        cumulative = time.perf_counter() - start
+        self.records.append((name, len(self._stack), cumulative - children, cumulative))
+        if self._stack:
+            self._stack[-1][2] += cumulative
+
+    def report(self, top: int = 25, file=None):
+        """Prints the slowest top-level imports first, then the slowest modules overall."""
+        file = file or sys.stderr
+        if not self.records:
+            print("import time: no modules were imported after --import-time was enabled", file=file)
+            return
+        total = sum(cumulative for _, depth, _, cumulative in self.records if depth == 0)
+        print(f"\nimport time: {total * 1000:.1f} ms spent importing {len(self.records)} modules", file=file)
+        print(f"import time: {'self [us]':>10} | {'cumulative':>10} | imported package", file=file)
+        slowest = sorted(self.records, key=lambda record: record[3], reverse=True)[:top]
+        for name, depth, self_time, cumulative in slowest:
+            print(f"import time: {self_time * 1e6:>10.0f} | {cumulative * 1e6:>10.0f} | {'  ' * depth}{name}", file=file)
+
+
+_profiler = None
+
+
+def install() -> ImportProfiler:
+    """Starts timing every import from now on."""
+    global _profiler
+    if _profiler is None:
+        _profiler = ImportProfiler()
+        sys.meta_path.insert(0, _profiler)
+    return _profiler
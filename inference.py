@@ -0,0 +1,180 @@
+# inference.py
+# The one place every Ollama chat call goes through (analysis_engine, generation_engine).
+#
+#   - keep_alive: the model stays loaded for the whole run instead of being
+#     unloaded after 5 idle minutes (reloading llama3:8b on CPU takes seconds).
+#   - num_ctx: every request uses the SAME context size. Ollama reloads the
+#     model whenever num_ctx changes, so mixing sizes thrashes model loads.
+#   - max_parallel: at most this many requests are sent at once, matching the
+#     server's OLLAMA_NUM_PARALLEL. Everything else waits in a priority queue
+#     (Phase 1 self-analysis first, then emails for leads already in flight,
+#     then analysis of new leads), so the server is always busy but never overloaded.
+#   - Coalescing: if an identical request is already queued or running, callers
+#     share its result instead of running the prompt twice.
+#
+# Completed answers are cached on disk by llm_cache, which this module wraps.
+import heapq
+import itertools
+import os
+import threading
+from concurrent.futures import Future
+
+import llm_cache
+import rate_limiter
+import tracing
+from llm_cache import GenerationAborted  # Re-exported for callers that stream with stop_when
+
+
+# --- CONFIGURATION ---
+MODEL = "llama3:8b"
+KEEP_ALIVE = os.getenv("CYFORGE_KEEP_ALIVE", "30m")
+NUM_CTX = int(os.getenv("CYFORGE_NUM_CTX", "8192"))
+MAX_PARALLEL = int(os.getenv("OLLAMA_NUM_PARALLEL", "1"))
+# --- END CONFIGURATION ---
+
+# Lower runs first
+PRIORITY_SELF = 0      # Phase 1: everything else depends on it
+PRIORITY_FINISH = 10   # Emails for leads that are already analyzed
+PRIORITY_LEAD = 20     # Analysis of new leads
+
+
+class InferenceScheduler:
+    """Priority queue + fixed number of worker threads in front of llm_cache.chat."""
+
+    def __init__(self, max_parallel: int = MAX_PARALLEL, keep_alive: str = KEEP_ALIVE, num_ctx: int = NUM_CTX):
+        self.max_parallel = max(1, max_parallel)
+        self.keep_alive = keep_alive
+        self.num_ctx = num_ctx
+        self.stats = {"requests": 0, "coalesced": 0}
+
+        self._queue = []                # (priority, sequence, key, request)
+        self._in_flight = {}            # key -> Future (queued or running)
+        self._sequence = itertools.count()
+        self._cond = threading.Condition()
+        self._workers = []
+
+    def submit(self, messages: list, format=None, options=None, priority: int = PRIORITY_LEAD,
+               model: str = MODEL, stop_when=None) -> Future:
+        """
+        Queues a chat request and returns a Future for the response dict.
+        stop_when: Streams the answer and checks it as it arrives (see llm_cache.chat).
+        """
+        options = {"num_ctx": self.num_ctx, **(options or {})}
+        future = Future()
+        # Cached answers don't need a slot on the server
+        cached = llm_cache.lookup(model, messages, format, options)
+        if cached is not None:
+            future.set_result(cached)
+            return future
+
+        key = llm_cache.make_key(model, messages, format, options)
+        with self._cond:
+            self.stats["requests"] += 1
+            shared = self._in_flight.get(key)
+            if shared is not None:
+                self.stats["coalesced"] += 1
+                tracing.count("inference.coalesced")
+                return shared
+            self._in_flight[key] = future
+            request = {"model": model, "messages": messages, "format": format, "options": options,
+                       "stop_when": stop_when, "future": future}
+            heapq.heappush(self._queue, (priority, next(self._sequence), key, request))
+            self._start_workers()
+            self._cond.notify()
+        return future
+
+    def chat(self, messages: list, format=None, options=None, priority: int = PRIORITY_LEAD,
+             model: str = MODEL, stop_when=None) -> dict:
+        """Blocking version of submit()."""
+        return self.submit(messages, format=format, options=options, priority=priority, model=model,
+                           stop_when=stop_when).result()
+
+    def warm_up(self, model: str = MODEL):
+        """Loads the model (an empty chat) so the first real request doesn't pay for it."""
+        import ollama  # Imported on first use, like in llm_cache
+        with tracing.span("ollama.load_model", model=model):
+            ollama.chat(model=model, messages=[], keep_alive=self.keep_alive, options={"num_ctx": self.num_ctx})
+
+    def _start_workers(self):
+        # Caller holds self._cond
+        while len(self._workers) < self.max_parallel:
+            worker = threading.Thread(target=self._work, name=f"cyforge-inference-{len(self._workers)}", daemon=True)
+            self._workers.append(worker)
+            worker.start()
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                _, _, key, request = heapq.heappop(self._queue)
+            future = request["future"]
+            try:
+                # Fails fast (CircuitOpenError) instead of queueing behind a dead Ollama server
+                with rate_limiter.get("ollama").slot():
+                    response = llm_cache.chat(
+                        model=request["model"],
+                        messages=request["messages"],
+                        format=request["format"],
+                        options=request["options"],
+                        stop_when=request["stop_when"],
+                        keep_alive=self.keep_alive
+                    )
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.set_result(response)
+            finally:
+                with self._cond:
+                    self._in_flight.pop(key, None)
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def configure(max_parallel: int | None = None, keep_alive: str | None = None, num_ctx: int | None = None):
+    """Replaces the shared scheduler's settings (call before the first request, e.g. from the CLI)."""
+    global _scheduler
+    with _scheduler_lock:
+        _scheduler = InferenceScheduler(
+            max_parallel=max_parallel or MAX_PARALLEL,
+            keep_alive=keep_alive or KEEP_ALIVE,
+            num_ctx=num_ctx or NUM_CTX
+        )
+    return _scheduler
+
+
+def get_scheduler() -> InferenceScheduler:
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = InferenceScheduler()
+        return _scheduler
+
+
+def chat(messages: list, format=None, options=None, priority: int = PRIORITY_LEAD, model: str = MODEL,
+         stop_when=None) -> dict:
+    """
+    Runs one chat request through the shared scheduler.
+    Returns a dict shaped like the Ollama response ({'message': {'content': ...}, ...}).
+    """
+    return get_scheduler().chat(messages, format=format, options=options, priority=priority, model=model,
+                                stop_when=stop_when)
+
+
+def warm_up():
+    """Loads the model in the background of Phase 1. Errors are ignored (the real call reports them)."""
+    try:
+        get_scheduler().warm_up()
+    except Exception:
+        pass
+
+
+def summary() -> str:
+    """One line for the end-of-run report."""
+    scheduler = get_scheduler()
+    return (
+        f"Inference: {scheduler.stats['requests']} requests scheduled, {scheduler.stats['coalesced']} coalesced "
+        f"(parallel={scheduler.max_parallel}, keep_alive={scheduler.keep_alive}, num_ctx={scheduler.num_ctx})"
+    )
@@ -0,0 +1,149 @@
+# lead_dedup.py
+# URL canonicalization and company-level dedup, run between discovery and Phase 4.
+#
+# "https://acme.com/", "http://www.acme.com" and
+# "https://acme.com/blog/post?utm_source=x" are the same company. Before any
+# scraping or LLM work, every lead is reduced to a canonical URL and a
+# registrable domain ("acme.com") and checked against an in-memory index
+# built from the URLs already in the database.
+import hashlib
+import math
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+try:
+    import tldextract  # Optional: full Public Suffix List
+    _tld_extract = tldextract.TLDExtract(suffix_list_urls=())  # Bundled snapshot, no network
+except ModuleNotFoundError:
+    _tld_extract = None
+
+
+# Query parameters that only track the click and never change the page
+TRACKING_PARAMS = {
+    "gclid", "dclid", "fbclid", "msclkid", "yclid", "mc_cid", "mc_eid",
+    "_hsenc", "_hsmi", "mkt_tok", "ref", "ref_src", "igshid", "si",
+}
+TRACKING_PREFIXES = ("utm_",)
+
+# Used when tldextract isn't installed: common two-level public suffixes
+MULTI_PART_SUFFIXES = {
+    "co.uk", "org.uk", "ac.uk", "gov.uk", "ltd.uk", "plc.uk", "me.uk",
+    "com.au", "net.au", "org.au", "co.nz", "org.nz", "co.za", "co.in", "net.in",
+    "org.in", "co.jp", "ne.jp", "or.jp", "com.br", "com.mx", "com.ar", "com.sg",
+    "com.hk", "com.tr", "com.cn", "com.tw", "co.kr", "co.il", "com.pk",
+}
+
+
+def canonicalize_url(url: str) -> str:
+    """
+    https, lower-case host without "www.", no default port, no fragment,
+    no tracking parameters, sorted query, and no trailing slash.
+    """
+    parts = urlsplit(url.strip())
+    host = (parts.hostname or "").lower().rstrip(".")
+    if host.startswith("www."):
+        host = host[4:]
+    port = parts.port
+    netloc = host if port in (None, 80, 443) else f"{host}:{port}"
+
+    query = [
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key.lower() not in TRACKING_PARAMS and not key.lower().startswith(TRACKING_PREFIXES)
+    ]
+    path = parts.path.rstrip("/")
+    return urlunsplit(("https", netloc, path, urlencode(sorted(query)), ""))
+
+
+def registrable_domain(url: str) -> str:
+    """The domain a company would register: "blog.acme.co.uk/x" -> "acme.co.uk"."""
+    host = (urlsplit(url.strip()).hostname or "").lower().rstrip(".")
+    if _tld_extract is not None:
+        extracted = _tld_extract(host)
+        if extracted.domain and extracted.suffix:
+            return f"{extracted.domain}.{extracted.suffix}"
+        return host
+    labels = host.split(".")
+    if len(labels) >= 3 and ".".join(labels[-2:]) in MULTI_PART_SUFFIXES:
+        return ".".join(labels[-3:])
+    return ".".join(labels[-2:])
+
+
+class BloomFilter:
+    """
+    Fixed-memory set membership with a small false-positive rate (no false negatives).
+    Used instead of a Python set when the index has to hold a very large number of keys.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        capacity = max(1, capacity)
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, key: str):
+        for position in self._positions(key):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class DedupIndex:
+    """
+    In-memory index of canonical URLs and registrable domains we've already handled.
+
+    by_domain: Treat every URL on a known domain as a duplicate (one lead per company).
+    use_bloom: Store the keys in a BloomFilter instead of sets (bounded memory, tiny false-positive rate).
+    """
+
+    def __init__(self, by_domain: bool = True, use_bloom: bool = False, capacity: int = 100_000):
+        self.by_domain = by_domain
+        if use_bloom:
+            self._urls = BloomFilter(capacity)
+            self._domains = BloomFilter(capacity)
+        else:
+            self._urls = set()
+            self._domains = set()
+
+    @classmethod
+    def from_urls(cls, urls, by_domain: bool = True, use_bloom: bool = False) -> "DedupIndex":
+        """Builds the index from Database.get_existing_urls()."""
+        urls = list(urls)
+        index = cls(by_domain=by_domain, use_bloom=use_bloom, capacity=max(1000, 2 * len(urls)))
+        for url in urls:
+            index.add(url)
+        return index
+
+    def add(self, url: str):
+        self._urls.add(canonicalize_url(url))
+        self._domains.add(registrable_domain(url))
+
+    def duplicate_reason(self, url: str) -> str | None:
+        """Why this URL is a duplicate ("same URL" / "same company domain"), or None if it is new."""
+        if canonicalize_url(url) in self._urls:
+            return "same URL"
+        if self.by_domain and registrable_domain(url) in self._domains:
+            return "same company domain"
+        return None
+
+    def filter(self, leads):
+        """
+        Yields only leads that are not already in the index, adding each one
+        as it passes (so repeats inside the batch are dropped too).
+        """
+        for lead in leads:
+            url = lead.get("url")
+            if not url:
+                yield lead  # The pipeline reports leads with no URL
+                continue
+            reason = self.duplicate_reason(url)
+            if reason:
+                print(f"Skipping duplicate ({reason}): {lead.get('name', url)}")
+                continue
+            self.add(url)
+            yield lead
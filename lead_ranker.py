@@ -0,0 +1,121 @@
+# lead_ranker.py
+# Cheap pre-LLM scoring of scraped leads, so inference goes to the best ones first.
+#
+# Many search results are listicles, blog posts, directories and forum threads
+# ("Top 10 AI Customer Service Companies"), not companies we could sell to.
+# Each scraped lead gets a score from two parts:
+#   - relevance: BM25 between the page text and our services (the query), over
+#     the whole batch at once with numpy. The result is divided by the best
+#     score a page could get, so it lies in 0-1 and a threshold means the same
+#     thing from one run to the next.
+#   - URL/title heuristics: penalties for listicle titles, blog/news paths,
+#     directories and social sites, and a small bonus for company home pages.
+#
+# 'run --top-k/--min-score' uses these scores to decide which leads reach the
+# LLM, PDF and upload stages, best first (see LeadPipeline._release_ranked).
+import re
+from urllib.parse import urlsplit
+
+import numpy as np
+
+
+# --- CONFIGURATION ---
+BM25_K1 = 1.2   # Term-frequency saturation
+BM25_B = 0.75   # Document-length normalization
+# (pattern, score adjustment), applied to the lead's title / URL
+TITLE_RULES = [
+    (r"^\W*(the\s+)?(top|best)\s+\d+|\b\d+\s+(best|top|leading|examples?|companies|ways|tips|reasons)\b", -0.3),
+    (r"\b(examples? of|how to|what is|guide to|all you need to know|reviews?|vs\.?|list of)\b", -0.2),
+    (r"\?\s*$|\b(anyone know|looking for)\b", -0.3),  # Forum questions
+    (r"\b(services|solutions|company|agency|studio|inc|llc|ltd|gmbh)\b", 0.05),
+]
+URL_RULES = [
+    (r"/(blog|news|articles?|insights|resources|stories|press|wiki|forum|questions?|comments|tag|category)(/|$)", -0.3),
+    (r"/20\d\d/(\d\d/)?", -0.1),  # Dated posts
+    (r"^https?://([^/]+\.)?(reddit|quora|medium|wikipedia|youtube|linkedin|facebook|twitter|x|instagram|"
+     r"clutch|g2|capterra|goodfirms|upwork|fiverr|glassdoor|indeed|yelp|crunchbase|forbes)\.", -0.4),
+]
+HOME_PAGE_BONUS = 0.1    # URL with no path, or one short path segment
+DEEP_PATH_PENALTY = 0.1  # URL with more than 3 path segments
+# --- END CONFIGURATION ---
+
+_TITLE_RULES = [(re.compile(pattern, re.IGNORECASE), weight) for pattern, weight in TITLE_RULES]
+_URL_RULES = [(re.compile(pattern, re.IGNORECASE), weight) for pattern, weight in URL_RULES]
+_WORD_RE = re.compile(r"[a-z][a-z0-9]+")
+_STOPWORDS = frozenset(
+    "and the for with our your you are from that this into over more all any its their they can will "
+    "who what how not but use using also other such etc".split()
+)
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercase words without stopwords, with plurals folded ("audits" -> "audit", "companies" -> "company")."""
+    tokens = []
+    for word in _WORD_RE.findall(text.lower()):
+        if word in _STOPWORDS:
+            continue
+        if len(word) > 4 and word.endswith("ies"):
+            word = word[:-3] + "y"
+        elif len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        tokens.append(word)
+    return tokens
+
+
+def relevance(texts: list[str], query: str) -> np.ndarray:
+    """
+    BM25 of every text against the query, divided by the highest score a
+    text could reach (every query term, many times). Returns values in 0-1.
+    """
+    vocab = np.array(sorted(set(tokenize(query))))
+    if not len(texts) or not len(vocab):
+        return np.zeros(len(texts))
+
+    docs = [tokenize(text) for text in texts]
+    lengths = np.array([len(doc) for doc in docs])
+    if not lengths.sum():
+        return np.zeros(len(texts))
+    tokens = np.array([token for doc in docs for token in doc])
+    doc_ids = np.repeat(np.arange(len(docs)), lengths)
+
+    # Term-frequency matrix (documents x query terms), counted in one pass
+    positions = np.clip(np.searchsorted(vocab, tokens), 0, len(vocab) - 1)
+    hits = vocab[positions] == tokens
+    tf = np.bincount(
+        doc_ids[hits] * len(vocab) + positions[hits], minlength=len(docs) * len(vocab)
+    ).reshape(len(docs), len(vocab)).astype(float)
+
+    df = (tf > 0).sum(axis=0)
+    idf = np.log1p((len(docs) - df + 0.5) / (df + 0.5))
+    average_length = lengths.mean()
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / average_length)
+    scores = (idf * tf * (BM25_K1 + 1) / (tf + norm[:, None])).sum(axis=1)
+    return scores / (idf * (BM25_K1 + 1)).sum()
+
+
+def heuristic_score(url: str, title: str) -> float:
+    """Score adjustment from the lead's URL and search-result title alone."""
+    score = sum(weight for pattern, weight in _TITLE_RULES if pattern.search(title or ""))
+    score += sum(weight for pattern, weight in _URL_RULES if pattern.search(url or ""))
+    segments = [s for s in urlsplit(url or "").path.split("/") if s]
+    if len(segments) <= 1 and all(len(s) <= 20 for s in segments):
+        score += HOME_PAGE_BONUS
+    elif len(segments) > 3:
+        score -= DEEP_PATH_PENALTY
+    return score
+
+
+def score_leads(query: str, texts: list[str], urls: list[str], titles: list[str]) -> np.ndarray:
+    """Relevance plus heuristics for a batch of scraped leads (higher is better)."""
+    heuristics = np.array([heuristic_score(url, title) for url, title in zip(urls, titles)], dtype=float)
+    return relevance(texts, query) + heuristics
+
+
+def select(scores: np.ndarray, top_k: int | None = None, min_score: float | None = None) -> list[int]:
+    """Indexes of the leads to keep, highest score first (ties keep discovery order)."""
+    order = np.argsort(-scores, kind="stable")
+    if min_score is not None:
+        order = order[scores[order] >= min_score]
+    if top_k is not None:
+        order = order[:top_k]
+    return order.tolist()
@@ -0,0 +1,179 @@
+# lead_store.py
+# Local, indexed SQLite mirror of the "Smart Marketing Leads" Google Sheet.
+#
+# Instead of downloading the whole URL column (or the whole sheet) every run,
+# we remember the last sheet row we have seen and only fetch rows after it.
+# Dedup lookups, filters and the 'analyze' report then run against SQLite.
+#
+# Columns derived from the raw cells (company domain, email word count, upload
+# status) are computed once while syncing, so the 'analyze' reports
+# (analytics.py) are plain aggregate queries and never re-parse the rows.
+import os
+import sqlite3
+import threading
+
+import lead_dedup
+from disk_cache import CACHE_DIR
+
+
+# --- CONFIGURATION ---
+STORE_FILE = os.path.join(CACHE_DIR, "leads.sqlite3")
+SYNC_PAGE_SIZE = 2000  # Rows fetched per Sheets API call
+# --- END CONFIGURATION ---
+
+# Same order as the sheet columns A:G (see Database._setup_headers)
+COLUMNS = ["name", "url", "summary", "industry", "email", "drive_link", "logged_at"]
+LOGGED_AT_FORMAT = "%Y-%m-%dT%H:%M:%SZ"  # UTC, written by Database.log_lead
+# Computed from the cells above while syncing: (name, SQLite type)
+DERIVED_COLUMNS = [("domain", "TEXT"), ("email_words", "INTEGER"), ("upload_failed", "INTEGER")]
+
+
+class LeadStore:
+    """SQLite copy of the lead sheet, synced incrementally by row number."""
+
+    def __init__(self, path: str = STORE_FILE):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS leads (
+                row           INTEGER PRIMARY KEY,  -- Row number in the sheet
+                name          TEXT,
+                url           TEXT,
+                summary       TEXT,
+                industry      TEXT,
+                email         TEXT,
+                drive_link    TEXT,
+                logged_at     TEXT,
+                domain        TEXT,     -- lead_dedup.registrable_domain(url)
+                email_words   INTEGER,
+                upload_failed INTEGER   -- drive_link starts with UPLOAD_FAILED
+            );
+            CREATE INDEX IF NOT EXISTS leads_url ON leads (url);
+            CREATE INDEX IF NOT EXISTS leads_industry ON leads (industry);
+            CREATE TABLE IF NOT EXISTS sync_state (
+                key   TEXT PRIMARY KEY,
+                value TEXT
+            );
+            """
+        )
+        self._add_missing_columns()
+        # One narrow index per report (analytics.py), over the rows that have a URL:
+        # each report scans its own small index instead of the rows with their email text
+        self._conn.executescript(
+            """
+            CREATE INDEX IF NOT EXISTS leads_report_industry ON leads (industry, upload_failed) WHERE url != '';
+            CREATE INDEX IF NOT EXISTS leads_report_time ON leads (logged_at, industry) WHERE url != '';
+            CREATE INDEX IF NOT EXISTS leads_report_domain ON leads (domain) WHERE url != '';
+            CREATE INDEX IF NOT EXISTS leads_report_email ON leads (email_words) WHERE url != '';
+            """
+        )
+        self._conn.commit()
+
+    def _add_missing_columns(self):
+        """Upgrades a store created before columns were added; the next sync then re-reads the whole sheet."""
+        existing = {row[1] for row in self._conn.execute("PRAGMA table_info(leads)")}
+        missing = [(name, "TEXT") for name in COLUMNS if name not in existing]
+        missing += [(name, kind) for name, kind in DERIVED_COLUMNS if name not in existing]
+        for name, kind in missing:
+            self._conn.execute(f"ALTER TABLE leads ADD COLUMN {name} {kind}")
+        if missing:
+            self._conn.execute("DELETE FROM sync_state")
+
+    # --- Sync ---
+
+    def _get_state(self, key: str, default=None):
+        row = self._conn.execute("SELECT value FROM sync_state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def _set_state(self, key: str, value):
+        self._conn.execute("INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?)", (key, str(value)))
+
+    def sync(self, sheet, full: bool = False) -> int:
+        """
+        Pulls rows added to the sheet since the last sync. Returns how many were added.
+
+        full: Throw away the mirror and download everything again
+              (use this if rows were edited or deleted in the sheet by hand).
+        """
+        with self._lock:
+            sheet_id = f"{sheet.spreadsheet.id}/{sheet.id}"
+            if full or self._get_state("sheet_id") != sheet_id:
+                self._conn.execute("DELETE FROM leads")
+                self._set_state("sheet_id", sheet_id)
+                self._set_state("last_synced_row", 1)  # Row 1 is the header row
+
+            last_row = int(self._get_state("last_synced_row", 1))
+            all_columns = COLUMNS + [name for name, _ in DERIVED_COLUMNS]
+            insert = (
+                f"INSERT OR REPLACE INTO leads (row, {', '.join(all_columns)}) "
+                f"VALUES ({', '.join('?' * (len(all_columns) + 1))})"
+            )
+            added = 0
+            while True:
+                start = last_row + 1
+                end = start + SYNC_PAGE_SIZE - 1
+                values = sheet.get(f"A{start}:G{end}")
+                rows = [_to_row(start + offset, values_row) for offset, values_row in enumerate(values)]
+                if rows:
+                    self._conn.executemany(insert, rows)
+                    last_row = rows[-1][0]
+                    added += len(rows)
+                    self._set_state("last_synced_row", last_row)
+                    self._conn.commit()
+                if len(values) < SYNC_PAGE_SIZE:
+                    break
+            self._conn.commit()
+            return added
+
+    def clear(self):
+        """Empties the mirror; the next sync downloads the whole sheet again."""
+        with self._lock:
+            self._conn.execute("DELETE FROM leads")
+            self._conn.execute("DELETE FROM sync_state")
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        """Row count and size on disk, for 'cache-stats'."""
+        size = sum(os.path.getsize(p) for p in (self.path, self.path + "-wal") if os.path.exists(p))
+        with self._lock:
+            rows = self._conn.execute("SELECT COUNT(*) FROM leads").fetchone()[0]
+        return {"rows": rows, "bytes": size, "path": self.path}
+
+    # --- Queries ---
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM leads WHERE url != ''").fetchone()[0]
+
+    def has_url(self, url: str) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM leads WHERE url = ? LIMIT 1", (url,)).fetchone() is not None
+
+    def existing_urls(self) -> set:
+        with self._lock:
+            return {url for (url,) in self._conn.execute("SELECT url FROM leads WHERE url != ''")}
+
+    def industry_counts(self) -> list[tuple[str, int]]:
+        """Returns (industry, number of leads), most common first."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT industry, COUNT(*) AS n FROM leads WHERE url != '' "
+                "GROUP BY industry ORDER BY n DESC, industry"
+            ).fetchall()
+
+    def query(self, sql: str, params: tuple = ()) -> list[tuple]:
+        """Runs a read-only query against the mirror (used by the analytics.py reports)."""
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+
+def _to_row(row_number: int, values_row: list) -> list:
+    """One sheet row -> [row number, the A:G cells, the derived columns]."""
+    cells = [str(value) for value in (list(values_row) + [""] * len(COLUMNS))[:len(COLUMNS)]]
+    url, email, drive_link = cells[1], cells[4], cells[5]
+    domain = lead_dedup.registrable_domain(url) if url else ""
+    return [row_number, *cells, domain, len(email.split()), int(drive_link.startswith("UPLOAD_FAILED"))]
@@ -0,0 +1,149 @@
+# llm_cache.py
+# Content-addressed, on-disk cache for Ollama chat completions.
+#
+# The cache key is a SHA-256 hash of everything that decides the answer:
+# model, messages, format and options. Running the pipeline again on the same
+# company (or restarting after a crash) returns the stored answer instead of
+# running llama3:8b from scratch.
+import hashlib
+import json
+import threading
+from functools import partial
+
+import tracing
+from disk_cache import DiskCache
+
+
+# --- CONFIGURATION ---
+MAX_CACHE_BYTES = 256 * 1024 * 1024  # 256 MB
+TTL_SECONDS = 30 * 24 * 60 * 60      # 30 days
+# --- END CONFIGURATION ---
+
+# Set to False by 'run --no-llm-cache'
+ENABLED = True
+
+stats = {"hits": 0, "misses": 0}
+_stats_lock = threading.Lock()
+_cache = None
+_cache_lock = threading.Lock()
+
+
+class GenerationAborted(Exception):
+    """Raised by a streaming stop_when callback to abandon a generation (e.g. a runaway email)."""
+
+    def __init__(self, reason: str, text: str = ""):
+        super().__init__(reason)
+        self.text = text  # What had been generated so far
+
+
+def _get_cache() -> DiskCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = DiskCache("llm", max_bytes=MAX_CACHE_BYTES, ttl_seconds=TTL_SECONDS)
+    return _cache
+
+
+def make_key(model: str, messages: list, format=None, options=None) -> str:
+    """Returns a stable hash of the request (same request -> same key)."""
+    payload = {"model": model, "messages": messages, "format": format, "options": options or {}}
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _to_dict(response) -> dict:
+    """Turns an ollama ChatResponse (or plain dict) into a JSON-safe dict."""
+    if hasattr(response, "model_dump"):
+        return response.model_dump(mode="json", exclude_none=True)
+    return json.loads(json.dumps(dict(response), default=str))
+
+
+def _count(name: str):
+    with _stats_lock:
+        stats[name] += 1
+    tracing.count(f"llm_cache.{name}")
+
+
+def _ollama_chat(**kwargs) -> dict:
+    import ollama  # Imported on first use: the client pulls in httpx and pydantic
+    with tracing.span("ollama.chat", model=kwargs.get("model")):
+        response = _to_dict(ollama.chat(**kwargs))
+        tracing.record_llm(response)
+    return response
+
+
+def _ollama_stream(stop_when, **kwargs) -> dict:
+    """
+    Streams a chat completion, calling stop_when(text_so_far, chunks) after every chunk.
+    Returning True ends the generation early (the text so far is the answer);
+    raising GenerationAborted abandons it. Either way the connection is closed,
+    which makes Ollama stop generating tokens nobody will read.
+    """
+    import ollama
+    with tracing.span("ollama.chat", model=kwargs.get("model"), stream=True):
+        stream = ollama.chat(stream=True, **kwargs)
+        parts = []
+        chunks = 0
+        response = {}
+        try:
+            for chunk in stream:
+                response = _to_dict(chunk)
+                parts.append(response.get("message", {}).get("content", ""))
+                chunks += 1
+                if not response.get("done") and stop_when("".join(parts), chunks):
+                    response["done"] = True
+                    response["done_reason"] = "stopped_early"
+                    response.setdefault("eval_count", chunks)  # One chunk per token
+                    tracing.count("llm_streams.stopped_early")
+                    break
+        finally:
+            stream.close()
+        response.setdefault("message", {"role": "assistant"})["content"] = "".join(parts)
+        tracing.record_llm(response)
+    return response
+
+
+def lookup(model: str, messages: list, format=None, options=None) -> dict | None:
+    """Returns the cached response for this request, or None (without calling Ollama)."""
+    if not ENABLED:
+        return None
+    cached = _get_cache().get(make_key(model, messages, format, options))
+    if cached is None:
+        return None
+    _count("hits")
+    return json.loads(cached)
+
+
+def chat(model: str, messages: list, format=None, options=None, stop_when=None, **kwargs) -> dict:
+    """
+    Drop-in replacement for ollama.chat() that checks the cache first.
+    Returns a dict shaped like the Ollama response ({'message': {'content': ...}, ...}).
+    Extra keyword arguments (e.g. keep_alive) go to Ollama but are not part of the cache key.
+
+    stop_when: If given, the answer is streamed and checked as it arrives (see _ollama_stream).
+               Aborted generations raise GenerationAborted and are not cached.
+    """
+    if stop_when is not None:
+        call = partial(_ollama_stream, stop_when)
+    else:
+        call = _ollama_chat
+    if not ENABLED:
+        return call(model=model, messages=messages, format=format, options=options, **kwargs)
+
+    cached = lookup(model, messages, format, options)
+    if cached is not None:
+        return cached
+
+    _count("misses")
+    response = call(model=model, messages=messages, format=format, options=options, **kwargs)
+    _get_cache().set(make_key(model, messages, format, options), json.dumps(response).encode("utf-8"))
+    return response
+
+
+def summary() -> str:
+    """One line for the end-of-run report."""
+    if not ENABLED:
+        return "LLM cache: disabled (--no-llm-cache)"
+    total = stats["hits"] + stats["misses"]
+    rate = (stats["hits"] / total * 100) if total else 0.0
+    return f"LLM cache: {stats['hits']} hits, {stats['misses']} misses ({rate:.0f}% hit rate)"
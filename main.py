@@ -1,19 +1,43 @@
-import typer
-import pandas as pd
+import time
 import sys
+_STARTED_AT = time.perf_counter()  # For --import-time
+
+# --import-time has to start timing before the imports below (typer, ...) run;
+# main_callback only prints the report
+if "--import-time" in sys.argv[1:]:
+    import import_profiler
+    import_profiler.install()
+
+import typer
 import os
-import ollama
+import atexit
+import itertools
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 
-# --- Import all modules from your teammates ---
-try:
-    import database_manager  # Person 2
-    import analysis_engine   # Person 3
-    import generation_engine # Person 3 & 4
-    import discovery_engine  # Person 4
-except ModuleNotFoundError as e:
-    print(f"FATAL ERROR: A required file is missing: {e.name}")
-    print("Please ensure all .py files (database_manager.py, analysis_engine.py, etc.) exist in this directory.")
-    sys.exit(1)
+# NOTE: The engine modules (and ollama, the Google clients, ...) are
+# imported inside the commands that use them, so '--help', 'analyze' and
+# 'cache-stats' don't pay for libraries they never touch.
+OUR_MODULES = {
+    "database_manager", "analysis_engine", "generation_engine", "discovery_engine",
+    "pipeline", "llm_cache", "scrape_cache", "serp_cache", "lead_dedup", "disk_cache", "tracing", "checkpoint", "inference",
+    "compaction", "analytics", "rate_limiter", "lead_ranker", "lead_store", "near_dup",
+}
+
+
+@contextmanager
+def _required_modules():
+    """Turns a failed import into the friendly error message we always showed."""
+    try:
+        yield
+    except ModuleNotFoundError as e:
+        if e.name in OUR_MODULES:
+            print(f"FATAL ERROR: A required file is missing: {e.name}")
+            print("Please ensure all .py files (database_manager.py, analysis_engine.py, etc.) exist in this directory.")
+        else:
+            print(f"FATAL ERROR: A required package is missing: {e.name}")
+            print("Please run 'pip install -r requirements.txt'.")
+        sys.exit(1)
 
 
 # --- Initialize the Typer App ---
@@ -26,27 +50,35 @@ app = typer.Typer(
 def _check_ollama_running():
     """A helper function to check if the Ollama server is running."""
     try:
+        import ollama
         ollama.list()
         return True
     except Exception:
         return False
 
 @app.callback(invoke_without_command=True)
-def main_callback(ctx: typer.Context):
+def main_callback(
+    ctx: typer.Context,
+    import_time: bool = typer.Option(
+        False,
+        "--import-time",
+        help="Print a -X importtime style breakdown of how long each module took to import"
+    )
+):
     """
     This callback runs before any command.
-    We use it to check for the Ollama server.
     """
+    if import_time:
+        import import_profiler
+        profiler = import_profiler.install()  # Already installed at the top of this file
+        startup_ms = (time.perf_counter() - _STARTED_AT) * 1000
+        typer.echo(f"import time: CLI ready in {startup_ms:.1f} ms (before running the command)", err=True)
+        atexit.register(profiler.report)
+
     # This check ensures that if someone just types "python main.py", they see the help menu
     if ctx.invoked_subcommand is None:
         typer.echo("Welcome to CyForge! Please use a command like 'run' or 'analyze'.")
         typer.echo("Try 'python main.py --help' for options.")
-    
-    # Check for Ollama *only if* the 'run' command is being used
-    elif ctx.invoked_subcommand == "run" and not _check_ollama_running():
-        typer.secho("Fatal Error: Ollama server is not running.", fg=typer.colors.RED, bold=True)
-        typer.echo("Please start the Ollama application and try again.")
-        raise typer.Exit(code=1)
 
 
 # --- The Main "run" Command ---
@@ -66,33 +98,279 @@ def run(
         False,
         "--dev",
         help="Run in Development Mode (skips database connection and logging)"
+    ),
+    fused: bool = typer.Option(
+        False,
+        "--fused",
+        help="Analyze each lead and draft its email in ONE Ollama call (falls back to two calls on bad output)"
+    ),
+    no_llm_cache: bool = typer.Option(
+        False,
+        "--no-llm-cache",
+        help="Always call Ollama, ignoring (and not updating) the on-disk LLM cache"
+    ),
+    extract_mode: str = typer.Option(
+        "fast",
+        "--extract-mode",
+        help="'fast' streams pages through lxml with a size cap; 'full' parses whole pages with BeautifulSoup"
+    ),
+    no_serp_cache: bool = typer.Option(
+        False,
+        "--no-serp-cache",
+        help="Always call SerpAPI, ignoring the on-disk search cache"
+    ),
+    serp_offline: bool = typer.Option(
+        False,
+        "--serp-offline",
+        help="Never call SerpAPI: replay cached searches only (costs no credits)"
+    ),
+    no_scrape_cache: bool = typer.Option(
+        False,
+        "--no-scrape-cache",
+        help="Always download websites again, ignoring the on-disk scrape cache"
+    ),
+    locations: str = typer.Option(
+        "United States",
+        "--locations",
+        help="Comma-separated locations to search for leads in (e.g. 'United States,Canada')"
+    ),
+    serp_pages: int = typer.Option(
+        1,
+        "--serp-pages",
+        help="Result pages to fetch per search query (10 results each)"
+    ),
+    serp_credits: int = typer.Option(
+        10,
+        "--serp-credits",
+        help="Maximum number of SerpAPI searches (credits) to spend on this run"
+    ),
+    serp_workers: int = typer.Option(
+        4,
+        "--serp-workers",
+        help="How many SerpAPI searches to run at the same time"
+    ),
+    dedup_by: str = typer.Option(
+        "domain",
+        "--dedup-by",
+        help="'domain' skips any lead whose company domain is already logged; 'url' only skips the same (canonical) URL"
+    ),
+    bloom_index: bool = typer.Option(
+        False,
+        "--bloom-index",
+        help="Keep the dedup index in a Bloom filter (fixed memory for very large lead databases)"
+    ),
+    near_dup_distance: int = typer.Option(
+        3,
+        "--near-dup-distance",
+        help="Pages whose SimHash differs by at most this many bits count as near-duplicates (-1 disables)"
+    ),
+    near_dup_action: str = typer.Option(
+        "skip",
+        "--near-dup-action",
+        help="'skip' near-duplicate pages, or 'reuse' the original page's analysis for them"
+    ),
+    top_k: int = typer.Option(
+        None,
+        "--top-k",
+        help="Score every scraped lead and send only the K best to the LLM, PDF and upload stages, best first"
+    ),
+    min_score: float = typer.Option(
+        None,
+        "--min-score",
+        help="Score every scraped lead and drop those below this score (relevance 0-1 plus URL/title adjustments)"
+    ),
+    scrape_workers: int = typer.Option(
+        8,
+        "--scrape-workers",
+        help="How many lead websites to scrape at the same time"
+    ),
+    async_scrape: bool = typer.Option(
+        True,
+        "--async-scrape/--sync-scrape",
+        help="Scrape over one pooled aiohttp session (falls back to requests if aiohttp is missing)"
+    ),
+    llm_workers: int = typer.Option(
+        2,
+        "--llm-workers",
+        help="How many leads can wait on the LLM at once (keep this above --ollama-parallel so the server never idles)"
+    ),
+    ollama_parallel: int = typer.Option(
+        None,
+        "--ollama-parallel",
+        help="How many Ollama requests to send at the same time (default: $OLLAMA_NUM_PARALLEL or 1)"
+    ),
+    keep_alive: str = typer.Option(
+        None,
+        "--keep-alive",
+        help="How long Ollama keeps the model loaded between requests (default: 30m)"
+    ),
+    num_ctx: int = typer.Option(
+        None,
+        "--num-ctx",
+        help="Context window for every request; one fixed size avoids model reloads (default: 8192)"
+    ),
+    prompt_tokens: int = typer.Option(
+        None,
+        "--prompt-tokens",
+        help="Token budget for the website text in each prompt; the most relevant sentences are kept (default: 700)"
+    ),
+    stream_emails: bool = typer.Option(
+        True,
+        "--stream-emails/--no-stream-emails",
+        help="Stream each email and stop generating once it is signed (runaway emails are retried)"
+    ),
+    pdf_workers: int = typer.Option(
+        2,
+        "--pdf-workers",
+        help="How many PDF portfolios to render at the same time"
+    ),
+    io_workers: int = typer.Option(
+        4,
+        "--io-workers",
+        help="How many Google Drive/Sheets calls to run at the same time"
+    ),
+    trace_file: str = typer.Option(
+        None,
+        "--trace",
+        help="Append a JSON-lines trace of every phase, step and API call to this file"
+    ),
+    metrics_port: int = typer.Option(
+        None,
+        "--metrics-port",
+        help="Serve live Prometheus metrics on http://localhost:PORT/metrics while the run is going"
+    ),
+    resume: bool = typer.Option(
+        False,
+        "--resume",
+        help="Continue the last interrupted run from its checkpoint journal (skips work that was already done)"
+    ),
+    use_checkpoint: bool = typer.Option(
+        True,
+        "--checkpoint/--no-checkpoint",
+        help="Record every lead's progress in a checkpoint journal under .cache/checkpoints"
     )
 ):
     """
     Run the full lead generation and outreach pipeline.
     """
+    # Check for Ollama in the background while Phase 1 scrapes our website
+    health_checker = ThreadPoolExecutor(max_workers=1)
+    ollama_running = health_checker.submit(_check_ollama_running)
+
+    with _required_modules():
+        import database_manager  # Person 2
+        import analysis_engine   # Person 3
+        import generation_engine # Person 3 (emails + PDFs)
+        import discovery_engine  # Person 4
+        import pipeline          # Concurrent Phase 4 engine
+        import llm_cache         # On-disk cache for Ollama completions
+        import scrape_cache      # On-disk cache for scraped website text
+        import serp_cache        # On-disk cache for SerpAPI responses
+        import lead_dedup        # Canonical URL / company-domain dedup
+        import tracing           # Spans + counters for the end-of-run summary
+        import checkpoint        # Write-ahead journal for --resume
+        import inference         # Ollama scheduler: keep-alive, priorities, coalescing
+        import rate_limiter      # Token buckets, AIMD concurrency and circuit breakers per service
+        import compaction        # Token-budgeted website text for the prompts
+        import near_dup          # SimHash near-duplicate pages
+
+    tracing.configure(trace_file=trace_file, metrics_port=metrics_port)
+    inference.configure(max_parallel=ollama_parallel, keep_alive=keep_alive, num_ctx=num_ctx)
+    # Right after the health check: load the model while Phase 1 is still scraping
+    health_checker.submit(inference.warm_up)
+    health_checker.shutdown(wait=False)
+    atexit.register(tracing.close)
+
     typer.secho("🚀 Starting CyForge: The AI Smart Marketing Assistant...", fg=typer.colors.CYAN, bold=True)
     if dev:
         typer.secho("    -- DEV MODE ACTIVE (Database will be skipped) --", fg=typer.colors.YELLOW)
+    llm_cache.ENABLED = not no_llm_cache
+    scrape_cache.ENABLED = not no_scrape_cache
+    serp_cache.ENABLED = not no_serp_cache
+    serp_cache.OFFLINE = serp_offline
+    if extract_mode not in ("fast", "full"):
+        typer.secho(f"Invalid --extract-mode '{extract_mode}'. Use 'fast' or 'full'.", fg=typer.colors.RED)
+        raise typer.Exit(code=1)
+    analysis_engine.EXTRACT_MODE = extract_mode
+    generation_engine.STREAM_EMAILS = stream_emails
+    if prompt_tokens is not None:
+        compaction.TOKEN_BUDGET = prompt_tokens
+    if near_dup_action not in ("skip", "reuse"):
+        typer.secho(f"Invalid --near-dup-action '{near_dup_action}'. Use 'skip' or 'reuse'.", fg=typer.colors.RED)
+        raise typer.Exit(code=1)
+    for option, value in (("--serp-pages", serp_pages), ("--serp-credits", serp_credits), ("--top-k", top_k)):
+        if value is not None and value < 1:
+            typer.secho(f"Invalid {option} {value}. Use 1 or more.", fg=typer.colors.RED)
+            raise typer.Exit(code=1)
+    if min_score is not None and min_score <= 0:
+        typer.secho(f"Invalid --min-score {min_score}. Use a score above 0.", fg=typer.colors.RED)
+        raise typer.Exit(code=1)
+    if not -1 <= near_dup_distance <= near_dup.MAX_DISTANCE:
+        typer.secho(
+            f"Invalid --near-dup-distance {near_dup_distance}. Use 0 to {near_dup.MAX_DISTANCE}, or -1 to disable.",
+            fg=typer.colors.RED
+        )
+        raise typer.Exit(code=1)
+    if dedup_by not in ("domain", "url"):
+        typer.secho(f"Invalid --dedup-by '{dedup_by}'. Use 'domain' or 'url'.", fg=typer.colors.RED)
+        raise typer.Exit(code=1)
+
 
+    # --- Checkpoint journal ---
+    journal = None
+    if resume:
+        journal = checkpoint.Journal.latest()
+        if journal is None:
+            typer.secho("No checkpoint journal found. Starting a fresh run.", fg=typer.colors.YELLOW)
+        else:
+            finished, unfinished = journal.counts()
+            typer.secho(f"Resuming {journal.path}: {finished} lead(s) finished, {unfinished} still to do.", fg=typer.colors.CYAN)
+    if journal is None and (use_checkpoint or resume):
+        journal = checkpoint.Journal.create()
+        checkpoint.prune()  # Keeps the newest KEEP_JOURNALS, this one included
+    resumed_services = None
+    if journal is not None and journal.run_info.get("url") == url:
+        resumed_services = journal.run_info.get("services")
 
     # --- Phase 1: Analyze Self [Person 3's Code] ---
     typer.echo("\n--- Phase 1: Analyzing Your Business ---")
     try:
-        services_list_str = analysis_engine.analyze_my_business(url, desc)
+        if not resumed_services:
+            with tracing.span("1.scrape_own_site", url=url):
+                own_site_text = analysis_engine._get_text_from_url(url)
+
+        if not ollama_running.result():
+            typer.secho("Fatal Error: Ollama server is not running.", fg=typer.colors.RED, bold=True)
+            typer.echo("Please start the Ollama application and try again.")
+            raise typer.Exit(code=1)
+
+        if resumed_services:
+            typer.echo("Using the services found by the interrupted run.")
+            services_list_str = resumed_services
+        else:
+            # "" (not None) when scraping failed, so it falls back to the description without retrying
+            with tracing.span("1.analyze_self"):
+                services_list_str = analysis_engine.analyze_my_business(url, desc, text=own_site_text or "")
+            if journal is not None:
+                journal.record_run(url=url, services=services_list_str)
         typer.secho(f"✅ Found Services: {services_list_str}", fg=typer.colors.GREEN)
+    except typer.Exit:
+        raise
     except Exception as e:
         typer.secho(f"CRASH in analysis_engine.py (Person 3): {e}", fg=typer.colors.RED)
         raise typer.Exit(code=1)
 
     # --- Phase 2: Discover Leads [Person 4's Code] ---
+    # Searches start now, in the background; leads stream into Phase 4 as they arrive.
     typer.echo("\n--- Phase 2: Discovering New Leads ---")
     try:
-        leads = discovery_engine.find_leads(services_list_str)
-        if not leads:
-            typer.secho("No new leads found. Check SerpAPI key or queries. Exiting.", fg=typer.colors.YELLOW)
-            raise typer.Exit()
-        typer.secho(f"✅ Found {len(leads)} potential leads via SerpAPI.", fg=typer.colors.GREEN)
+        leads = discovery_engine.LeadDiscovery(
+            services_list_str,
+            locations=[loc.strip() for loc in locations.split(",") if loc.strip()],
+            max_pages=serp_pages,
+            max_credits=serp_credits,
+            max_workers=serp_workers
+        )
     except Exception as e:
         typer.secho(f"CRASH in discovery_engine.py (Person 4): {e}", fg=typer.colors.RED)
         raise typer.Exit(code=1)
@@ -105,117 +383,214 @@ def run(
         typer.secho("Skipping database connection in --dev mode.", fg=typer.colors.YELLOW)
     else:
         try:
-            db = database_manager.Database()
-            existing_urls = db.get_existing_urls()
+            with tracing.span("3.connect_database"):
+                db = database_manager.Database()
+                existing_urls = db.get_existing_urls()
             typer.secho(f"✅ Connected to Google Sheets. Found {len(existing_urls)} existing leads.", fg=typer.colors.GREEN)
         except Exception as e:
             typer.secho(f"CRASH in database_manager.py (Person 2): {e}", fg=typer.colors.RED)
             typer.secho("Continuing in --dev mode. No data will be logged.", fg=typer.colors.YELLOW)
             dev = True # Force dev mode if the database fails
 
+    # --- Dedup: canonical URLs + company domains, before any scraping ---
+    dedup_index = lead_dedup.DedupIndex.from_urls(
+        existing_urls, by_domain=(dedup_by == "domain"), use_bloom=bloom_index
+    )
+    if resume and journal is not None:
+        # Unfinished leads from the interrupted run go first
+        new_leads = dedup_index.filter(itertools.chain(journal.unfinished_leads(), leads))
+    else:
+        new_leads = dedup_index.filter(leads)
+
     # --- Phase 4: Main Processing Loop ---
+    # Each stage (scrape, LLM, PDF, Google I/O) has its own worker pool,
+    # so many leads are in flight at once. See pipeline.py.
     typer.echo("\n--- Phase 4: Processing New Leads ---")
-    new_leads_processed = 0
-    for lead in leads:
-        lead_name = lead.get('name', 'Unknown Company')
-        lead_url = lead.get('url')
-
-        if not lead_url:
-            typer.secho(f"Skipping lead with no URL.", fg=typer.colors.YELLOW)
-            continue
-        
-        if lead_url in existing_urls:
-            typer.echo(f"Skipping duplicate: {lead_name}")
-            continue
-
-        try:
-            typer.secho(f"\nProcessing new lead: {lead_name} ({lead_url})", bold=True)
-            
-            # --- 4a: Analyze Client [Person 3] ---
-            client_info = analysis_engine.analyze_client(lead_url)
-            if not client_info:
-                typer.secho(f"  -> Failed to analyze {lead_url}. Skipping.", fg=typer.colors.YELLOW)
-                continue
-            typer.echo(f"  -> Analyzed. Industry: {client_info.get('industry', 'N/A')}")
-            
-            # --- 4b: Generate Email [Person 3] ---
-            email_draft = generation_engine.generate_email(services_list_str, client_info)
-            typer.echo("  -> Email draft generated.")
-            
-            # --- 4c: Generate PDF [Person 4] ---
-            pdf_path = generation_engine.create_portfolio_pdf(services_list_str, client_info, lead_name)
-            typer.echo(f"  -> PDF portfolio created at {pdf_path}")
-            
-            # --- 4d: Upload & Log [Person 2] ---
-            if dev:
-                typer.secho("  -> Skipping database logging (--dev mode).", fg=typer.colors.YELLOW)
-            else:
-                typer.echo("  -> Uploading PDF to Google Drive...")
-                drive_link = db.upload_pdf(pdf_path, lead_name)
-                typer.echo("  -> Logging to Google Sheets...")
-                db.log_lead(
-                    name=lead_name,
-                    url=lead_url,
-                    summary=client_info.get('summary', 'N/A'),
-                    industry=client_info.get('industry', 'N/A'),
-                    email=email_draft,
-                    drive_link=drive_link
-                )
-            
-            new_leads_processed += 1
-            typer.secho(f"✅ Successfully processed {lead_name}", fg=typer.colors.GREEN)
+    config = pipeline.PipelineConfig(
+        scrape_workers=scrape_workers,
+        llm_workers=llm_workers,
+        pdf_workers=pdf_workers,
+        io_workers=io_workers,
+        async_scrape=async_scrape,
+        fused=fused,
+        near_dup_distance=near_dup_distance,
+        near_dup_action=near_dup_action,
+        top_k=top_k,
+        min_score=min_score,
+        dev=dev
+    )
+    lead_pipeline = pipeline.LeadPipeline(services_list_str, db=db, config=config, journal=journal)
+    try:
+        with tracing.span("4.process_leads"):
+            lead_pipeline.process(new_leads, existing_urls)
+    finally:
+        if db is not None:
+            with tracing.span("4d.final_flush"):
+                db.close()  # Write any rows still buffered for Google Sheets
+        if journal is not None:
+            journal.close()
+            journal.compact()  # Only once every lead is final: drops the text, emails and PDFs
+    new_leads_processed = len(lead_pipeline.processed)
 
-        except Exception as e:
-            typer.secho(f"CRASH: Failed to process {lead_name}. Error: {e}", fg=typer.colors.RED)
-            import traceback
-            traceback.print_exc() # Print full error trace for debugging
-            continue # Skip to the next lead
+    if leads.leads_found == 0:
+        typer.secho("No new leads found. Check SerpAPI key or queries.", fg=typer.colors.YELLOW)
+    else:
+        typer.secho(f"✅ Found {leads.leads_found} potential leads via SerpAPI ({leads.credits_used} credits used).", fg=typer.colors.GREEN)
 
     typer.secho(f"\n--- Pipeline Complete ---", fg=typer.colors.CYAN, bold=True)
     typer.secho(f"Processed {new_leads_processed} new leads.", fg=typer.colors.GREEN)
+    typer.echo(llm_cache.summary())
+    typer.echo(inference.summary())
+    typer.echo(rate_limiter.summary())
+    typer.echo(serp_cache.summary())
+    if journal is not None:
+        typer.echo(f"Checkpoint journal: {journal.path} (continue an interrupted run with --resume)")
+
+    typer.secho("\n--- Where The Time Went ---", fg=typer.colors.CYAN, bold=True)
+    typer.echo(tracing.summary_table())
+    if trace_file:
+        typer.echo(f"Trace written to {trace_file}")
 
 
 # --- The Bonus "analyze" Command ---
 @app.command()
-def analyze():
+def analyze(
+    period: str = typer.Option(
+        "M",
+        "--period",
+        help="Time bucket for 'Leads by Industry Over Time': D (day), W (week) or M (month)"
+    ),
+    sync: bool = typer.Option(
+        True,
+        "--sync/--no-sync",
+        help="Pull new rows from the Google Sheet first (--no-sync reports on the local copy only)"
+    ),
+    full_sync: bool = typer.Option(
+        False,
+        "--full-sync",
+        help="Rebuild the local copy from the whole sheet (use after editing or deleting rows by hand)"
+    )
+):
     """
     Analyzes the leads in the Google Sheet and prints a report.
     """
-    typer.secho("📊 Analyzing Lead Database...", fg=typer.colors.CYAN, bold=True)
-    try:
-        db = database_manager.Database()
-        records = db.get_all_records()
-    except Exception as e:
-        typer.secho(f"CRASH in database_manager.py (Person 2): {e}", fg=typer.colors.RED)
+    if period not in ("D", "W", "M"):
+        typer.secho(f"Invalid --period '{period}'. Use D, W or M.", fg=typer.colors.RED)
         raise typer.Exit(code=1)
 
-    if len(records) < 2: # Only 1 row (headers) or 0
-        typer.secho("No data to analyze. Run the 'run' command first.", fg=typer.colors.YELLOW)
-        return
+    with _required_modules():
+        import analytics         # Aggregate reports over the local lead store
+        import lead_store        # SQLite mirror of the sheet
+        if sync:
+            import database_manager  # Person 2
 
-    # Convert to Pandas DataFrame
-    try:
-        headers = records[0]
-        data = records[1:]
-        df = pd.DataFrame(data, columns=headers)
-    except Exception as e:
-        typer.secho(f"Error creating DataFrame. Is the sheet empty or malformed? {e}", fg=typer.colors.RED)
+    typer.secho("📊 Analyzing Lead Database...", fg=typer.colors.CYAN, bold=True)
+    if sync:
+        try:
+            db = database_manager.Database(read_only=True)
+        except Exception as e:
+            typer.secho(f"CRASH in database_manager.py (Person 2): {e}", fg=typer.colors.RED)
+            raise typer.Exit(code=1)
+        store = db.lead_store
+        try:
+            db.sync(full=full_sync)  # Only rows added since the last sync are downloaded
+        except Exception as e:
+            typer.secho(f"Warning: Could not sync new rows from the Sheet. Using local copy. {e}", fg=typer.colors.YELLOW)
+    else:
+        store = lead_store.LeadStore()
+
+    total_leads = store.count()
+    if total_leads == 0:
+        typer.secho("No data to analyze. Run the 'run' command first.", fg=typer.colors.YELLOW)
         return
 
     typer.echo(f"\n--- Analytics Report ---")
-    typer.secho(f"Total Leads Logged: {len(df)}", bold=True)
+    typer.secho(f"Total Leads Logged: {total_leads}", bold=True)
     
-    if "Industry" in df.columns:
-        typer.secho("\nLeads by Industry:", bold=True)
-        # Use to_string() for clean printing in the terminal
-        industry_counts = df["Industry"].value_counts().to_string()
-        typer.echo(industry_counts)
+    typer.secho("\nLeads by Industry:", bold=True)
+    typer.echo(analytics.format_table(["Industry", "Leads"], analytics.industry_counts(store)))
+
+    periods, industries, counts = analytics.industry_over_time(store, period)
+    typer.secho("\nLeads by Industry Over Time:", bold=True)
+    if not periods:
+        typer.echo("(no rows have a 'Logged At' time yet)")
     else:
-        typer.secho("\n'Industry' column not found. Run the pipeline to populate it.", fg=typer.colors.YELLOW)
+        # The busiest industries as columns, everything else summed up
+        top, rest = industries[:6], industries[6:]
+        rows = []
+        for when in periods:
+            row = [when] + [counts.get((when, industry), 0) for industry in top]
+            if rest:
+                row.append(sum(counts.get((when, industry), 0) for industry in rest))
+            rows.append(row)
+        headers = ["Week of" if period == "W" else "Period"] + top + (["Other"] if rest else [])
+        typer.echo(analytics.format_table(headers, rows))
+
+    rate, repeated = analytics.duplicate_domains(store)
+    typer.secho(f"\nDuplicate Company Domains: {rate:.1%} of leads", bold=True)
+    if repeated:
+        typer.echo(analytics.format_table(["Domain", "Leads"], repeated))
+
+    failures = analytics.upload_failures(store)
+    failed = sum(row[2] for row in failures)
+    typer.secho(f"\nDrive Upload Failures: {failed} of {total_leads} ({failed / total_leads:.1%})", bold=True)
+    if failed:
+        rows = [(industry, leads, n, f"{rate:.1%}") for industry, leads, n, rate in failures if n]
+        typer.echo(analytics.format_table(["Industry", "Leads", "Failed", "Rate"], rows))
+
+    stats, histogram = analytics.email_lengths(store)
+    typer.secho("\nEmail Length (words):", bold=True)
+    typer.echo(
+        f"mean {stats['mean']:.0f}, median {stats['50%']:.0f}, p90 {stats['90%']:.0f}, "
+        f"p99 {stats['99%']:.0f}, max {stats['max']:.0f}"
+    )
+    typer.echo(analytics.format_table(["Words", "Leads"], histogram))
     
     typer.secho("------------------------", bold=True)
 
 
+# --- Cache Maintenance ---
+@app.command(name="cache-stats")
+def cache_stats(
+    clear: bool = typer.Option(
+        False,
+        "--clear",
+        help="Delete every entry from all caches after printing the stats"
+    )
+):
+    """
+    Shows the size of CyForge's local caches (LLM, scraped pages, SerpAPI, lead store).
+    """
+    with _required_modules():
+        from disk_cache import DiskCache
+        import llm_cache
+        import scrape_cache
+        import serp_cache
+        from lead_store import LeadStore
+
+    typer.secho("🗄️  CyForge Cache Statistics", fg=typer.colors.CYAN, bold=True)
+    caches = {
+        "LLM completions": DiskCache("llm", max_bytes=llm_cache.MAX_CACHE_BYTES),
+        "Scraped pages": DiskCache("scrape", max_bytes=scrape_cache.MAX_CACHE_BYTES),
+        "SerpAPI searches": DiskCache("serpapi", max_bytes=serp_cache.MAX_CACHE_BYTES),
+    }
+    for label, cache in caches.items():
+        info = cache.stats()
+        used_mb = info["bytes"] / (1024 * 1024)
+        max_mb = info["max_bytes"] / (1024 * 1024)
+        typer.echo(f"{label:<18} {info['entries']:>7} entries  {used_mb:8.2f} / {max_mb:.0f} MB  ({info['path']})")
+        if clear:
+            cache.clear()
+    # The local mirror of the lead sheet ('run' and 'analyze' download it again after a clear)
+    store = LeadStore()
+    info = store.stats()
+    typer.echo(f"{'Lead store':<18} {info['rows']:>7} rows     {info['bytes'] / (1024 * 1024):8.2f} MB       ({info['path']})")
+    if clear:
+        store.clear()
+    if clear:
+        typer.secho("All caches cleared.", fg=typer.colors.GREEN)
+
+
 # --- This makes the script runnable ---
 if __name__ == "__main__":
     app()
\ No newline at end of file
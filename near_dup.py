@@ -0,0 +1,109 @@
+# near_dup.py
+# Near-duplicate page detection with SimHash fingerprints.
+#
+# Many search results are "Top 10 companies" articles or aggregator pages
+# with almost the same text. Each scraped page gets a 64-bit SimHash; pages
+# whose fingerprints differ in only a few bits (Hamming distance) are
+# near-duplicates. A banded LSH index finds candidates without comparing
+# against every page seen so far: with max_distance d, the fingerprint is cut
+# into d + 1 bands, and any two fingerprints within distance d must share at
+# least one band exactly (pigeonhole principle). That holds for any d, but
+# above FINGERPRINT_BITS / 2 - 1 (31) the bands are only 1 bit (or 0 bits)
+# wide, so nearly every page shares a bucket and each lookup compares against
+# almost every page seen so far. d is capped there as a performance limit.
+import hashlib
+import re
+import threading
+
+
+# --- CONFIGURATION ---
+FINGERPRINT_BITS = 64
+SHINGLE_SIZE = 3    # Words per shingle
+MIN_WORDS = 30      # Pages shorter than this are too small to fingerprint reliably
+# --- END CONFIGURATION ---
+
+MAX_DISTANCE = FINGERPRINT_BITS // 2 - 1  # Keeps every band at least 2 bits wide, so buckets stay selective
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _hash64(token: str) -> int:
+    return int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def simhash(text: str, shingle_size: int = SHINGLE_SIZE) -> int | None:
+    """Returns the 64-bit SimHash of a text, or None if it is too short to be meaningful."""
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < MIN_WORDS:
+        return None
+
+    weights = [0] * FINGERPRINT_BITS
+    shingles = {" ".join(words[i:i + shingle_size]) for i in range(len(words) - shingle_size + 1)}
+    for shingle in shingles:
+        h = _hash64(shingle)
+        for bit in range(FINGERPRINT_BITS):
+            weights[bit] += 1 if (h >> bit) & 1 else -1
+
+    fingerprint = 0
+    for bit, weight in enumerate(weights):
+        if weight > 0:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+class SimHashIndex:
+    """Banded LSH index of fingerprints -> payload (e.g. the lead that owns the page)."""
+
+    def __init__(self, max_distance: int = 3):
+        if not 0 <= max_distance <= MAX_DISTANCE:
+            raise ValueError(f"max_distance must be between 0 and {MAX_DISTANCE}, got {max_distance}")
+        self.max_distance = max_distance
+        self.band_count = max_distance + 1
+        self.band_bits = FINGERPRINT_BITS // self.band_count
+        self._bands = [dict() for _ in range(self.band_count)]  # band value -> [(fingerprint, payload)]
+        self._lock = threading.Lock()
+
+    def _band_values(self, fingerprint: int):
+        mask = (1 << self.band_bits) - 1
+        for band in range(self.band_count):
+            # The last band also takes any leftover bits
+            if band == self.band_count - 1:
+                yield band, fingerprint >> (band * self.band_bits)
+            else:
+                yield band, (fingerprint >> (band * self.band_bits)) & mask
+
+    def _closest(self, fingerprint: int):
+        # Caller holds self._lock
+        best = None
+        for band, value in self._band_values(fingerprint):
+            for other, payload in self._bands[band].get(value, ()):
+                distance = hamming_distance(fingerprint, other)
+                if distance <= self.max_distance and (best is None or distance < best[1]):
+                    best = (payload, distance)
+        return best
+
+    def _insert(self, fingerprint: int, payload):
+        # Caller holds self._lock
+        for band, value in self._band_values(fingerprint):
+            self._bands[band].setdefault(value, []).append((fingerprint, payload))
+
+    def find(self, fingerprint: int):
+        """Returns (payload, distance) of the closest indexed fingerprint within max_distance, or None."""
+        with self._lock:
+            return self._closest(fingerprint)
+
+    def add(self, fingerprint: int, payload):
+        with self._lock:
+            self._insert(fingerprint, payload)
+
+    def find_or_add(self, fingerprint: int, payload):
+        """Atomically: returns the near-duplicate match, or indexes this fingerprint and returns None."""
+        with self._lock:
+            best = self._closest(fingerprint)
+            if best is None:
+                self._insert(fingerprint, payload)
+            return best
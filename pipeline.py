@@ -0,0 +1,529 @@
+# pipeline.py
+# Concurrent lead-processing engine for Phase 4 of the 'run' command.
+#
+# Every lead goes through the same chain of steps, but each step runs in the
+# worker pool of its *stage*, and every stage has its own worker limit:
+#
+#   scrape  -> fetch the lead's website text           (--scrape-workers)
+#   llm     -> analyze_client, then generate_email      (--llm-workers)
+#   pdf     -> create_portfolio_pdf (worker processes)  (--pdf-workers)
+#   io      -> Drive upload + Sheet log                 (--io-workers)
+#
+# While lead #1 is in the LLM, lead #2 is being scraped and lead #0 is being
+# uploaded, so a batch takes roughly as long as its slowest stage instead of
+# the sum of all stages.
+#
+# With --top-k / --min-score, leads stop after the scrape stage until every
+# lead has been scraped. lead_ranker then scores the batch, and only the
+# chosen leads continue to the LLM, best first.
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+import typer
+
+import analysis_engine
+import async_fetcher
+import generation_engine
+import lead_ranker
+import near_dup
+import portfolio_renderer
+import tracing
+
+
+STAGES = ("scrape", "llm", "pdf", "io")
+
+# Sub-step numbers from the README, used to name the tracing spans (e.g. "4b.email")
+STAGE_LABELS = {"scrape": "4a", "llm": "4b", "pdf": "4c", "io": "4d"}
+
+# The checkpoint journal stage each step completes (see checkpoint.py)
+STEP_CHECKPOINTS = {
+    "scrape": "scraped",
+    "analyze": "analyzed",
+    "email": "emailed",
+    "analyze_and_email": "emailed",
+    "pdf": "rendered",
+    "upload": "uploaded",
+    "log": "logged",
+}
+
+
+@dataclass
+class PipelineConfig:
+    """Worker limits for each stage, plus the --dev flag from the CLI."""
+    scrape_workers: int = 8
+    llm_workers: int = 2
+    pdf_workers: int = 2
+    io_workers: int = 4
+    async_scrape: bool = True  # Share one pooled aiohttp session across scrape workers
+    fused: bool = False        # One LLM call for analysis + email (falls back to two calls)
+    near_dup_distance: int = 3      # Max SimHash bit difference for a near-duplicate page (-1 = off)
+    near_dup_action: str = "skip"   # "skip" the lead, or "reuse" the original page's analysis
+    top_k: int | None = None        # Only the best K scraped leads go on to the LLM
+    min_score: float | None = None  # Only scraped leads scoring at least this go on to the LLM
+    dev: bool = False
+
+    def workers_for(self, stage: str) -> int:
+        return max(1, getattr(self, f"{stage}_workers"))
+
+    @property
+    def ranking(self) -> bool:
+        return self.top_k is not None or self.min_score is not None
+
+
+@dataclass
+class LeadResult:
+    """Everything the pipeline learned about one lead."""
+    name: str
+    url: str
+    status: str = "pending"  # pending -> processed | skipped | failed
+    reason: str = ""
+    text: str | None = None
+    client_info: dict | None = None
+    email: str | None = None
+    pdf: str | bytes | None = None
+    drive_link: str | None = None
+    drive_file_id: str | None = None
+    near_duplicate_of: "LeadResult | None" = None  # Set when this page is almost the same as an earlier one
+    score: float | None = None  # lead_ranker score, when ranking is on
+    timings: dict = field(default_factory=dict)  # step name -> seconds
+
+
+class SkipLead(Exception):
+    """Raised by a step to stop processing a lead without treating it as a crash."""
+
+
+class LeadPipeline:
+    """
+    Runs Phase 4 for a batch of leads using one thread pool per stage.
+
+    A failure in any step only affects that lead; the rest of the batch keeps going.
+    """
+
+    def __init__(self, services_list_str: str, db=None, config: PipelineConfig | None = None, journal=None):
+        self.services_list_str = services_list_str
+        self.db = db
+        self.config = config or PipelineConfig()
+        self.journal = journal  # checkpoint.Journal: records progress, and lets --resume skip finished work
+
+        # (step name, stage) - the order every lead goes through
+        if self.config.fused:
+            llm_steps = [("analyze_and_email", "llm")]
+        else:
+            llm_steps = [("analyze", "llm"), ("email", "llm")]
+        self.steps = [("scrape", "scrape"), *llm_steps, ("pdf", "pdf"), ("upload", "io"), ("log", "io")]
+        self._analysis_step = 1  # "analyze" or "analyze_and_email"
+        # Leads about to start this step wait to be ranked (see _release_ranked)
+        self._rank_before = self._analysis_step if self.config.ranking else None
+        self._waiting_for_rank: list[LeadResult] = []
+        # Near-duplicates waiting for their original's analysis: original URL -> [(lead, step index)]
+        self._analysis_waiters: dict[str, list] = {}
+        # URL -> whether its analysis succeeded, once it is done (or will never happen)
+        self._settled: dict[str, bool] = {}
+        # Original URL -> the near-duplicate analyzed in its place after its analysis failed
+        self._promoted: dict[str, LeadResult] = {}
+
+        self._pools = {}
+        self._fetcher = None
+        self._renderer = None
+        self._near_dups = (
+            near_dup.SimHashIndex(self.config.near_dup_distance) if self.config.near_dup_distance >= 0 else None
+        )
+        self._in_flight = 0
+        self._done = threading.Condition()
+        self._stopping = False  # Set when process() is shutting down (finished, or Ctrl-C)
+        self.results: list[LeadResult] = []
+
+    # --- Public API ---
+
+    def process(self, leads, existing_urls=None) -> list[LeadResult]:
+        """
+        Processes every lead and blocks until all of them are finished.
+
+        leads: An iterable of {"name": ..., "url": ...} dicts (from discovery_engine).
+        existing_urls: URLs already in the database. These (and repeats inside the
+                       batch itself) are skipped before any work is done.
+        """
+        seen = set(existing_urls or ())
+        self._pools = {
+            stage: ThreadPoolExecutor(
+                max_workers=self.config.workers_for(stage),
+                thread_name_prefix=f"cyforge-{stage}"
+            )
+            for stage in STAGES
+        }
+        if self.config.async_scrape and async_fetcher.is_available():
+            self._fetcher = async_fetcher.BackgroundFetcher(
+                max_concurrency=self.config.workers_for("scrape")
+            )
+            self._fetcher.start()
+        # PDF layout is CPU-bound, so it runs in worker processes, not threads
+        self._renderer = portfolio_renderer.PortfolioRenderer(max_workers=self.config.workers_for("pdf"))
+        self._reshare_uploads()
+        try:
+            for lead in leads:
+                lead_name = lead.get('name', 'Unknown Company')
+                lead_url = lead.get('url')
+
+                if not lead_url:
+                    typer.secho("Skipping lead with no URL.", fg=typer.colors.YELLOW)
+                    continue
+
+                if lead_url in seen:
+                    typer.echo(f"Skipping duplicate: {lead_name}")
+                    continue
+                seen.add(lead_url)
+
+                result = LeadResult(name=lead_name, url=lead_url)
+                first_step = 0
+                if self.journal is not None:
+                    state = self.journal.state_for(lead_url)
+                    if state is None:
+                        self.journal.record(lead_url, lead_name, "discovered")
+                    elif state.finished:
+                        typer.echo(f"Skipping {lead_name}: already finished in an earlier run.")
+                        continue
+                    else:
+                        first_step = self._restore(result, state)
+
+                self.results.append(result)
+                if first_step:
+                    typer.secho(f"\nResuming lead: {lead_name} at step '{self.steps[first_step][0]}'", bold=True)
+                else:
+                    typer.secho(f"\nQueued new lead: {lead_name} ({lead_url})", bold=True)
+                self._start(result, first_step)
+
+            self._wait_for_all()
+            if self._waiting_for_rank:
+                self._release_ranked()
+                self._wait_for_all()
+        finally:
+            # On Ctrl-C, drop the queued steps: running ones finish, and nothing new starts
+            self._stopping = True
+            for pool in self._pools.values():
+                pool.shutdown(wait=True, cancel_futures=True)
+            if self._fetcher is not None:
+                self._fetcher.stop()
+                self._fetcher = None
+            self._renderer.close()
+
+        return self.results
+
+    @property
+    def processed(self) -> list[LeadResult]:
+        return [r for r in self.results if r.status == "processed"]
+
+    # --- Scheduling ---
+
+    def _start(self, result: LeadResult, first_step: int = 0):
+        with self._done:
+            self._in_flight += 1
+        self._advance(result, first_step)
+
+    def _advance(self, result: LeadResult, step_index: int):
+        if self._stopping:
+            self._finish()  # Interrupted: don't start the lead's next stage
+            return
+        if step_index == self._rank_before:
+            with self._done:
+                self._waiting_for_rank.append(result)
+            self._finish()  # Out of flight until every lead is scraped
+            return
+        if step_index == self._analysis_step and self._wait_for_original(result, step_index):
+            return
+        self._submit(result, step_index)
+
+    def _wait_for_original(self, result: LeadResult, step_index: int) -> bool:
+        """
+        Parks a near-duplicate (without holding an LLM worker) until its original's
+        analysis is done, so it can be reused or skipped. Returns True if the lead was parked.
+        """
+        if result.near_duplicate_of is None:
+            return False
+        with self._done:
+            original = result.near_duplicate_of
+            while original.url in self._promoted:
+                original = self._promoted[original.url]
+            result.near_duplicate_of = original
+            if original.url not in self._settled:
+                self._analysis_waiters.setdefault(original.url, []).append((result, step_index))
+                return True
+            if not self._settled[original.url]:
+                # The original's analysis failed: this lead is analyzed in its place
+                result.near_duplicate_of = None
+                self._promoted[original.url] = result
+        return False
+
+    def _settle_analysis(self, result: LeadResult):
+        """
+        Marks a lead's analysis as done (or never coming) and lets its near-duplicates
+        continue. If it failed, the first waiting duplicate is analyzed in its place
+        and the others wait for that one instead.
+        """
+        with self._done:
+            succeeded = self._settled.setdefault(result.url, result.status == "pending" and bool(result.client_info))
+            waiting = self._analysis_waiters.pop(result.url, [])
+            if waiting and not succeeded:
+                (promoted, step_index), rest = waiting[0], waiting[1:]
+                promoted.near_duplicate_of = None
+                self._promoted[result.url] = promoted
+                for duplicate, _ in rest:
+                    duplicate.near_duplicate_of = promoted
+                self._analysis_waiters.setdefault(promoted.url, []).extend(rest)
+                waiting = [(promoted, step_index)]
+        for duplicate, step_index in waiting:
+            self._advance(duplicate, step_index)
+
+    def _submit(self, result: LeadResult, step_index: int):
+        step_name, stage = self.steps[step_index]
+        try:
+            self._pools[stage].submit(self._run_step, result, step_index)
+        except RuntimeError:
+            self._finish()  # The pools shut down (Ctrl-C) after _advance checked
+
+    def _run_step(self, result: LeadResult, step_index: int):
+        step_name, stage = self.steps[step_index]
+        start = time.perf_counter()
+        with tracing.span(f"{STAGE_LABELS[stage]}.{step_name}", lead=result.name) as step_span:
+            try:
+                getattr(self, f"_step_{step_name}")(result)
+            except SkipLead as e:
+                result.status = "skipped"
+                result.reason = str(e)
+                step_span["status"] = "skipped"
+                typer.secho(f"  -> {e}", fg=typer.colors.YELLOW)
+            except Exception as e:
+                result.status = "failed"
+                result.reason = str(e)
+                step_span["status"] = "error"
+                step_span["error"] = str(e)
+                typer.secho(f"CRASH: Failed to process {result.name}. Error: {e}", fg=typer.colors.RED)
+                traceback.print_exc()  # Print full error trace for debugging
+            finally:
+                result.timings[step_name] = time.perf_counter() - start
+        self._checkpoint(result, step_name)
+        if step_index == self._analysis_step or result.status != "pending":
+            self._settle_analysis(result)
+
+        if result.status == "pending" and step_index + 1 < len(self.steps):
+            self._advance(result, step_index + 1)
+            return
+
+        if result.status == "pending":
+            result.status = "processed"
+            typer.secho(f"✅ Successfully processed {result.name}", fg=typer.colors.GREEN)
+        tracing.count(f"leads.{result.status}")
+        self._finish()
+
+    def _finish(self):
+        with self._done:
+            self._in_flight -= 1
+            if self._in_flight == 0:
+                self._done.notify_all()
+
+    def _wait_for_all(self):
+        with self._done:
+            while self._in_flight:
+                self._done.wait()
+
+    def _release_ranked(self):
+        """Scores every scraped lead, then starts the LLM stage for the chosen ones, best first."""
+        waiting = self._waiting_for_rank
+        self._waiting_for_rank = []
+        with tracing.span("4a.rank", leads=len(waiting)):
+            scores = lead_ranker.score_leads(
+                self.services_list_str,
+                texts=[r.text or "" for r in waiting],
+                urls=[r.url for r in waiting],
+                titles=[r.name for r in waiting]
+            )
+            chosen = lead_ranker.select(scores, top_k=self.config.top_k, min_score=self.config.min_score)
+        for result, score in zip(waiting, scores):
+            result.score = float(score)
+
+        typer.secho(f"\nRanked {len(waiting)} scraped lead(s); sending {len(chosen)} to the LLM:", bold=True)
+        for index in chosen:
+            typer.echo(f"  {waiting[index].score:6.2f}  {waiting[index].name}")
+        chosen_set = set(chosen)
+        for index, result in enumerate(waiting):
+            if index not in chosen_set:
+                # Not journaled: a --resume ranks these again alongside the new leads
+                result.status = "skipped"
+                result.reason = f"Ranked out (score {result.score:.2f})"
+                tracing.count("leads.ranked_out")
+                self._settle_analysis(result)
+        first_step, self._rank_before = self._rank_before, None  # Let the released leads through
+        for index in chosen:
+            self._start(waiting[index], first_step)
+
+    # --- Checkpoints ---
+
+    def _reshare_uploads(self):
+        """Queues the sharing permission again for files an interrupted run uploaded but never shared."""
+        if self.journal is None or self.db is None or self.config.dev:
+            return
+        for url, name, file_id in self.journal.unshared_files():
+            typer.echo(f"Sharing the PDF uploaded for {name} by the interrupted run.")
+            self.db.permissions.add(
+                file_id, on_shared=lambda url=url, name=name: self.journal.record(url, name, "shared")
+            )
+
+    def _restore(self, result: LeadResult, state) -> int:
+        """Copies a lead's saved outputs onto `result`. Returns the index of its first unfinished step."""
+        result.text = state.data.get("text")
+        result.client_info = state.data.get("client_info")
+        result.email = state.data.get("email")
+        result.pdf = state.data.get("pdf_path")
+        result.drive_link = state.data.get("drive_link")
+        for index, (step_name, _) in enumerate(self.steps):
+            if STEP_CHECKPOINTS[step_name] not in state.stages:
+                return index
+        return len(self.steps) - 1
+
+    def _checkpoint(self, result: LeadResult, step_name: str):
+        """Journals the outcome of one step (the Sheet log is journaled once the row is written)."""
+        if self.journal is None:
+            return
+        if result.status == "skipped":
+            self.journal.record(result.url, result.name, "skipped", reason=result.reason)
+            return
+        if result.status == "failed":
+            self.journal.record(result.url, result.name, "failed", reason=result.reason)
+            return
+
+        if step_name == "scrape":
+            data = {"text": result.text}
+        elif step_name == "analyze":
+            data = {"client_info": result.client_info}
+        elif step_name == "email":
+            data = {"email": result.email}
+        elif step_name == "analyze_and_email":
+            # Two records, so a resume without --fused doesn't analyze again
+            self.journal.record(result.url, result.name, "analyzed", client_info=result.client_info)
+            data = {"email": result.email}
+        elif step_name == "pdf":
+            pdf_path = self.journal.save_pdf(result.url, result.pdf) if isinstance(result.pdf, bytes) else result.pdf
+            data = {"pdf_path": pdf_path}
+        elif step_name == "upload" and not self.config.dev:
+            self.journal.record(
+                result.url, result.name, "uploaded", drive_link=result.drive_link, file_id=result.drive_file_id
+            )
+            self.journal.discard_pdf(result.url)
+            return
+        elif step_name == "log" and self.config.dev:
+            # Nothing to upload or log: the lead is done, and its saved PDF isn't needed
+            self.journal.record(result.url, result.name, "dry_run")
+            self.journal.discard_pdf(result.url)
+            return
+        else:
+            return  # The upload step in --dev mode, or the log step (see _step_log)
+        self.journal.record(result.url, result.name, STEP_CHECKPOINTS[step_name], **data)
+
+    # --- Steps (4a-4d) ---
+
+    def _step_scrape(self, result: LeadResult):
+        if self._fetcher is not None:
+            result.text = self._fetcher.fetch_text(result.url)
+        else:
+            result.text = analysis_engine._get_text_from_url(result.url)
+        if not result.text:
+            raise SkipLead(f"Failed to analyze {result.url}. Skipping.")
+        self._check_near_duplicate(result)
+
+    def _check_near_duplicate(self, result: LeadResult):
+        if self._near_dups is None:
+            return
+        fingerprint = near_dup.simhash(result.text)
+        if fingerprint is None:
+            return
+        match = self._near_dups.find_or_add(fingerprint, result)
+        if match is None:
+            return
+        original, distance = match
+        # Either way the lead waits for the original's analysis (see _wait_for_original):
+        # if that fails, this lead is analyzed instead of being dropped as well
+        result.near_duplicate_of = original
+        action = "skipping it" if self.config.near_dup_action == "skip" else "reusing its analysis"
+        typer.echo(f"  -> {result.name} is a near-duplicate of {original.name} ({distance} bits apart); {action}.")
+
+    def _skip_near_duplicate(self, result: LeadResult):
+        """In 'skip' mode, drops a near-duplicate whose original was analyzed."""
+        original = result.near_duplicate_of
+        if original is not None and self.config.near_dup_action == "skip":
+            raise SkipLead(f"Near-duplicate of {original.name}. Skipping.")
+
+    def _reuse_analysis(self, result: LeadResult) -> bool:
+        """Copies the original page's analysis onto a near-duplicate, if it is ready."""
+        original = result.near_duplicate_of
+        if original is None or not original.client_info:
+            return False
+        result.client_info = dict(original.client_info)
+        return True
+
+    def _step_analyze(self, result: LeadResult):
+        self._skip_near_duplicate(result)
+        if self._reuse_analysis(result):
+            return
+        result.client_info = analysis_engine.analyze_client(result.url, text=result.text)
+        if not result.client_info:
+            raise SkipLead(f"Failed to analyze {result.url}. Skipping.")
+        typer.echo(f"  -> Analyzed {result.name}. Industry: {result.client_info.get('industry', 'N/A')}")
+
+    def _step_email(self, result: LeadResult):
+        result.email = generation_engine.generate_email(self.services_list_str, result.client_info)
+        typer.echo(f"  -> Email draft generated for {result.name}.")
+
+    def _step_analyze_and_email(self, result: LeadResult):
+        self._skip_near_duplicate(result)
+        # Already analyzed (resumed from a two-call run, or a near-duplicate's analysis)
+        if result.client_info or self._reuse_analysis(result):
+            self._step_email(result)
+            return
+        fused = generation_engine.analyze_and_draft(self.services_list_str, result.url, result.text)
+        if fused is None:
+            typer.secho(f"  -> Fused output for {result.name} was malformed. Using two calls.", fg=typer.colors.YELLOW)
+            self._step_analyze(result)
+            self._step_email(result)
+            return
+        result.client_info = {"summary": fused["summary"], "industry": fused["industry"]}
+        result.email = fused["email"]
+        typer.echo(f"  -> Analyzed {result.name} and drafted email. Industry: {result.client_info['industry']}")
+
+    def _step_pdf(self, result: LeadResult):
+        result.pdf = generation_engine.create_portfolio_pdf(
+            self.services_list_str, result.client_info, result.name, renderer=self._renderer
+        )
+        typer.echo(f"  -> PDF portfolio created for {result.name}")
+
+    def _step_upload(self, result: LeadResult):
+        if self.config.dev:
+            return
+        typer.echo(f"  -> Uploading PDF for {result.name} to Google Drive...")
+        on_shared = None
+        if self.journal is not None:
+            on_shared = lambda: self.journal.record(result.url, result.name, "shared")
+        result.drive_link = self.db.upload_pdf(
+            result.pdf, result.name,
+            on_uploaded=lambda file_id: setattr(result, "drive_file_id", file_id),
+            on_shared=on_shared
+        )
+
+    def _step_log(self, result: LeadResult):
+        if self.config.dev:
+            typer.secho(f"  -> Skipping database logging for {result.name} (--dev mode).", fg=typer.colors.YELLOW)
+            return
+        typer.echo(f"  -> Logging {result.name} to Google Sheets...")
+        on_logged = None
+        if self.journal is not None:
+            on_logged = lambda: self.journal.record(result.url, result.name, "logged")
+        self.db.log_lead(
+            name=result.name,
+            url=result.url,
+            summary=result.client_info.get('summary', 'N/A'),
+            industry=result.client_info.get('industry', 'N/A'),
+            email=result.email,
+            drive_link=result.drive_link,
+            on_logged=on_logged
+        )
@@ -0,0 +1,229 @@
+# portfolio_renderer.py
+# Renders the per-lead PDF portfolio (Phase 4c) with WeasyPrint.
+#
+# WeasyPrint's layout is CPU-heavy pure Python, so rendering runs in a
+# ProcessPoolExecutor instead of the pipeline's threads. Each worker process
+# parses the stylesheet and loads fonts ONCE (in _init_worker) and reuses them
+# for every portfolio it renders; only the small HTML body changes per lead.
+#
+# Workers are started with "spawn", not fork: the pool is created while the
+# pipeline's scrape, LLM and I/O threads are running, and a forked child could
+# inherit a lock held by one of them. WeasyPrint is imported in this process
+# before the pool starts, so a missing system library (Pango) is reported once
+# instead of breaking the pool. If the pool breaks anyway (a worker crashed),
+# it is rebuilt once, and after that portfolios are rendered in this process.
+import html
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date
+from string import Template
+
+
+# --- CONFIGURATION ---
+COMPANY_NAME = "CyForge"
+SENDER = "Eshan Jameel, Co-founder, CyForge"
+START_METHOD = "spawn"  # Worker processes; "forkserver" also works on Linux/macOS
+MAX_POOL_REBUILDS = 1   # Broken pools replaced before falling back to rendering in this process
+# --- END CONFIGURATION ---
+
+
+PORTFOLIO_CSS = """
+@page { size: A4; margin: 2cm; @bottom-center { content: "CyForge  |  Page " counter(page); font-size: 9pt; color: #777; } }
+body { font-family: "Helvetica", "Arial", sans-serif; color: #1d2433; font-size: 11pt; line-height: 1.5; }
+.cover { page-break-after: always; padding-top: 6cm; }
+.cover h1 { font-size: 32pt; margin: 0; color: #0b3d91; }
+.cover .subtitle { font-size: 14pt; color: #555; margin-top: 0.5cm; }
+.cover .meta { margin-top: 3cm; font-size: 10pt; color: #777; }
+h2 { color: #0b3d91; border-bottom: 2px solid #0b3d91; padding-bottom: 4px; margin-top: 1cm; }
+.services li { margin-bottom: 0.3cm; }
+.services .name { font-weight: bold; }
+.contact { margin-top: 1.5cm; padding: 0.5cm; background: #eef2fa; border-radius: 4px; }
+"""
+
+# $-placeholders are filled with already-escaped HTML
+PORTFOLIO_TEMPLATE = Template("""<!DOCTYPE html>
+<html>
+<head><meta charset="utf-8"><title>$company Portfolio for $lead_name</title></head>
+<body>
+  <section class="cover">
+    <h1>$company</h1>
+    <div class="subtitle">A security proposal prepared for <strong>$lead_name</strong></div>
+    <div class="meta">Industry: $industry<br>Prepared on $today</div>
+  </section>
+
+  <section>
+    <h2>About $lead_name</h2>
+    <p>$summary</p>
+  </section>
+
+  <section>
+    <h2>How $company Can Help</h2>
+    <ul class="services">
+      $services
+    </ul>
+  </section>
+
+  <section class="contact">
+    <strong>Next step:</strong> a 15-minute call to see which of these fits your roadmap.<br>
+    $sender
+  </section>
+</body>
+</html>
+""")
+
+
+def build_html(services_list_str: str, client_info: dict, lead_name: str) -> str:
+    """Fills the portfolio template for one lead (cheap; runs in the caller's process)."""
+    services = [s.strip() for s in services_list_str.split(",") if s.strip()]
+    services_html = "\n      ".join(
+        f'<li><span class="name">{html.escape(service)}</span></li>' for service in services
+    )
+    return PORTFOLIO_TEMPLATE.substitute(
+        company=html.escape(COMPANY_NAME),
+        lead_name=html.escape(lead_name),
+        industry=html.escape(str(client_info.get("industry", "N/A"))),
+        summary=html.escape(str(client_info.get("summary", ""))),
+        services=services_html,
+        sender=html.escape(SENDER),
+        today=date.today().strftime("%B %d, %Y"),
+    )
+
+
+# --- Worker process state (one copy per process) ---
+_font_config = None
+_stylesheet = None
+_weasyprint_error = None  # Why WeasyPrint can't be loaded in this process, once checked
+_weasyprint_checked = False
+
+
+def check_weasyprint():
+    """Raises RuntimeError if WeasyPrint (or a system library it needs) can't be loaded."""
+    global _weasyprint_error, _weasyprint_checked
+    if not _weasyprint_checked:
+        try:
+            import weasyprint  # noqa: F401
+        except Exception as e:  # ImportError, or OSError for a missing libpango
+            _weasyprint_error = f"WeasyPrint can't be loaded: {e}"
+        _weasyprint_checked = True
+    if _weasyprint_error:
+        raise RuntimeError(_weasyprint_error)
+
+
+def _init_worker():
+    """Runs once in each worker process: parse the CSS and load fonts up front."""
+    global _font_config, _stylesheet
+    from weasyprint import CSS
+    from weasyprint.text.fonts import FontConfiguration
+
+    _font_config = FontConfiguration()
+    _stylesheet = CSS(string=PORTFOLIO_CSS, font_config=_font_config)
+
+
+def _render_html(document_html: str) -> bytes:
+    """Runs in a worker process: lays out one document and returns the PDF bytes."""
+    from weasyprint import HTML
+
+    if _stylesheet is None:
+        _init_worker()
+    return HTML(string=document_html).write_pdf(stylesheets=[_stylesheet], font_config=_font_config)
+
+
+class PortfolioRenderer:
+    """Renders portfolios on a pool of worker processes (all cores by default)."""
+
+    def __init__(self, max_workers: int | None = None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._executor = None
+        self._generation = 0       # Bumped every time a broken pool is replaced
+        self._in_process = False   # Set once the pool has broken too often
+        self._lock = threading.Lock()
+        self._render_lock = threading.Lock()  # In-process renders share one stylesheet and font config
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            check_weasyprint()
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context(START_METHOD),
+                initializer=_init_worker
+            )
+        return self._executor
+
+    def _submit_html(self, document_html: str):
+        """(future, pool generation), or (None, None) when rendering in this process."""
+        with self._lock:
+            if self._in_process:
+                return None, None
+            executor = self._get_executor()
+            generation = self._generation
+        try:
+            return executor.submit(_render_html, document_html), generation
+        except BrokenProcessPool:
+            return None, generation
+
+    def _pool_broke(self, generation: int):
+        """Replaces the broken pool once (later renders run in this process)."""
+        with self._lock:
+            if generation != self._generation:
+                return  # Another thread already dealt with this pool
+            broken, self._executor = self._executor, None
+            self._generation += 1
+            if self._generation > MAX_POOL_REBUILDS:
+                self._in_process = True
+                print("Warning: The PDF worker processes keep crashing. Rendering PDFs in the main process instead.")
+            else:
+                print("Warning: A PDF worker process crashed. Restarting the PDF workers.")
+        if broken is not None:
+            broken.shutdown(wait=False, cancel_futures=True)
+
+    def _result(self, document_html: str, future, generation) -> bytes:
+        while True:
+            if future is None and generation is None:
+                with self._render_lock:
+                    return _render_html(document_html)
+            if future is not None:
+                try:
+                    return future.result()
+                except BrokenProcessPool:
+                    pass
+            self._pool_broke(generation)
+            future, generation = self._submit_html(document_html)
+
+    def render(self, services_list_str: str, client_info: dict, lead_name: str) -> bytes:
+        """Renders one portfolio and waits for the PDF bytes."""
+        document_html = build_html(services_list_str, client_info, lead_name)
+        return self._result(document_html, *self._submit_html(document_html))
+
+    def render_many(self, services_list_str: str, leads: list) -> list:
+        """
+        Batch mode: renders N portfolios across all worker processes.
+        leads: (client_info, lead_name) pairs. Returns PDF bytes in the same order.
+        """
+        documents = [build_html(services_list_str, client_info, lead_name) for client_info, lead_name in leads]
+        jobs = [(document_html, *self._submit_html(document_html)) for document_html in documents]
+        return [self._result(*job) for job in jobs]
+
+    def close(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+_default_renderer = None
+
+
+def get_default_renderer() -> PortfolioRenderer:
+    global _default_renderer
+    if _default_renderer is None:
+        _default_renderer = PortfolioRenderer()
+    return _default_renderer
@@ -0,0 +1,323 @@
+# rate_limiter.py
+# Shared rate limiting, adaptive concurrency and circuit breaking for every
+# external service the pipeline talks to (SerpAPI, Ollama, Google Sheets,
+# Google Drive and the target websites, one limiter per domain).
+#
+#   limiter = rate_limiter.get("sheets")
+#   with limiter.slot() as call:          # Waits for a token and a free slot
+#       response = do_request()
+#       if looks_rate_limited(response):
+#           call.mark(rate_limiter.THROTTLED)
+#
+#   limiter.call(fn, *args, retries=6)    # Same, retrying throttled/failed calls with backoff
+#
+# Each limiter combines:
+#   - a token bucket: at most `rate` calls per second (bursts up to `burst`),
+#   - an AIMD concurrency limit: +1 slot per window of successful calls, halved on a
+#     429 / RESOURCE_EXHAUSTED (the rate is halved too, then creeps back up), and
+#     shrunk a little when latency jumps well above its running average,
+#   - a circuit breaker: after `failure_threshold` failures in a row it opens and
+#     calls fail fast with CircuitOpenError; after `reset_timeout` seconds one
+#     probe call is let through (half-open) and its result closes or reopens it.
+import random
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+import tracing
+
+
+# --- CONFIGURATION ---
+# rate: calls/second (None = unlimited), burst: calls allowed at once after idling,
+# max_concurrency: calls in flight (None = unlimited)
+SERVICES = {
+    "serpapi": {"rate": 5.0, "burst": 5, "max_concurrency": 4, "failure_threshold": 3, "reset_timeout": 60.0},
+    "ollama": {"rate": None, "burst": 1, "max_concurrency": None, "failure_threshold": 3, "reset_timeout": 15.0},
+    "sheets": {"rate": 1.0, "burst": 5, "max_concurrency": 2, "failure_threshold": 5, "reset_timeout": 30.0},
+    "drive": {"rate": 10.0, "burst": 10, "max_concurrency": 8, "failure_threshold": 5, "reset_timeout": 30.0},
+}
+# One limiter per website domain (counters are reported together as "sites")
+SITE_LIMITS = {"rate": 2.0, "burst": 4, "max_concurrency": None, "failure_threshold": 3, "reset_timeout": 120.0}
+MIN_RATE_FRACTION = 0.05  # A throttled service is never slowed below 5% of its configured rate
+LATENCY_FACTOR = 3.0      # A call this many times slower than average counts as congestion
+MAX_BACKOFF = 60.0        # Seconds, for call() retries (also caps the server's Retry-After)
+# --- END CONFIGURATION ---
+
+OK = "ok"                # The service answered (including client errors like 404)
+THROTTLED = "throttled"  # 429, RESOURCE_EXHAUSTED, quota / rate limit messages
+FAILED = "failed"        # 5xx, timeouts, connection errors
+
+_THROTTLE_MARKERS = ("resource_exhausted", "ratelimitexceeded", "rate limit", "too many requests", "quota")
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a service whose circuit breaker is open."""
+
+
+class Throttled(Exception):
+    """Raise inside call() to report a rate-limit answer that isn't an exception (e.g. an error dict)."""
+
+
+def classify(error: BaseException) -> str:
+    """OK, THROTTLED or FAILED for an exception raised by a service call."""
+    if isinstance(error, Throttled):
+        return THROTTLED
+    status = getattr(error, "status_code", None)
+    for response in (getattr(error, "response", None), getattr(error, "resp", None)):  # requests/gspread, googleapiclient
+        if status is None and response is not None:  # (A 4xx requests.Response is falsy, so no `or` here)
+            status = getattr(response, "status_code", None) or getattr(response, "status", None)
+    message = str(error).lower()
+    if status == 429 or any(marker in message for marker in _THROTTLE_MARKERS):
+        return THROTTLED
+    if isinstance(status, int):
+        return FAILED if status >= 500 else OK  # 4xx: the service is fine, the request wasn't
+    if isinstance(error, (OSError, TimeoutError, ConnectionError)):
+        return FAILED
+    return OK  # Our own bugs and parsing errors say nothing about the service
+
+
+def _retry_after(error: BaseException) -> float | None:
+    """The Retry-After header in seconds, capped at MAX_BACKOFF (None if missing or not a number)."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return min(MAX_BACKOFF, max(0.0, float(headers.get("Retry-After"))))
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """Allows `rate` calls per second on average, and bursts of up to `burst`."""
+
+    def __init__(self, rate: float | None, burst: int):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Takes a token and returns how many seconds to wait before using it (0 = now)."""
+        if not self.rate:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1  # Can go negative: later callers queue up behind this one
+            return max(0.0, -self._tokens / self.rate)
+
+
+class AdaptiveConcurrency:
+    """AIMD limit on the number of calls in flight."""
+
+    def __init__(self, maximum: int | None, minimum: int = 1):
+        self.maximum = maximum
+        self.minimum = minimum
+        self.limit = float(maximum) if maximum else None
+        self.in_flight = 0
+        self._latency = None  # Running average, seconds
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            while self.limit is not None and self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+
+    def release(self, outcome: str, latency: float):
+        with self._cond:
+            self.in_flight -= 1
+            if self.limit is not None:
+                if outcome == THROTTLED:
+                    self.limit = max(self.minimum, self.limit / 2)
+                elif outcome == OK and self._latency and latency > LATENCY_FACTOR * self._latency:
+                    self.limit = max(self.minimum, self.limit * 0.9)
+                elif outcome == OK:
+                    self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            if outcome == OK:
+                self._latency = latency if self._latency is None else 0.9 * self._latency + 0.1 * latency
+            self._cond.notify_all()
+
+
+class CircuitBreaker:
+    """closed -> (failure_threshold failures in a row) -> open -> (reset_timeout) -> half-open -> closed/open."""
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half-open"
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True  # Exactly one probe call at a time
+                return True
+            return False
+
+    def record(self, outcome: str) -> bool:
+        """
+        Returns True if this outcome opened the circuit. THROTTLED neither counts
+        as a failure nor as a recovery: a throttled probe leaves the circuit open.
+        """
+        with self._lock:
+            self._probing = False
+            if outcome == THROTTLED:
+                if self.state == self.HALF_OPEN:
+                    self.state = self.OPEN
+                    self._opened_at = time.monotonic()
+                return False
+            if outcome == FAILED:
+                self.failures += 1
+                if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                    opened = self.state != self.OPEN
+                    self.state = self.OPEN
+                    self._opened_at = time.monotonic()
+                    return opened
+            else:
+                self.failures = 0
+                self.state = self.CLOSED
+            return False
+
+
+class _Call:
+    """Handed out by ServiceLimiter.slot() so the caller can report the outcome."""
+
+    def __init__(self):
+        self.outcome = OK
+
+    def mark(self, outcome: str):
+        self.outcome = outcome
+
+
+class ServiceLimiter:
+    """Token bucket + adaptive concurrency + circuit breaker for one service or domain."""
+
+    def __init__(self, name: str, rate: float | None, burst: int, max_concurrency: int | None,
+                 failure_threshold: int, reset_timeout: float, metric: str | None = None):
+        self.name = name
+        self.metric = metric or name  # Counter prefix
+        self.max_rate = rate
+        self.bucket = TokenBucket(rate, burst)
+        self.concurrency = AdaptiveConcurrency(max_concurrency)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+
+    def admit(self) -> float:
+        """
+        Checks the breaker and takes a token. Returns the seconds to wait before
+        calling (for async callers that sleep on their own event loop).
+        """
+        if not self.breaker.allow():
+            tracing.count(f"{self.metric}.circuit_rejected")
+            raise CircuitOpenError(f"{self.name} is failing; skipping calls to it for now")
+        return self.bucket.reserve()
+
+    def record(self, outcome: str, latency: float = 0.0):
+        """Feeds one call's outcome back into the rate, the breaker and the counters."""
+        if outcome != OK:
+            tracing.count(f"{self.metric}.{outcome}")
+        if self.breaker.record(outcome):
+            tracing.count(f"{self.metric}.circuit_opened")
+            print(f"Warning: {self.name} keeps failing. Pausing calls to it for {self.breaker.reset_timeout:.0f}s.")
+        if self.max_rate:
+            bucket = self.bucket
+            with bucket._lock:  # reserve() reads the rate under the same lock
+                if outcome == THROTTLED:
+                    bucket.rate = max(self.max_rate * MIN_RATE_FRACTION, bucket.rate / 2)
+                elif outcome == OK and bucket.rate < self.max_rate:
+                    bucket.rate = min(self.max_rate, bucket.rate + self.max_rate * MIN_RATE_FRACTION)
+
+    @contextmanager
+    def slot(self):
+        """Waits for a token and a concurrency slot, then times the enclosed call."""
+        time.sleep(self.admit())
+        self.concurrency.acquire()
+        call = _Call()
+        start = time.perf_counter()
+        try:
+            yield call
+        except BaseException as e:
+            call.mark(classify(e))
+            raise
+        finally:
+            latency = time.perf_counter() - start
+            self.concurrency.release(call.outcome, latency)
+            self.record(call.outcome, latency)
+
+    def call(self, fn, *args, retries: int = 3, retry_on: tuple = (THROTTLED, FAILED), **kwargs):
+        """
+        fn(*args, **kwargs) through slot(), retried on THROTTLED / FAILED outcomes
+        with exponential backoff and jitter (or the server's Retry-After).
+
+        retry_on: The outcomes worth retrying. Calls that aren't idempotent should
+                  only retry THROTTLED: after a timeout or 5xx the call may have
+                  gone through anyway.
+        """
+        for attempt in range(retries + 1):
+            try:
+                with self.slot():
+                    return fn(*args, **kwargs)
+            except CircuitOpenError:
+                raise
+            except Exception as e:
+                if attempt == retries or classify(e) not in retry_on:
+                    raise
+                retry_after = _retry_after(e)
+                delay = retry_after if retry_after is not None else min(MAX_BACKOFF, 2 ** attempt) + random.uniform(0, 1)
+                tracing.count(f"{self.metric}.retries")
+                print(f"Warning: {self.name} call failed ({classify(e)}). Retrying in {delay:.1f}s...")
+                time.sleep(delay)
+
+    def describe(self) -> str:
+        rate = f"{self.bucket.rate:.2g}/s" if self.bucket.rate else "unlimited"
+        limit = self.concurrency.limit
+        slots = f"{int(limit)} slots" if limit is not None else "unlimited slots"
+        return f"{self.name}: {self.breaker.state}, {rate}, {slots}"
+
+
+_limiters = {}
+_registry_lock = threading.Lock()
+
+
+def get(service: str) -> ServiceLimiter:
+    """The shared limiter for a service named in SERVICES."""
+    with _registry_lock:
+        limiter = _limiters.get(service)
+        if limiter is None:
+            limiter = _limiters[service] = ServiceLimiter(service, **SERVICES[service])
+        return limiter
+
+
+def for_domain(url: str) -> ServiceLimiter:
+    """The shared limiter for a website's host (pass a URL or a bare host name)."""
+    host = (urlsplit(url).hostname if "//" in url else url) or url
+    key = f"site:{host.lower()}"
+    with _registry_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            limiter = _limiters[key] = ServiceLimiter(host, metric="sites", **SITE_LIMITS)
+        return limiter
+
+
+def summary() -> str:
+    """One line for the end-of-run report: the state of every service limiter that was used."""
+    with _registry_lock:
+        services = [limiter for key, limiter in _limiters.items() if not key.startswith("site:")]
+        open_sites = sum(
+            1 for key, limiter in _limiters.items()
+            if key.startswith("site:") and limiter.breaker.state != CircuitBreaker.CLOSED
+        )
+    parts = [limiter.describe() for limiter in services]
+    if open_sites:
+        parts.append(f"{open_sites} website(s) paused after repeated failures")
+    return "Rate limits: " + ("; ".join(parts) if parts else "no external calls")
@@ -0,0 +1,129 @@
+# scrape_cache.py
+# Local cache of scraped website text, with HTTP conditional revalidation.
+#
+# For every URL we keep the extracted visible text plus the ETag and
+# Last-Modified headers the server sent, keyed by URL plus the extraction
+# settings (the same URL gives different text in "fast" and "full" mode, or
+# with another character cap). Then:
+#   - Inside the domain's freshness window -> use the cached text, no request at all.
+#   - After that -> send If-None-Match / If-Modified-Since. A "304 Not Modified"
+#     reply means no download and no BeautifulSoup parse.
+import json
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+import tracing
+from disk_cache import DiskCache
+
+
+# --- CONFIGURATION ---
+MAX_CACHE_BYTES = 128 * 1024 * 1024  # 128 MB
+DEFAULT_FRESHNESS_SECONDS = 24 * 60 * 60  # 1 day
+
+# Per-domain freshness windows (seconds). Sub-domains inherit from the parent.
+# Extra entries can be given as CYFORGE_SCRAPE_FRESHNESS="cyforge.com=3600,example.com=0"
+DOMAIN_FRESHNESS = {}
+# --- END CONFIGURATION ---
+
+# Set to False by 'run --no-scrape-cache'
+ENABLED = True
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def _load_env_freshness():
+    for item in os.getenv("CYFORGE_SCRAPE_FRESHNESS", "").split(","):
+        domain, _, seconds = item.partition("=")
+        if domain.strip() and seconds.strip():
+            DOMAIN_FRESHNESS[domain.strip().lower()] = float(seconds)
+
+
+_load_env_freshness()
+
+
+def _get_cache() -> DiskCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = DiskCache("scrape", max_bytes=MAX_CACHE_BYTES)
+    return _cache
+
+
+def freshness_for(url: str) -> float:
+    """Returns the freshness window for a URL (checks the host, then its parent domains)."""
+    host = (urlsplit(url).hostname or "").lower()
+    parts = host.split(".")
+    for i in range(len(parts)):
+        candidate = ".".join(parts[i:])
+        if candidate in DOMAIN_FRESHNESS:
+            return DOMAIN_FRESHNESS[candidate]
+    return DEFAULT_FRESHNESS_SECONDS
+
+
+def _key(url: str, variant: str) -> str:
+    return f"{variant}|{url}"
+
+
+def lookup(url: str, variant: str) -> dict | None:
+    """
+    Returns the cached entry for a URL, or None.
+    The entry has 'text', 'etag', 'last_modified', 'fetched_at' and 'fresh' keys.
+
+    variant: The extraction settings the text was produced with
+             (see analysis_engine.cache_variant()).
+    """
+    if not ENABLED:
+        return None
+    raw = _get_cache().get(_key(url, variant))
+    if raw is None:
+        tracing.count("scrape_cache.misses")
+        return None
+    entry = json.loads(raw)
+    entry["fresh"] = time.time() - entry["fetched_at"] < freshness_for(url)
+    tracing.count("scrape_cache.hits" if entry["fresh"] else "scrape_cache.stale")
+    return entry
+
+
+def conditional_headers(entry: dict | None) -> dict:
+    """Builds the If-None-Match / If-Modified-Since headers for a revalidation request."""
+    headers = {}
+    if entry:
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+    return headers
+
+
+def store(url: str, variant: str, text: str, response_headers):
+    """Saves freshly extracted text along with the validators from the response headers."""
+    if not ENABLED:
+        return
+    entry = {
+        "text": text,
+        "etag": response_headers.get("ETag"),
+        "last_modified": response_headers.get("Last-Modified"),
+        "fetched_at": time.time()
+    }
+    _get_cache().set(_key(url, variant), json.dumps(entry).encode("utf-8"))
+
+
+def revalidated(url: str, variant: str, entry: dict, response_headers=None) -> str:
+    """
+    Call after a 304 Not Modified reply: restarts the freshness window
+    (keeping any new validators) and returns the cached text.
+    """
+    headers = response_headers or {}
+    tracing.count("scrape_cache.revalidated")
+    if ENABLED:
+        refreshed = {
+            "text": entry["text"],
+            "etag": headers.get("ETag") or entry.get("etag"),
+            "last_modified": headers.get("Last-Modified") or entry.get("last_modified"),
+            "fetched_at": time.time()
+        }
+        _get_cache().set(_key(url, variant), json.dumps(refreshed).encode("utf-8"))
+    return entry["text"]
@@ -0,0 +1,106 @@
+# serp_cache.py
+# Persistent cache of raw SerpAPI responses (the get_dict() output).
+#
+# The key is a canonical form of the request parameters with the API key
+# left out, so re-runs (and prompt A/B experiments) don't pay for searches
+# that were already answered. In OFFLINE mode nothing is sent to SerpAPI at
+# all: cached queries are replayed and everything else returns an error dict.
+#
+# Error responses are not cached, except SerpAPI's "hasn't returned any
+# results" answer: a query that finds nothing would otherwise cost a credit on
+# every run. Those are kept for a shorter time, in case results show up later.
+import hashlib
+import json
+import threading
+
+import tracing
+from disk_cache import DiskCache
+
+
+# --- CONFIGURATION ---
+MAX_CACHE_BYTES = 64 * 1024 * 1024  # 64 MB
+TTL_SECONDS = 7 * 24 * 60 * 60      # 7 days
+EMPTY_TTL_SECONDS = 24 * 60 * 60    # 1 day, for queries that returned no results
+# --- END CONFIGURATION ---
+
+# Set by 'run --no-serp-cache' / 'run --serp-offline'
+ENABLED = True
+OFFLINE = False
+
+# Never part of the key (secrets / no effect on results)
+IGNORED_PARAMS = {"api_key", "output", "async", "no_cache"}
+NO_RESULTS_ERROR = "hasn't returned any results"
+
+stats = {"hits": 0, "misses": 0}
+_stats_lock = threading.Lock()
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def _get_cache() -> DiskCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = DiskCache("serpapi", max_bytes=MAX_CACHE_BYTES, ttl_seconds=TTL_SECONDS)
+    return _cache
+
+
+def canonical_params(params: dict) -> dict:
+    """Lower-cases and whitespace-normalizes every value, drops the API key, sorts the keys."""
+    canonical = {}
+    for key, value in params.items():
+        if key in IGNORED_PARAMS or value is None:
+            continue
+        canonical[key] = " ".join(str(value).split()).lower()
+    return dict(sorted(canonical.items()))
+
+
+def make_key(params: dict) -> str:
+    canonical = json.dumps(canonical_params(params), separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _count(name: str):
+    with _stats_lock:
+        stats[name] += 1
+    tracing.count(f"serp_cache.{name}")
+
+
+def get(params: dict) -> dict | None:
+    """Returns the cached response for these parameters, or None."""
+    if not ENABLED and not OFFLINE:
+        return None
+    key = make_key(params)
+    raw = _get_cache().get(key)
+    if raw is None:
+        raw = _get_cache().get("empty:" + key, ttl_seconds=EMPTY_TTL_SECONDS)
+    _count("hits" if raw is not None else "misses")
+    return json.loads(raw) if raw is not None else None
+
+
+def is_empty_result(results: dict) -> bool:
+    """True for SerpAPI's answer to a query with no results (an 'error', but a valid answer)."""
+    return NO_RESULTS_ERROR in str(results.get("error", ""))
+
+
+def put(params: dict, results: dict):
+    """Stores a successful or empty response (other error responses are never cached)."""
+    if not ENABLED:
+        return
+    if is_empty_result(results):
+        _get_cache().set("empty:" + make_key(params), json.dumps(results).encode("utf-8"))
+    elif "error" not in results:
+        _get_cache().set(make_key(params), json.dumps(results).encode("utf-8"))
+
+
+def offline_miss(params: dict) -> dict:
+    """The response used in OFFLINE mode when a query was never cached."""
+    return {"error": f"Offline mode: no cached SerpAPI result for '{params.get('q')}'."}
+
+
+def summary() -> str:
+    """One line for the end-of-run report."""
+    if not ENABLED and not OFFLINE:
+        return "SerpAPI cache: disabled (--no-serp-cache)"
+    mode = " [offline]" if OFFLINE else ""
+    return f"SerpAPI cache{mode}: {stats['hits']} hits, {stats['misses']} misses"
@@ -0,0 +1,234 @@
+# tracing.py
+# Lightweight spans and counters for the 'run' pipeline.
+#
+#   with tracing.span("4a.scrape", lead="Acme"):   # Times a block of work
+#       ...
+#   tracing.count("scrape_cache.hits")             # Bumps a counter
+#   tracing.record_llm(response)                   # Ollama eval_count / eval_duration
+#
+# Everything is aggregated in memory for the end-of-run summary table.
+# Optionally, every span is also written as one line to a JSON-lines trace file
+# (--trace), and the aggregates are served in the Prometheus text format on
+# http://localhost:<port>/metrics (--metrics-port) for long-running jobs.
+import json
+import re
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# --- CONFIGURATION ---
+MAX_SAMPLES_PER_SPAN = 10_000  # Durations kept per span name for the p50/p95 columns
+# --- END CONFIGURATION ---
+
+_lock = threading.Lock()
+_local = threading.local()
+_span_ids = iter(range(1, 2 ** 62))
+
+_counters = {}   # name -> value
+_spans = {}      # name -> {"count", "errors", "total", "samples"}
+_started_at = time.perf_counter()
+
+_trace_file = None
+_metrics_server = None
+
+
+# --- Setup ---
+
+def configure(trace_file: str | None = None, metrics_port: int | None = None):
+    """Opens the JSON-lines trace file and/or starts the Prometheus endpoint."""
+    global _trace_file, _metrics_server
+    if trace_file:
+        _trace_file = open(trace_file, "a", encoding="utf-8")
+        _write({"type": "start", "ts": time.time()})
+    if metrics_port:
+        _metrics_server = ThreadingHTTPServer(("127.0.0.1", metrics_port), _MetricsHandler)
+        threading.Thread(target=_metrics_server.serve_forever, name="cyforge-metrics", daemon=True).start()
+
+
+def close():
+    """Writes the final counters to the trace file and stops the metrics endpoint."""
+    global _trace_file, _metrics_server
+    if _trace_file is not None:
+        with _lock:
+            counters = dict(_counters)
+        _write({"type": "counters", "ts": time.time(), "counters": counters})
+        _trace_file.close()
+        _trace_file = None
+    if _metrics_server is not None:
+        _metrics_server.shutdown()
+        _metrics_server.server_close()
+        _metrics_server = None
+
+
+def _write(event: dict):
+    if _trace_file is None:
+        return
+    line = json.dumps(event, default=str)
+    with _lock:
+        if _trace_file is not None:
+            _trace_file.write(line + "\n")
+
+
+# --- Recording ---
+
+@contextmanager
+def span(name: str, **attributes):
+    """
+    Times the enclosed block under `name`. Spans opened inside it (on the same
+    thread) are recorded as its children. Extra keyword arguments are saved
+    with the span in the trace file; add more later with set_attribute().
+    """
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    with _lock:
+        span_id = next(_span_ids)
+    record = {
+        "type": "span",
+        "name": name,
+        "id": span_id,
+        "parent": stack[-1]["id"] if stack else None,
+        "thread": threading.current_thread().name,
+        "ts": time.time(),
+        "attributes": attributes,
+        "status": "ok",
+    }
+    stack.append(record)
+    start = time.perf_counter()
+    try:
+        yield record
+    except BaseException as e:
+        record["status"] = "error"
+        record["error"] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        stack.pop()
+        record["duration_ms"] = round(duration * 1000, 3)
+        _add_span(name, duration, record["status"] == "error")
+        _write(record)
+
+
+def set_attribute(key: str, value):
+    """Adds an attribute to the innermost open span on this thread."""
+    stack = getattr(_local, "stack", None)
+    if stack:
+        stack[-1]["attributes"][key] = value
+
+
+def _add_span(name: str, duration: float, error: bool):
+    with _lock:
+        stats = _spans.get(name)
+        if stats is None:
+            stats = _spans[name] = {"count": 0, "errors": 0, "total": 0.0, "samples": []}
+        stats["count"] += 1
+        stats["errors"] += error
+        stats["total"] += duration
+        if len(stats["samples"]) < MAX_SAMPLES_PER_SPAN:
+            stats["samples"].append(duration)
+
+
+def count(name: str, value: float = 1):
+    """Adds `value` to a counter (e.g. cache hits, retries, failures)."""
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def record_llm(response: dict):
+    """
+    Records the token counts Ollama reports with every chat response
+    (eval_count = output tokens, eval_duration = nanoseconds spent generating them).
+    """
+    eval_count = response.get("eval_count") or 0
+    eval_seconds = (response.get("eval_duration") or 0) / 1e9
+    prompt_count = response.get("prompt_eval_count") or 0
+    prompt_seconds = (response.get("prompt_eval_duration") or 0) / 1e9
+    count("ollama.requests")
+    count("ollama.eval_tokens", eval_count)
+    count("ollama.eval_seconds", eval_seconds)
+    count("ollama.prompt_tokens", prompt_count)
+    count("ollama.prompt_seconds", prompt_seconds)
+    set_attribute("eval_count", eval_count)
+    set_attribute("eval_duration_ms", round(eval_seconds * 1000, 1))
+    set_attribute("prompt_eval_count", prompt_count)
+
+
+# --- Reporting ---
+
+def _percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))] if ordered else 0.0
+
+
+def summary_table() -> str:
+    """Where the time went: one row per span name, then the counters."""
+    with _lock:
+        spans = {name: dict(stats, samples=list(stats["samples"])) for name, stats in _spans.items()}
+        counters = dict(_counters)
+        wall = time.perf_counter() - _started_at
+
+    lines = [f"{'span':<28}{'count':>7}{'total s':>10}{'% wall':>8}{'p50 ms':>10}{'p95 ms':>10}{'errors':>8}"]
+    for name, stats in sorted(spans.items()):
+        lines.append(
+            f"{name:<28}{stats['count']:>7}{stats['total']:>10.2f}{stats['total'] / wall * 100 if wall else 0:>7.0f}%"
+            f"{_percentile(stats['samples'], 50) * 1000:>10.1f}{_percentile(stats['samples'], 95) * 1000:>10.1f}"
+            f"{stats['errors']:>8}"
+        )
+    lines.append(f"(wall time {wall:.1f}s; spans on worker threads overlap, so totals can exceed it)")
+
+    if counters.get("ollama.eval_seconds"):
+        tokens_per_second = counters["ollama.eval_tokens"] / counters["ollama.eval_seconds"]
+        lines.append(
+            f"Ollama: {counters['ollama.requests']:.0f} requests, {counters['ollama.prompt_tokens']:.0f} prompt tokens, "
+            f"{counters['ollama.eval_tokens']:.0f} output tokens ({tokens_per_second:.1f} tokens/s)"
+        )
+    other = {name: value for name, value in counters.items() if not name.startswith("ollama.")}
+    if other:
+        lines.append("Counters: " + ", ".join(f"{name}={value:g}" for name, value in sorted(other.items())))
+    return "\n".join(lines)
+
+
+def _metric_name(name: str) -> str:
+    return "cyforge_" + re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+def prometheus_text() -> str:
+    """The current aggregates in the Prometheus text exposition format."""
+    with _lock:
+        spans = {name: (stats["count"], stats["total"], stats["errors"]) for name, stats in _spans.items()}
+        counters = dict(_counters)
+
+    lines = []
+    for name, value in sorted(counters.items()):
+        metric = _metric_name(name) + "_total"
+        lines += [f"# TYPE {metric} counter", f"{metric} {value:g}"]
+    if spans:
+        # Each metric family must be listed in one block
+        lines.append("# TYPE cyforge_span_seconds summary")
+        for name, (span_count, total, _) in sorted(spans.items()):
+            lines += [
+                f'cyforge_span_seconds_count{{span="{name}"}} {span_count}',
+                f'cyforge_span_seconds_sum{{span="{name}"}} {total:.6f}',
+            ]
+        lines.append("# TYPE cyforge_span_errors_total counter")
+        lines += [f'cyforge_span_errors_total{{span="{name}"}} {errors}' for name, (_, _, errors) in sorted(spans.items())]
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = prometheus_text().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass